@@ -2,8 +2,10 @@
 Budgeting System Backend Application
 
 This module serves as the main entry point for the Budgeting System backend.
-It initializes the Flask application and registers all the route blueprints.
-The application provides RESTful APIs for managing users, transactions, and financial goals.
+create_app() builds the Flask application from the settings in config.py and
+registers all the route blueprints; `app` is the application built with the
+default settings. The application provides RESTful APIs for managing users,
+transactions, and financial goals.
 
 Dependencies:
     - Flask: Web framework
@@ -15,32 +17,46 @@ Routes:
     - /: Health check endpoint
     - /users: User management endpoints
     - /users/email/<email>: User operations by email
-    - /users/<user_id>/goals: Financial goals management
+    - /users/<user_id>/goals: Financial goals management (batch: /goals/contributions)
+    - /api/auth/login: Credential check returning a user summary
+    - /api/data/<user_id>/import: Bulk import of purchases and deposits
+    - /api/sync/<user_id>?since=<seq>: Changes to a user since the client's last sync
+    - /api/data/<user_id>/budget, /alerts: Spending against the budget and threshold alerts
+    - /api/data/<user_id>/recurring: Recurring purchases and deposits
+    - /api/admin/reports/<name>: Cross-user reports (requires ADMIN_TOKEN)
+    - /api/data/<user_id>/export, /api/exports: CSV/Parquet statements and export jobs
+    - /metrics: Request and storage metrics in the Prometheus text format
 """
 
 from routes import all_users
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, jsonify, request
 from flask_cors import CORS
-from routes import purchase, deposit, user, transactions
-import json
+import config
+import exports
+import logs
+import metrics
+import money
+import scheduler
+import storage
+from routes import purchase, deposit, user, transactions, auth, admin, ingest, sync, budget, goals, recurring
+from routes import statements
+from routes.budget import UNCATEGORIZED, current_month, record_alerts
+from storage import get_store, user_key
+from storage.transaction import MODIFIED_KEY, VERSION_KEY
+from routes.caching import not_modified, validated
+from routes.pagination import PageError, page_args, page_error, page_response
+from routes.streaming import stream_users
 import urllib.parse
 
-app = Flask(__name__)
-CORS(app)
-
-# Register all route blueprints
-app.register_blueprint(all_users.all_users_bp)
-print("Users_bp works")
-app.register_blueprint(user.user_bp)
-print("User_bp works")
-app.register_blueprint(purchase.purchase_bp)
-print("Purchase_bp works")
-app.register_blueprint(deposit.deposit_bp)
-print("Deposit_bp works")
-app.register_blueprint(transactions.transactions_bp)
-print("Transactions_bp works")
-
-@app.route('/')
+log = logs.get_logger('app')
+
+# The routes defined in this module
+root_bp = Blueprint('root', __name__)
+
+# User fields the store keeps up to date itself, which requests may not set
+STORE_FIELDS = {VERSION_KEY, MODIFIED_KEY, 'nextIds'}
+
+@root_bp.route('/')
 def home():
     """
     Health check endpoint.
@@ -50,19 +66,27 @@ def home():
     """
     return "Server is running!!"
 
-@app.route('/users', methods=['GET'])
+@root_bp.route('/users', methods=['GET'])
 def get_all_users():
     """
     Retrieve all users from the system.
+
+    Optional query parameters limit and after return one page of users
+    instead (see routes/pagination.py).
     
     Returns:
-        JSON: List of all users in the system
+        JSON: List of all users in the system, streamed (NDJSON with ?format=ndjson),
+              or {"items": [...], "next": cursor} when paginated
     """
-    with open('data.json') as f:
-        users = json.load(f)
-    return jsonify(users)
+    try:
+        page = page_args(dated=False)
+    except PageError as error:
+        return page_error(error)
+    if page is not None:
+        return page_response(*get_store().list_users(**page))
+    return stream_users(get_store().iter_users())
 
-@app.route('/users/email/<email>', methods=['GET'])
+@root_bp.route('/users/email/<email>', methods=['GET'])
 def get_user_by_email(email):
     """
     Retrieve a user by their email address.
@@ -71,17 +95,20 @@ def get_user_by_email(email):
         email (str): The email address of the user to find
         
     Returns:
-        JSON: User data if found, error message if not found
+        JSON: User data if found, error message if not found, or an empty
+              304 if If-None-Match / If-Modified-Since match the user's version
     """
     decoded_email = urllib.parse.unquote(email)
-    with open('data.json') as f:
-        users = json.load(f)
-    for user in users:
-        if user.get('email') == decoded_email:
-            return jsonify(user)
-    return jsonify({'error': 'User not found'}), 404
-
-@app.route('/users/email/<email>', methods=['PATCH'])
+    store = get_store()
+    version = store.get_version_by_email(decoded_email)
+    if version is None:
+        return jsonify({'error': 'User not found'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    return validated(jsonify(store.get_user_by_email(decoded_email)), version)
+
+@root_bp.route('/users/email/<email>', methods=['PATCH'])
 def update_user_by_email(email):
     """
     Update user information by email address.
@@ -90,30 +117,35 @@ def update_user_by_email(email):
         email (str): The email address of the user to update
         
     Returns:
-        JSON: Success message if updated, error message if not found
+        JSON: Success message if updated, error message if not found or the body
+        is not an object of fields the client may set
     """
     decoded_email = urllib.parse.unquote(email)
-    update_data = request.json
-    print("PATCH update for:", decoded_email, update_data) 
-    with open('data.json', 'r') as f:
-        users = json.load(f)
-    updated = False
-    for user in users:
-        if user.get('email') == decoded_email:
-            print("Found user:", user) 
-            user.update(update_data)
-            updated = True
-            break
-    if updated:
-        with open('data.json', 'w') as f:
-            json.dump(users, f, indent=4)
-        print("User updated successfully.")
+    update_data = request.get_json(silent=True)
+    if not isinstance(update_data, dict):
+        return jsonify({'error': 'Expected a JSON object of fields to update.'}), 400
+    if STORE_FIELDS & update_data.keys():
+        return jsonify({'error': f'Fields {sorted(STORE_FIELDS & update_data.keys())} are managed by the server.'}), 400
+    store = get_store()
+    user = store.get_user_by_email(decoded_email)
+    if user is not None:
+        with store.transaction(user_key(user)) as tx:
+            tx.update_user(user_key(user), update_data)
+            if {'totalMonthlyBudget', 'categoryBudgets'} & update_data.keys():
+                # A lower budget can put this month's spending over a threshold
+                updated = dict(store.get_user(user_key(user)), **update_data)
+                categories = updated.get('categoryBudgets')
+                categories = list(categories) if isinstance(categories, dict) else []
+                month = current_month()
+                record_alerts(store, tx, user_key(user), updated,
+                              {(month, category): money.ZERO for category in categories + [UNCATEGORIZED]})
+        log.info('Updated fields %s of user %s', sorted(update_data), user_key(user))
         return jsonify({'message': 'User updated successfully'})
     else:
-        print("User not found for PATCH.") 
+        log.info('PATCH by email for an unknown user')
         return jsonify({'error': 'User not found'}), 404
 
-@app.route('/users/<int:user_id>/goals/<int:goal_id>', methods=['PATCH'])
+@root_bp.route('/users/<int:user_id>/goals/<int:goal_id>', methods=['PATCH'])
 def update_goal_amount(user_id, goal_id):
     """
     Update the current amount of a specific financial goal.
@@ -127,29 +159,25 @@ def update_goal_amount(user_id, goal_id):
     """
     update_data = request.json
     amount_to_add = update_data.get('amountToAdd')
-    print(f"PATCH /users/{user_id}/goals/{goal_id} with amountToAdd={amount_to_add}")
     if amount_to_add is None:
         return jsonify({'error': 'Missing amountToAdd in request.'}), 400
-    with open('data.json', 'r') as f:
-        users = json.load(f)
-    for user in users:
-        if user.get('user_id') == user_id or user.get('userId') == user_id:
-            goals = user.get('financialGoals', [])
-            for goal in goals:
-                if goal.get('goalId') == goal_id:
-                    goal['currentAmount'] = float(goal.get('currentAmount', 0)) + float(amount_to_add)
-                    if goal.get('targetAmount'):
-                        goal['percentageCompleted'] = int((goal['currentAmount'] / goal['targetAmount']) * 100)
-                    print(f"Updated goal: {goal}")
-                    with open('data.json', 'w') as f:
-                        json.dump(users, f, indent=4)
-                    return jsonify({'message': 'Goal updated successfully', 'goal': goal})
-            print('Goal not found for PATCH')
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            log.info('Goal PATCH for unknown user %s', user_id)
+            return jsonify({'error': 'User not found'}), 404
+        try:
+            goal = goals.contribute(store, tx, user_id, [(goal_id, money.decimal(amount_to_add))])[goal_id]
+        except ValueError:
+            return jsonify({'error': 'amountToAdd must be a number.'}), 400
+        except LookupError:
+            log.info('Goal PATCH for unknown goal %s of user %s', goal_id, user_id)
             return jsonify({'error': 'Goal not found'}), 404
-    print('User not found for PATCH')
-    return jsonify({'error': 'User not found'}), 404
+    log.debug('Added %s to goal %s of user %s', amount_to_add, goal_id, user_id)
+    return jsonify({'message': 'Goal updated successfully', 'goal': goal})
 
-@app.route('/users/<int:user_id>/goals', methods=['POST'])
+@root_bp.route('/users/<int:user_id>/goals', methods=['POST'])
 def add_goal(user_id):
     """
     Add a new financial goal for a user.
@@ -161,23 +189,18 @@ def add_goal(user_id):
         JSON: The newly created goal data if successful, error message if user not found
     """
     new_goal = request.json
-    with open('data.json', 'r') as f:
-        users = json.load(f)
-    for user in users:
-        if user.get('user_id') == user_id or user.get('userId') == user_id:
-            if 'financialGoals' not in user:
-                user['financialGoals'] = []
-            new_goal['goalId'] = len(user['financialGoals'])
-            new_goal['percentageCompleted'] = int((float(new_goal.get('currentAmount', 0)) / float(new_goal.get('targetAmount', 1))) * 100)
-            user['financialGoals'].append(new_goal)
-            break
-    else:
-        return jsonify({'error': 'User not found'}), 404
-    with open('data.json', 'w') as f:
-        json.dump(users, f, indent=4)
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        new_goal['goalId'] = tx.allocate_id(user_id, user, 'financialGoals')
+        new_goal.update(goals.progress(new_goal, 0))
+        new_goal.setdefault('percentageCompleted', 0)
+        tx.add(user_id, 'financialGoals', new_goal)
     return jsonify({'message': 'Goal added successfully', 'goal': new_goal}), 201
 
-@app.route('/users/<int:user_id>/goals', methods=['GET'])
+@root_bp.route('/users/<int:user_id>/goals', methods=['GET'])
 def get_goals(user_id):
     """
     Retrieve all financial goals for a specific user.
@@ -186,14 +209,53 @@ def get_goals(user_id):
         user_id (int): The ID of the user whose goals to retrieve
         
     Returns:
-        JSON: List of goals if user found, error message if not found
-    """
-    with open('data.json', 'r') as f:
-        users = json.load(f)
-    for user in users:
-        if user.get('user_id') == user_id or user.get('userId') == user_id:
-            return jsonify({'goals': user.get('financialGoals', [])}), 200
-    return jsonify({'error': 'User not found'}), 404
+        JSON: List of goals if user found, error message if not found, or an
+              empty 304 if If-None-Match / If-Modified-Since match the user's version
+    """
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    user = store.get_user(user_id)
+    return validated(jsonify({'goals': user.get('financialGoals', [])}), version), 200
+
+BLUEPRINTS = (root_bp, all_users.all_users_bp, user.user_bp, purchase.purchase_bp, deposit.deposit_bp,
+              transactions.transactions_bp, auth.auth_bp, admin.admin_bp, ingest.ingest_bp, sync.sync_bp,
+              budget.budget_bp, goals.goals_bp, recurring.recurring_bp, statements.statements_bp)
+
+def create_app(settings=None, store=None):
+    """
+    Build the Flask application.
+
+    The settings of config.py are copied into app.config and can be
+    overridden per app. Building the app opens no files: the store is
+    created when the first request needs it.
+
+    Args:
+        settings (dict): Overrides for config.py, e.g. {"STORAGE_BACKEND": "sqlite"}
+        store (Store): A store to use instead of one built from the settings
+
+    Returns:
+        Flask: The application with every blueprint registered
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(settings or {})
+    logs.configure(app.config['LOG_LEVEL'], app.config['LOG_SAMPLE_RATE'])
+    CORS(app)
+    metrics.install(app)
+    storage.init_app(app, store)
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+        log.debug('Registered blueprint %s', blueprint.name)
+    scheduler.init_app(app)
+    exports.init_app(app)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", debug=True, port=5001)
\ No newline at end of file
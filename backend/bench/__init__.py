@@ -0,0 +1,9 @@
+"""
+bench
+
+Benchmarks for the backend. Run the modules from the backend directory, for
+example:
+
+    python -m bench.datagen 100000 big.json
+    python -m bench.reports --users 100000
+"""
@@ -0,0 +1,74 @@
+"""
+cold_start.py
+
+Time and peak memory of opening the JSON store and answering the first
+single-user read, with the data file as indented JSON, compact JSON and the
+binary snapshot format of storage/snapshot.py.
+
+Usage (from the backend directory):
+    python -m bench.cold_start [--users 50000] [--purchases 12]
+
+Each case runs in a fresh process, so nothing is cached between them.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .datagen import generate_users
+from .stream_memory import _peak_mb
+
+
+def child(data_file, user_id):
+    start = time.perf_counter()
+    from storage.json_store import JsonStore
+
+    before = _peak_mb()
+    store = JsonStore(data_file)
+    user = store.get_user(int(user_id))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'growth': _peak_mb() - before, 'found': user is not None}))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench.cold_start')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--purchases', type=int, default=12)
+    args = parser.parse_args()
+
+    from storage import snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        users = generate_users(args.users, args.purchases)
+        files = {
+            'indented': os.path.join(tmp, 'indented.json'),
+            'compact': os.path.join(tmp, 'compact.json'),
+            'binary': os.path.join(tmp, 'data.snap'),
+        }
+        with open(files['indented'], 'w') as f:
+            json.dump(users, f, indent=4)
+        with open(files['compact'], 'w') as f:
+            json.dump(users, f, separators=(',', ':'))
+        snapshot.save(users, files['binary'], snapshot.BINARY)
+        del users
+
+        print(f'{args.users} users')
+        print(f'{"format":<9} {"file":>8} {"first read":>11} {"memory":>8}')
+        for name, path in files.items():
+            out = subprocess.run(
+                [sys.executable, '-m', 'bench.cold_start', '--child', path, str(args.users // 2)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            size = os.path.getsize(path) / 2**20
+            print(f'{name:<9} {size:6.1f}MB {result["seconds"]:10.3f}s {result["growth"]:6.0f}MB')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:4])
+    else:
+        main()
@@ -0,0 +1,99 @@
+"""
+datagen.py
+
+Synthetic users in the data.json shape for benchmarks.
+
+Usage (from the backend directory):
+    python -m bench.datagen USERS [OUTPUT.json] [--purchases N] [--deposits N] [--goals N] [--seed S]
+
+The data is deterministic for a given seed. Purchases use the frontend's sign
+convention (expenses are negative) and span the twelve months of 2024.
+"""
+
+import argparse
+import json
+import random
+
+CATEGORIES = ['Food', 'Food & Drink', 'Shopping', 'Transport', 'Bills',
+              'Entertainment', 'Health', 'Education', 'Other']
+MONTHS = [f'2024-{m:02d}' for m in range(1, 13)]
+
+
+def generate_users(count, purchases=12, deposits=2, goals=0, seed=0):
+    """
+    Build a list of synthetic user records.
+
+    Args:
+        count (int): Number of users.
+        purchases (int): Average number of purchases per user.
+        deposits (int): Average number of deposits per user.
+        goals (int): Average number of financial goals per user.
+        seed (int): Random seed.
+
+    Returns:
+        list: User dictionaries.
+    """
+    rng = random.Random(seed)
+    users = []
+    for uid in range(count):
+        user = {
+            'user_id': uid,
+            'timestamp': f'{rng.choice(MONTHS)}-01T00:00:00Z',
+            'fullName': f'User {uid}',
+            'email': f'user{uid}@example.com',
+            'password': f'password{uid}',
+            'monthlyIncome': float(rng.randrange(1000, 8000, 100)),
+            'preferredCurrency': 'USD',
+            'currentBalance': round(rng.uniform(0, 20000), 2),
+            'totalMonthlyBudget': float(rng.randrange(500, 4000, 100)),
+            'purchases': [],
+            'deposits': [],
+            'financialGoals': [],
+        }
+        for pid in range(rng.randint(0, 2 * purchases)):
+            # About one purchase in ten is income, like a refund or salary
+            cost = round(rng.uniform(1, 400), 2) * (1 if rng.random() < 0.1 else -1)
+            user['purchases'].append({
+                'purchaseId': pid,
+                'name': f'Purchase {pid}',
+                'purchaseCategory': rng.choice(CATEGORIES),
+                'purchaseDate': f'{rng.choice(MONTHS)}-{rng.randint(1, 28):02d}T12:00:00Z',
+                'purchaseCost': cost,
+            })
+        for did in range(rng.randint(0, 2 * deposits)):
+            user['deposits'].append({
+                'depositId': did,
+                'name': f'Deposit {did}',
+                'depositCategory': 'Salary',
+                'depositDate': f'{rng.choice(MONTHS)}-{rng.randint(1, 28):02d}T09:00:00Z',
+                'depositAmount': round(rng.uniform(100, 3000), 2),
+            })
+        for gid in range(rng.randint(0, 2 * goals)):
+            target = float(rng.randrange(500, 20000, 500))
+            current = round(rng.uniform(0, target), 2)
+            user['financialGoals'].append({
+                'goalId': gid,
+                'name': f'Goal {gid}',
+                'category': 'Savings',
+                'targetAmount': target,
+                'currentAmount': current,
+                'targetDate': f'2025-{rng.randint(1, 12):02d}-01',
+                'percentageCompleted': int(current / target * 100),
+            })
+        users.append(user)
+    return users
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m bench.datagen')
+    parser.add_argument('users', type=int)
+    parser.add_argument('output', nargs='?', default='synthetic.json')
+    parser.add_argument('--purchases', type=int, default=12)
+    parser.add_argument('--deposits', type=int, default=2)
+    parser.add_argument('--goals', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    users = generate_users(args.users, args.purchases, args.deposits, args.goals, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(users, f)
+    print(f'Wrote {args.users} users to {args.output}')
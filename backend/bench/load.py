@@ -0,0 +1,468 @@
+"""
+load.py
+
+Load test of every API route against a synthetic dataset.
+
+Usage (from the backend directory):
+    python -m bench.load [--users 1000] [--purchases 12] [--deposits 2] [--goals 2]
+                         [--backend json sqlite sharded] [--server client wsgi gunicorn]
+                         [--workers 1 2 4] [--threads 4]
+                         [--concurrency 8] [--requests 200] [--out results.json]
+    python -m bench.load --compare before.json after.json
+
+For each storage backend the dataset is written to a temporary directory and
+every route is called --requests times from --concurrency threads, through
+the Flask test client (no network), through a local threaded WSGI server
+(real HTTP) and, with --server gunicorn, through the production server of
+wsgi.py once per --workers count. Each route reports p50/p99 latency and
+throughput; the results are printed and saved as JSON so two runs, e.g. two
+storage strategies or a change and its parent commit, can be compared with
+--compare.
+
+To see how throughput scales with worker processes:
+    python -m bench.load --server gunicorn --workers 1 2 4 --concurrency 16
+
+Routes that return every user run a tenth as many requests. Deletes use a
+different existing purchase or deposit on every call.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .datagen import generate_users
+
+ADMIN_TOKEN = 'bench'
+
+# name, method, path, body(ctx) -> dict or None, heavy
+Route = namedtuple('Route', 'name method path body heavy')
+
+
+def _purchase(ctx):
+    return {'purchaseCategory': 'Food', 'purchaseDate': '2024-06-01T12:00:00Z', 'purchaseCost': -4.5}
+
+
+def _deposit(ctx):
+    return {'depositAmount': 10, 'depositDate': '2024-06-01T09:00:00Z', 'depositCategory': 'Salary'}
+
+
+def _import(ctx):
+    return {'purchases': [_purchase(ctx)] * 20, 'deposits': [_deposit(ctx)] * 5}
+
+
+def _rule(ctx):
+    return {'type': 'purchase', 'item': {'name': 'Rent', 'purchaseCost': -800, 'purchaseCategory': 'Bills'},
+            'frequency': 'monthly', 'day': 1, 'start': '2024-06-01'}
+
+
+ROUTES = [
+    Route('health', 'GET', '/', None, False),
+    Route('users_page', 'GET', '/users?limit=50', None, False),
+    Route('users_all', 'GET', '/users', None, True),
+    Route('user_by_email', 'GET', '/users/email/{email}', None, False),
+    Route('update_user_by_email', 'PATCH', '/users/email/{email}', lambda ctx: {'language': 'English'}, False),
+    Route('goals', 'GET', '/users/{uid}/goals', None, False),
+    Route('add_goal', 'POST', '/users/{uid}/goals',
+          lambda ctx: {'name': 'Bench', 'targetAmount': 1000, 'currentAmount': 0}, False),
+    Route('update_goal', 'PATCH', '/users/{goal_uid}/goals/{goal_id}', lambda ctx: {'amountToAdd': 1}, False),
+    Route('goal_contributions', 'POST', '/users/{goal_uid}/goals/contributions',
+          lambda ctx: {'contributions': [{'goalId': ctx['goal_id'], 'amountToAdd': 1}] * 3}, False),
+    Route('data_page', 'GET', '/api/data?limit=50', None, False),
+    Route('data_all', 'GET', '/api/data', None, True),
+    Route('data_user', 'GET', '/api/data/{uid}', None, False),
+    Route('summary', 'GET', '/api/data/{uid}/summary?month=2024-06', None, False),
+    Route('budget', 'GET', '/api/data/{uid}/budget?month=2024-06', None, False),
+    Route('alerts', 'GET', '/api/data/{uid}/alerts', None, False),
+    Route('statement', 'GET', '/api/data/{uid}/export', None, False),
+    Route('queue_export', 'POST', '/api/exports', lambda ctx: {'userId': ctx['uid']}, False),
+    Route('export_status', 'GET', '/api/exports/{export_id}', None, False),
+    Route('export_download', 'GET', '/api/exports/{export_id}/download', None, False),
+    Route('add_user', 'POST', '/api/data', lambda ctx: {'fullName': 'Bench', 'currentBalance': 0}, False),
+    Route('purchases', 'GET', '/api/data/purchase/{uid}', None, False),
+    Route('purchases_page', 'GET', '/api/data/purchase/{uid}?limit=20&order=desc', None, False),
+    Route('purchase_search', 'GET', '/api/data/purchase/{uid}/search?q=foo&month=2024-06', None, False),
+    Route('add_purchase', 'POST', '/api/data/purchase/users/{uid}/transactions', _purchase, False),
+    Route('delete_purchase', 'DELETE', '/api/data/purchase/{purchase_uid}',
+          lambda ctx: {'purchaseId': ctx['purchase_id']}, False),
+    Route('deposits', 'GET', '/api/data/deposit/{uid}', None, False),
+    Route('add_deposit', 'PATCH', '/api/data/deposit/{uid}', _deposit, False),
+    Route('delete_deposit', 'DELETE', '/api/data/deposit/{deposit_uid}',
+          lambda ctx: {'depositId': ctx['deposit_id']}, False),
+    Route('import', 'POST', '/api/data/{uid}/import', _import, False),
+    Route('recurring', 'GET', '/api/data/{uid}/recurring', None, False),
+    Route('add_recurring', 'POST', '/api/data/{uid}/recurring', _rule, False),
+    Route('transactions_page', 'GET', '/api/transactions/?limit=50', None, False),
+    Route('sync', 'GET', '/api/sync/{uid}?since=0', None, False),
+    Route('login', 'POST', '/api/auth/login',
+          lambda ctx: {'email': ctx['email'], 'password': ctx['password']}, False),
+    Route('report_spending', 'GET', '/api/admin/reports/spending?month=2024-06', None, True),
+    Route('metrics', 'GET', '/metrics', None, False),
+]
+
+
+class Targets:
+    """Hands out the user, goal, purchase and deposit each request works on."""
+
+    def __init__(self, users, seed=0):
+        self.users = [(u['user_id'], u['email'], u['password']) for u in users]
+        rng = random.Random(seed)
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._goals = [(u['user_id'], g['goalId']) for u in users for g in u['financialGoals']]
+        self._purchases = self._shuffled(rng, [(u['user_id'], p['purchaseId']) for u in users for p in u['purchases']])
+        self._deposits = self._shuffled(rng, [(u['user_id'], d['depositId']) for u in users for d in u['deposits']])
+        # Finished export jobs, for the routes that read one
+        self.exports = []
+
+    @staticmethod
+    def _shuffled(rng, pairs):
+        rng.shuffle(pairs)
+        return iter(pairs)
+
+    def next(self, route):
+        """Return the format values for one request to a route."""
+        with self._lock:
+            uid, email, password = self._rng.choice(self.users)
+            ctx = {'uid': uid, 'email': email, 'password': password}
+            if '{goal_uid}' in route.path:
+                ctx['goal_uid'], ctx['goal_id'] = self._rng.choice(self._goals) if self._goals else (uid, 0)
+            # Each delete takes an item no earlier request has deleted
+            if '{purchase_uid}' in route.path:
+                ctx['purchase_uid'], ctx['purchase_id'] = next(self._purchases, (uid, -1))
+            if '{deposit_uid}' in route.path:
+                ctx['deposit_uid'], ctx['deposit_id'] = next(self._deposits, (uid, -1))
+            if '{export_id}' in route.path:
+                ctx['export_id'] = self._rng.choice(self.exports)
+        return ctx
+
+
+class ClientDriver:
+    """Sends requests through the Flask test client, one client per thread."""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers={'X-Admin-Token': ADMIN_TOKEN})
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    """Sends real HTTP requests to a server on a local port."""
+
+    port = None
+
+    def request(self, method, path, body):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            headers = {'X-Admin-Token': ADMIN_TOKEN}
+            data = None
+            if body is not None:
+                data = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+
+class WsgiDriver(HttpDriver):
+    """Serves the app from a local threaded WSGI server in this process."""
+
+    name = 'wsgi'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        # The server logs every request line otherwise
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GunicornDriver(HttpDriver):
+    """Serves wsgi:app with gunicorn in a child process, as in production."""
+
+    name = 'gunicorn'
+
+    def __init__(self, backend, directory, workers, threads):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        env = dict(os.environ,
+                   STORAGE_BACKEND=backend,
+                   DATA_FILE=os.path.join(directory, 'data.json'),
+                   SQLITE_PATH=os.path.join(directory, 'budget.db'),
+                   SHARD_DIR=os.path.join(directory, 'data.shards'),
+                   EXPORT_DIR=os.path.join(directory, 'exports'),
+                   ADMIN_TOKEN=ADMIN_TOKEN,
+                   LOG_LEVEL='WARNING',
+                   WEB_BIND=f'127.0.0.1:{self.port}',
+                   WEB_WORKERS=str(workers),
+                   WEB_THREADS=str(threads))
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'wsgi:app'],
+            cwd=backend_dir, env=env)
+        self._wait_until_ready()
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                if self.request('GET', '/', None) == 200:
+                    return
+            except OSError:
+                time.sleep(0.1)
+        self.close()
+        raise RuntimeError('gunicorn did not start in time')
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def percentile(sorted_values, q):
+    """Return the q-quantile (0-1) of sorted values by the nearest-rank method."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_route(driver, route, targets, count, concurrency):
+    """Call one route count times from concurrency threads and summarize the timings."""
+    def one(_):
+        ctx = targets.next(route)
+        path = route.path.format(**ctx)
+        body = route.body(ctx) if route.body else None
+        start = time.perf_counter()
+        status = driver.request(route.method, path, body)
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'route': route.name,
+        'method': route.method,
+        'path': route.path,
+        'requests': count,
+        'statuses': statuses,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / count * 1000, 3),
+        'throughput_rps': round(count / wall, 1),
+    }
+
+
+def prepare(backend, directory, users):
+    """Write the dataset for a backend and return a store opened on it."""
+    from storage import sharded_store
+    from storage.json_store import JsonStore
+    from storage.sqlite_store import SqliteStore
+
+    if backend == 'json':
+        path = os.path.join(directory, 'data.json')
+        with open(path, 'w') as f:
+            json.dump(users, f)
+        return JsonStore(path)
+    if backend == 'sharded':
+        path = os.path.join(directory, 'data.shards')
+        sharded_store.create(path, users)
+        return sharded_store.ShardedStore(path)
+    store = SqliteStore(os.path.join(directory, 'budget.db'))
+    store.import_users(users)
+    return store
+
+
+def run(args, routes=ROUTES):
+    """
+    Run the load test described by parsed command line arguments.
+
+    Returns:
+        dict: {"meta": {...}, "results": [...]} as saved to --out.
+    """
+    from app import create_app
+    import exports
+
+    dataset = dict(users=args.users, purchases=args.purchases, deposits=args.deposits, goals=args.goals)
+    # In-process servers run once; gunicorn once per worker count
+    servers = [(server, workers) for server in args.server
+               for workers in (args.workers if server == 'gunicorn' else [None])]
+    results = []
+    for backend, (server, workers) in itertools.product(args.backend, servers):
+        users = generate_users(args.users, args.purchases, args.deposits, args.goals, seed=args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            store = prepare(backend, directory, users)
+            app = create_app({'ADMIN_TOKEN': ADMIN_TOKEN, 'LOG_LEVEL': 'WARNING',
+                              'EXPORT_DIR': os.path.join(directory, 'exports')}, store=store)
+            jobs = app.extensions[exports.EXTENSION]
+            targets = Targets(users, seed=args.seed)
+            # Status files are shared through EXPORT_DIR, so gunicorn workers see these jobs too
+            for user_id, _, _ in targets.users[:5]:
+                targets.exports.append(jobs.wait(jobs.submit(store, user_id=user_id)['jobId'])['jobId'])
+            del users
+            if server == 'client':
+                driver = ClientDriver(app)
+            elif server == 'wsgi':
+                driver = WsgiDriver(app)
+            else:
+                driver = GunicornDriver(backend, directory, workers, args.threads)
+            try:
+                # Warm up caches so the first route does not pay for loading the data
+                driver.request('GET', '/api/data?limit=1', None)
+                for route in routes:
+                    count = max(1, args.requests // 10) if route.heavy else args.requests
+                    result = run_route(driver, route, targets, count, args.concurrency)
+                    result.update(backend=backend, server=server, workers=workers)
+                    results.append(result)
+                    print(_row(result), flush=True)
+            finally:
+                driver.close()
+                jobs.shutdown()
+                if hasattr(store, 'close'):
+                    store.close()
+    return {
+        'meta': {
+            'dataset': dataset,
+            'seed': args.seed,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'threads': args.threads,
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started': datetime.now(timezone.utc).isoformat(),
+        },
+        'results': results,
+    }
+
+
+HEADER = f'{"backend":<7} {"server":<11} {"route":<22} {"p50 ms":>9} {"p99 ms":>9} {"req/s":>9}  statuses'
+
+
+def _server(result):
+    workers = result.get('workers')
+    return result['server'] if workers is None else f'{result["server"]}x{workers}'
+
+
+def _key(result):
+    return result['backend'], result['server'], result.get('workers'), result['route']
+
+
+def _row(result):
+    return (f'{result["backend"]:<7} {_server(result):<11} {result["route"]:<22} '
+            f'{result["p50_ms"]:9.2f} {result["p99_ms"]:9.2f} {result["throughput_rps"]:9.1f}  '
+            f'{",".join(f"{k}x{v}" for k, v in sorted(result["statuses"].items()))}')
+
+
+def totals(results):
+    """Print the combined throughput of every route for each backend and server."""
+    setups = {}
+    for result in results:
+        requests, seconds = setups.get(_key(result)[:3], (0, 0.0))
+        setups[_key(result)[:3]] = (requests + result['requests'],
+                                    seconds + result['requests'] / result['throughput_rps'])
+    print(f'{"backend":<7} {"server":<11} {"all routes req/s":>17}')
+    for (backend, server, workers), (requests, seconds) in setups.items():
+        label = _server({'server': server, 'workers': workers})
+        print(f'{backend:<7} {label:<11} {requests / seconds:17.1f}')
+
+
+def compare(before_path, after_path):
+    """Print p50, p99 and throughput of two saved runs side by side."""
+    with open(before_path) as f:
+        before = {_key(r): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+    print(f'{"backend":<7} {"server":<11} {"route":<22} {"p50 before":>11} {"after":>9} '
+          f'{"p99 before":>11} {"after":>9} {"req/s x":>8}')
+    for result in after:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        speedup = result['throughput_rps'] / old['throughput_rps'] if old['throughput_rps'] else float('inf')
+        print(f'{result["backend"]:<7} {_server(result):<11} {result["route"]:<22} '
+              f'{old["p50_ms"]:11.2f} {result["p50_ms"]:9.2f} {old["p99_ms"]:11.2f} {result["p99_ms"]:9.2f} '
+              f'{speedup:7.2f}x')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.load')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--purchases', type=int, default=12)
+    parser.add_argument('--deposits', type=int, default=2)
+    parser.add_argument('--goals', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', nargs='+', choices=['json', 'sqlite', 'sharded'],
+                        default=['json', 'sqlite'])
+    parser.add_argument('--server', nargs='+', choices=['client', 'wsgi', 'gunicorn'], default=['client', 'wsgi'])
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4], help='gunicorn worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--out', default='bench-results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    print(HEADER)
+    report = run(args)
+    totals(report['results'])
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Saved {len(report["results"])} results to {args.out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+recurring.py
+
+Throughput of the recurring-rule scheduler (scheduler.py) on synthetic users
+that each have a few monthly and weekly rules, catching up on three months.
+
+Usage (from the backend directory):
+    python -m bench.recurring [--users 5000] [--rules 4] [--backend json|binary|sqlite]
+
+Every case starts from a fresh copy of the data. It compares the scheduler's
+batched commits with one commit per user (batch size 1), which is close to
+what entering the occurrences through the API would cost. "binary" is the
+JSON store with its data file in the binary snapshot format, whose
+compactions (triggered by large batches) are much cheaper than rewriting
+an indented data.json.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+import scheduler
+from storage import snapshot
+from storage.json_store import JsonStore
+from storage.sqlite_store import SqliteStore
+
+from .datagen import generate_users
+
+START = date(2024, 1, 1)
+UNTIL = date(2024, 3, 31)
+
+
+def add_rules(users, rules, seed=0):
+    """Give every user rules monthly and weekly rules that start on START."""
+    rng = random.Random(seed)
+    for user in users:
+        user[scheduler.RULES] = []
+        for rule_id in range(rules):
+            if rule_id % 2:
+                rule = {'type': 'deposit', 'item': {'name': 'Salary', 'depositAmount': 500.0},
+                        'frequency': 'weekly', 'day': rng.randrange(7)}
+            else:
+                rule = {'type': 'purchase', 'item': {'name': 'Subscription', 'purchaseCategory': 'Bills',
+                                                     'purchaseCost': -round(rng.uniform(5, 50), 2)},
+                        'frequency': 'monthly', 'day': rng.randint(1, 31)}
+            rule.update(ruleId=rule_id, start=START.isoformat(), end=None)
+            rule['nextDate'] = scheduler.first_occurrence(rule, START).isoformat()
+            user[scheduler.RULES].append(rule)
+
+
+def open_store(backend, directory, users):
+    if backend == 'json':
+        path = os.path.join(directory, 'data.json')
+        with open(path, 'w') as f:
+            json.dump(users, f)
+        return JsonStore(path)
+    if backend == 'binary':
+        path = os.path.join(directory, 'data.snap')
+        snapshot.save(users, path, snapshot.BINARY)
+        return JsonStore(path)
+    store = SqliteStore(os.path.join(directory, 'budget.db'))
+    store.import_users(users)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench.recurring')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--rules', type=int, default=4)
+    parser.add_argument('--backend', choices=['json', 'binary', 'sqlite'], default='json')
+    args = parser.parse_args()
+
+    users = generate_users(args.users, purchases=2, deposits=1)
+    add_rules(users, args.rules)
+    print(f'{args.users} users with {args.rules} rules each, {args.backend} store, '
+          f'catching up from {START} to {UNTIL}')
+    print(f'{"batch":>6} {"commits":>8} {"occurrences":>12} {"seconds":>8} {"per second":>11}')
+    for batch_users in (1, scheduler.BATCH_USERS):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = open_store(args.backend, tmp, users)
+            start = time.perf_counter()
+            stats = scheduler.run(store, UNTIL, batch_users=batch_users)
+            elapsed = time.perf_counter() - start
+            if hasattr(store, 'close'):
+                store.close()
+        print(f'{batch_users:>6} {stats["commits"]:>8} {stats["occurrences"]:>12} '
+              f'{elapsed:8.2f} {stats["occurrences"] / elapsed:11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+reports.py
+
+Benchmark of the pandas reports in reporting.py against a naive per-user
+Python loop producing the same numbers.
+
+Usage (from the backend directory):
+    python -m bench.reports [--users 100000] [--purchases 12] [--repeat 3]
+
+The frames are built once (the cost paid after each change to the data) and
+each report then runs on the cached frames; both times are printed next to
+the loop's.
+"""
+
+import argparse
+import statistics
+import time
+from collections import defaultdict
+
+from reporting import Frames, budget_vs_actual, cohorts, spending
+from storage import user_key
+from storage.rollups import UNCATEGORIZED, month_of
+
+from .datagen import generate_users
+
+
+def naive_spending(users):
+    totals = defaultdict(lambda: [0.0, 0.0, 0, set()])
+    for user in users:
+        for item in user.get('purchases') or []:
+            cell = totals[(month_of(item.get('purchaseDate')), item.get('purchaseCategory') or UNCATEGORIZED)]
+            cost = float(item.get('purchaseCost') or 0)
+            if cost < 0:
+                cell[0] -= cost
+            else:
+                cell[1] += cost
+            cell[2] += 1
+            cell[3].add(user_key(user))
+    return {key: (spent, income, count, len(ids)) for key, (spent, income, count, ids) in totals.items()}
+
+
+def naive_budget(users, month):
+    rows = []
+    for user in users:
+        budget = float(user.get('totalMonthlyBudget') or 0)
+        spent = 0.0
+        for item in user.get('purchases') or []:
+            cost = float(item.get('purchaseCost') or 0)
+            if cost < 0 and month_of(item.get('purchaseDate')) == month:
+                spent -= cost
+        rows.append((user_key(user), budget, spent, budget - spent, 0 < budget < spent))
+    return rows
+
+
+def naive_cohorts(users):
+    groups = defaultdict(list)
+    for user in users:
+        spent, months = 0.0, set()
+        for item in user.get('purchases') or []:
+            cost = float(item.get('purchaseCost') or 0)
+            months.add(month_of(item.get('purchaseDate')))
+            if cost < 0:
+                spent -= cost
+        monthly = spent / len(months) if months else 0.0
+        budget = float(user.get('totalMonthlyBudget') or 0)
+        groups[month_of(user.get('timestamp'))].append(
+            (float(user.get('currentBalance') or 0), monthly, 0 < budget < monthly))
+    return {
+        cohort: (len(rows), statistics.mean(r[0] for r in rows), statistics.median(r[0] for r in rows),
+                 statistics.mean(r[1] for r in rows), statistics.median(r[1] for r in rows),
+                 sum(r[2] for r in rows) / len(rows))
+        for cohort, rows in groups.items()
+    }
+
+
+def best_of(repeat, func, *args):
+    """Return the fastest wall time of repeat calls, and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench.reports')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--purchases', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    users = generate_users(args.users, args.purchases)
+    purchases = sum(len(user['purchases']) for user in users)
+    print(f'{args.users} users, {purchases} purchases (best of {args.repeat})')
+
+    build, frames = best_of(args.repeat, Frames.from_users, users)
+    month = frames.latest_month()
+    print(f'{"build frames":<12} {build * 1000:10.1f} ms')
+    print(f'{"report":<12} {"loop ms":>10} {"pandas ms":>10} {"speedup":>8}')
+    cases = [
+        ('spending', (naive_spending, users), (spending, frames)),
+        ('budget', (naive_budget, users, month), (budget_vs_actual, frames, month)),
+        ('cohorts', (naive_cohorts, users), (cohorts, frames)),
+    ]
+    for name, naive, vectorized in cases:
+        loop, _ = best_of(args.repeat, *naive)
+        fast, _ = best_of(args.repeat, *vectorized)
+        print(f'{name:<12} {loop * 1000:10.1f} {fast * 1000:10.1f} {loop / fast:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
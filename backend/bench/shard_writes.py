@@ -0,0 +1,97 @@
+"""
+shard_writes.py
+
+Latency of single-user writes as the number of users grows, with all users in
+one data file (JsonStore) and split over shards of about --per-shard users
+each (ShardedStore).
+
+Usage (from the backend directory):
+    python -m bench.shard_writes [--users 2000 10000 40000] [--writes 3000] [--per-shard 1000]
+
+Every write adds one purchase to a random user in its own transaction, as
+PATCH /api/data/purchase/<id> does. "first" is the first write, which
+includes opening the store (and, for the sharded store, loading only one
+shard). Every user is then read once so that the other columns show steady
+state. The journal limit is lowered (--compact-kb) so that the runs include
+compactions, which rewrite the whole data file of the JSON store but only one
+shard of the sharded store.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from storage import sharded_store
+from storage.json_store import JsonStore
+from storage.sharded_store import ShardedStore
+
+from .datagen import generate_users
+
+
+def open_store(kind, directory, users, per_shard, compact_bytes):
+    if kind == 'json':
+        path = os.path.join(directory, 'data.json')
+        with open(path, 'w') as f:
+            json.dump(users, f)
+        return JsonStore(path, compact_bytes)
+    path = os.path.join(directory, 'data.shards')
+    sharded_store.create(path, users, max(1, len(users) // per_shard))
+    return ShardedStore(path, compact_bytes=compact_bytes)
+
+
+def write(store, user_id, rng):
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        cost = -round(rng.uniform(1, 100), 2)
+        item = {'purchaseId': tx.allocate_id(user_id, user, 'purchases'), 'name': 'Bench',
+                'purchaseCost': cost, 'purchaseDate': '2024-06-01T12:00:00Z'}
+        tx.add(user_id, 'purchases', item)
+        tx.update_user(user_id, {'currentBalance': user['currentBalance'] + cost})
+
+
+def measure(kind, users, args):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(kind, tmp, users, args.per_shard, args.compact_kb * 1024)
+        start = time.perf_counter()
+        write(store, rng.randrange(len(users)), rng)
+        first = time.perf_counter() - start
+        store.all_users()
+        latencies = []
+        for _ in range(args.writes):
+            start = time.perf_counter()
+            write(store, rng.randrange(len(users)), rng)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'first': first,
+        'mean': sum(latencies) / len(latencies),
+        'p99': latencies[int(len(latencies) * 0.99)],
+        'max': latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench.shard_writes')
+    parser.add_argument('--users', type=int, nargs='+', default=[2000, 10000, 40000])
+    parser.add_argument('--writes', type=int, default=3000)
+    parser.add_argument('--per-shard', type=int, default=1000)
+    parser.add_argument('--compact-kb', type=int, default=256)
+    args = parser.parse_args()
+
+    print(f'{args.writes} single-user writes, journal compacted past {args.compact_kb}KB')
+    print(f'{"store":<8} {"users":>7} {"shards":>7} {"first ms":>9} {"mean ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for count in args.users:
+        users = generate_users(count, purchases=12, deposits=2)
+        for kind in ('json', 'sharded'):
+            result = measure(kind, users, args)
+            shards = max(1, count // args.per_shard) if kind == 'sharded' else 1
+            print(f'{kind:<8} {count:>7} {shards:>7} {result["first"] * 1000:9.1f} {result["mean"] * 1000:8.2f} '
+                  f'{result["p99"] * 1000:8.2f} {result["max"] * 1000:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
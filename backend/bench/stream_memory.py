@@ -0,0 +1,101 @@
+"""
+stream_memory.py
+
+Peak memory of returning every user: the old response, built with
+jsonify(store.all_users()), against the streamed one from routes/streaming.py.
+
+Usage (from the backend directory):
+    python -m bench.stream_memory [--users 50000] [--purchases 12]
+
+Each case runs in a fresh process. The store is opened and warmed up first,
+then the peak resident set size is read before and after one
+GET /users whose body is read and thrown away, so the growth is what the
+request itself cost.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from .datagen import generate_users
+
+
+def _peak_mb():
+    # ru_maxrss survives exec, so a child would inherit the parent's peak;
+    # VmHWM belongs to the new address space and starts from zero
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def child(backend, mode, data_file, db_file):
+    import config
+    config.DATA_FILE, config.SQLITE_PATH = data_file, db_file
+    from flask import jsonify
+    from app import app
+    from storage import create_store, set_store
+
+    store = create_store(backend)
+    set_store(store)
+    client = app.test_client()
+    # Warm up: load the JSON cache and touch the response path once
+    client.get('/users?limit=1')
+    before = _peak_mb()
+    size = 0
+    if mode == 'buffered':
+        with app.test_request_context('/users'):
+            size = len(jsonify(store.all_users()).get_data())
+    else:
+        response = client.get('/users', buffered=False)
+        for chunk in response.response:
+            size += len(chunk)
+    print(json.dumps({'before': before, 'after': _peak_mb(), 'bytes': size}))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench.stream_memory')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--purchases', type=int, default=12)
+    args = parser.parse_args()
+
+    from storage.sqlite_store import SqliteStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'data.json')
+        db_file = os.path.join(tmp, 'budget.db')
+        users = generate_users(args.users, args.purchases)
+        with open(data_file, 'w') as f:
+            json.dump(users, f)
+        store = SqliteStore(db_file)
+        store.import_users(users)
+        store.close()
+        del users
+
+        print(f'{args.users} users, data.json {os.path.getsize(data_file) / 2**20:.0f} MB')
+        print(f'{"backend":<8} {"response":<9} {"peak before":>12} {"peak after":>11} {"growth":>8}')
+        for backend in ('json', 'sqlite'):
+            for mode in ('buffered', 'streamed'):
+                out = subprocess.run(
+                    [sys.executable, '-m', 'bench.stream_memory', '--child', backend, mode, data_file, db_file],
+                    check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                growth = result['after'] - result['before']
+                print(f'{backend:<8} {mode:<9} {result["before"]:10.0f}MB {result["after"]:9.0f}MB {growth:6.0f}MB')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:6])
+    else:
+        main()
@@ -0,0 +1,63 @@
+"""
+config.py
+
+Runtime settings for the backend, read from environment variables so that
+deployments can change them without editing code.
+
+    STORAGE_BACKEND   "json" (default), "sqlite" or "sharded"
+    DATA_FILE         Path of the JSON data file (default: data.json)
+    SHARD_DIR         Directory of the sharded store (default: data.shards)
+    SHARD_COUNT       Number of shards when the sharded store is created (default: 16)
+    SQLITE_PATH       Path of the SQLite database (default: budget.db)
+                      Relative paths are relative to the backend directory.
+    SQLITE_POOL_SIZE  Number of pooled SQLite connections (default: 4)
+    SNAPSHOT_FORMAT   "json" or "binary": the format the JSON backend writes its data
+                      file in when compacting (default: keep the file's format)
+    BASE_CURRENCY     Currency of users without a preferredCurrency (default: USD)
+    RATES_FILE        Exchange rate table used for conversions (default: rates.json,
+                      see money.py); without it only same-currency amounts convert
+    ADMIN_TOKEN       Token required by the /api/admin endpoints and by exports of
+                      every user; they are disabled while it is unset
+    EXPORT_DIR        Directory of export jobs and their files (default: exports)
+    EXPORT_WORKERS    Exports run at the same time in each app process (default: 2)
+    EXPORT_KEEP       Seconds a finished export is kept (default: 86400)
+    METRICS_ENABLED   "0" turns off request metrics and GET /metrics (default: 1)
+    LOG_LEVEL         DEBUG, INFO, WARNING, ERROR or OFF (default: INFO)
+    LOG_SAMPLE_RATE   Fraction of DEBUG/INFO records kept, 0-1 (default: 1)
+    RECURRING_INTERVAL  Seconds between runs of the recurring-rule scheduler in each
+                      app process; 0 (default) leaves it to python -m scheduler
+    WEB_BIND          Address the production server listens on (default: 0.0.0.0:5001)
+    WEB_WORKERS       Worker processes of the production server (default: CPU count)
+    WEB_THREADS       Threads per worker process (default: 4)
+    WEB_TIMEOUT       Seconds before a stuck worker is restarted (default: 30)
+
+create_app() in app.py copies these into app.config, where they can be
+overridden per app.
+"""
+
+import os
+
+# The backend directory, which relative data paths are resolved against
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+DATA_FILE = os.environ.get('DATA_FILE', 'data.json')
+SHARD_DIR = os.environ.get('SHARD_DIR', 'data.shards')
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '16'))
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'budget.db')
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '4'))
+SNAPSHOT_FORMAT = os.environ.get('SNAPSHOT_FORMAT') or None
+BASE_CURRENCY = os.environ.get('BASE_CURRENCY', 'USD').upper()
+RATES_FILE = os.environ.get('RATES_FILE', 'rates.json')
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+EXPORT_KEEP = float(os.environ.get('EXPORT_KEEP', '86400'))
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1'))
+RECURRING_INTERVAL = float(os.environ.get('RECURRING_INTERVAL', '0'))
+WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5001')
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', str(os.cpu_count() or 1)))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '4'))
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', '30'))
@@ -0,0 +1,410 @@
+"""
+exports.py
+
+Statements of purchases and deposits as CSV or Parquet files.
+
+A statement has one row per purchase or deposit, in the columns of COLUMNS,
+for one user or for every user. Rows are produced one user at a time (all
+users are read in batches through Store.iter_users) and written out as they
+come: CSV row by row, Parquet one row group of ROW_GROUP_ROWS rows at a time.
+Memory use therefore depends on the longest single history, not on the size
+of the store.
+
+Amounts are as stored, in the item's currency: the "currency" column is the
+item's own currency or else the user's preferredCurrency, and "exchangeRate"
+is the rate to the user's currency recorded on foreign items (see money.py).
+
+Small statements are streamed straight into a response (routes/statements.py).
+Larger ones run as jobs on ExportJobs, a pool of EXPORT_WORKERS threads per
+app process, so request threads never wait for them. Each job keeps its
+status in EXPORT_DIR/<job id>.json and its output next to it, which lets any
+worker process of the app answer for a job that another one is running.
+Finished jobs are deleted after EXPORT_KEEP seconds.
+
+Parquet needs the optional pyarrow package; CSV has no dependencies.
+
+Usage (from the backend directory):
+    python -m exports statement.csv [--user ID] [--from DATE] [--to DATE]
+    python -m exports all.parquet --format parquet [--backend sqlite|sharded]
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import config
+import logs
+import money
+from storage import create_store, user_key
+from storage.date_index import item_key
+from storage.rollups import UNCATEGORIZED
+from storage.transaction import DATE_KEYS, ID_KEYS
+
+log = logs.get_logger('exports')
+
+CSV = 'csv'
+PARQUET = 'parquet'
+FORMATS = (CSV, PARQUET)
+
+COLUMNS = ('userId', 'type', 'id', 'date', 'name', 'category', 'amount', 'currency', 'exchangeRate')
+
+# Statement row type -> (collection, amount field, category field)
+ROW_TYPES = {
+    'purchase': ('purchases', 'purchaseCost', 'purchaseCategory'),
+    'deposit': ('deposits', 'depositAmount', 'depositCategory'),
+}
+
+# Rows buffered per Parquet row group
+ROW_GROUP_ROWS = 50000
+
+# Job states, in order
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# Key of the ExportJobs in app.extensions
+EXTENSION = 'budget.exports'
+
+_JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class ExportError(ValueError):
+    """Raised for an export that cannot be produced, such as an unknown format."""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+def _amount(value, currency):
+    # Routes accept amounts as numeric strings; a value that is no amount at all is left empty
+    try:
+        return money.number(value, currency)
+    except ValueError:
+        return None
+
+
+def _items(user, kind, start, end):
+    coll, amount_key, category_key = ROW_TYPES[kind]
+    date_key, id_key = DATE_KEYS[coll], ID_KEYS[coll]
+    items = sorted(user.get(coll) or [], key=lambda item: item_key(item, date_key, id_key))
+    uid, currency = user_key(user), money.currency_of(user)
+    for item in items:
+        date = item.get(date_key) or ''
+        if (start is not None and date < start) or (end is not None and date >= end):
+            continue
+        yield item_key(item, date_key, id_key), (
+            uid, kind, item.get(id_key), item.get(date_key), item.get('name'),
+            item.get(category_key) or (UNCATEGORIZED if kind == 'purchase' else None),
+            _amount(item.get(amount_key), item.get('currency') or currency), item.get('currency') or currency,
+            item.get('exchangeRate'))
+
+
+def user_rows(user, start=None, end=None):
+    """
+    Yield the statement rows of one user, oldest first.
+
+    Args:
+        user (dict): The user record.
+        start (str): Only include items dated on or after this, or None.
+        end (str): Only include items dated before this, or None.
+
+    Returns:
+        Iterator of tuples in the order of COLUMNS.
+    """
+    merged = heapq.merge(*(_items(user, kind, start, end) for kind in ROW_TYPES), key=lambda pair: pair[0])
+    for _, row in merged:
+        yield row
+
+
+def rows(store, user_id=None, start=None, end=None):
+    """
+    Yield the statement rows of one user or, with user_id None, of every user.
+
+    Raises:
+        LookupError: If user_id is given and there is no such user.
+    """
+    if user_id is None:
+        users = store.iter_users()
+    else:
+        user = store.get_user(user_id)
+        if user is None:
+            raise LookupError(f'User {user_id} not found')
+        users = [user]
+    for user in users:
+        yield from user_rows(user, start, end)
+
+
+def csv_chunks(rows, chunk_bytes):
+    """Yield CSV text, header first, in chunks of about chunk_bytes characters."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_csv(rows, path):
+    """
+    Write statement rows to a CSV file.
+
+    Returns:
+        int: The number of rows written.
+    """
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError('Parquet exports need the pyarrow package')
+    return pyarrow, pyarrow.parquet
+
+
+def write_parquet(rows, path, row_group_rows=ROW_GROUP_ROWS):
+    """
+    Write statement rows to a Parquet file, one row group at a time.
+
+    Returns:
+        int: The number of rows written.
+
+    Raises:
+        ExportError: If pyarrow is not installed.
+    """
+    pa, pq = _pyarrow()
+    schema = pa.schema([('userId', pa.int64()), ('type', pa.string()), ('id', pa.int64()),
+                        ('date', pa.string()), ('name', pa.string()), ('category', pa.string()),
+                        ('amount', pa.float64()), ('currency', pa.string()), ('exchangeRate', pa.float64())])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        group = []
+        for row in rows:
+            group.append(row)
+            if len(group) >= row_group_rows:
+                count += _write_group(pa, writer, schema, group)
+                group = []
+        if group or not count:
+            count += _write_group(pa, writer, schema, group)
+    return count
+
+
+def _write_group(pa, writer, schema, group):
+    columns = list(zip(*group)) if group else [()] * len(schema)
+    writer.write_table(pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+    return len(group)
+
+
+WRITERS = {CSV: write_csv, PARQUET: write_parquet}
+
+
+def check_format(export_format):
+    """
+    Check that a statement format can be written here.
+
+    Raises:
+        ExportError: For an unknown format, or Parquet without pyarrow.
+    """
+    if export_format not in FORMATS:
+        raise ExportError(f'format must be one of {", ".join(FORMATS)}')
+    if export_format == PARQUET:
+        _pyarrow()
+
+
+def export(store, path, export_format=CSV, user_id=None, start=None, end=None):
+    """
+    Write a statement to a file. The file appears only once it is complete.
+
+    Args:
+        store (Store): The store to read.
+        path (str): The file to write.
+        export_format (str): "csv" or "parquet".
+        user_id: The user to export, or None for every user.
+        start (str): Only include items dated on or after this, or None.
+        end (str): Only include items dated before this, or None.
+
+    Returns:
+        int: The number of rows written.
+    """
+    check_format(export_format)
+    tmp_path = path + '.tmp'
+    try:
+        count = WRITERS[export_format](rows(store, user_id, start, end), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+class ExportJobs:
+    """Runs exports on a thread pool, with their status kept in a directory."""
+
+    def __init__(self, directory, workers=2, keep=86400):
+        """
+        Args:
+            directory (str): Where status files and finished exports are kept.
+                Created on the first submit.
+            workers (int): Exports run at the same time.
+            keep (float): Seconds a finished job is kept.
+        """
+        self.directory = directory
+        self.workers = workers
+        self.keep = keep
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, store, export_format=CSV, user_id=None, start=None, end=None):
+        """
+        Queue an export.
+
+        Returns:
+            dict: The status of the new job.
+
+        Raises:
+            ExportError: If the format cannot be written.
+            LookupError: If user_id is given and there is no such user.
+        """
+        check_format(export_format)
+        if user_id is not None and store.get_version(user_id) is None:
+            raise LookupError(f'User {user_id} not found')
+        os.makedirs(self.directory, exist_ok=True)
+        self._expire()
+        job = {'jobId': uuid.uuid4().hex, 'status': QUEUED, 'format': export_format, 'userId': user_id,
+               'from': start, 'to': end, 'createdAt': _now(), 'finishedAt': None, 'rows': None,
+               'bytes': None, 'error': None}
+        self._save(job)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='export')
+            future = self._executor.submit(self._run, store, job)
+            self._futures[job['jobId']] = future
+        future.add_done_callback(lambda _: self._futures.pop(job['jobId'], None))
+        log.info('Queued %s export %s of user %s', export_format, job['jobId'], user_id)
+        return job
+
+    def status(self, job_id):
+        """Return the status of a job, or None if there is no such job."""
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def output_path(self, job):
+        """Return the file a job writes its export to."""
+        return os.path.join(self.directory, f"{job['jobId']}.{job['format']}")
+
+    def wait(self, job_id, timeout=None):
+        """Wait for a job started by this process to finish and return its status."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.exception(timeout)
+        return self.status(job_id)
+
+    def shutdown(self):
+        """Wait for the running exports and stop the pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _run(self, store, job):
+        self._save(dict(job, status=RUNNING))
+        started = time.perf_counter()
+        try:
+            count = export(store, self.output_path(job), job['format'], job['userId'], job['from'], job['to'])
+        except Exception as error:
+            log.exception('Export %s failed', job['jobId'])
+            self._save(dict(job, status=FAILED, finishedAt=_now(), error=str(error)))
+            return
+        self._save(dict(job, status=DONE, finishedAt=_now(), rows=count,
+                        bytes=os.path.getsize(self.output_path(job))))
+        log.info('Export %s wrote %s rows in %.1fs', job['jobId'], count, time.perf_counter() - started)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.directory, job_id + '.json')
+
+    def _save(self, job):
+        path = self._status_path(job['jobId'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(job, f)
+        os.replace(path + '.tmp', path)
+
+    def _expire(self):
+        """Delete the status and output of jobs that finished more than keep seconds ago."""
+        cutoff = time.time() - self.keep
+        for name in os.listdir(self.directory):
+            job_id, ext = os.path.splitext(name)
+            if ext != '.json' or not _JOB_ID.fullmatch(job_id):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                job = self.status(job_id)
+            except (OSError, ValueError):
+                continue
+            if job is None or job['status'] not in (DONE, FAILED):
+                continue
+            for stale in (self.output_path(job), path):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+
+def init_app(app):
+    """Give an app its ExportJobs; nothing is created on disk until an export is queued."""
+    app.extensions[EXTENSION] = ExportJobs(os.path.join(config.BASE_DIR, app.config['EXPORT_DIR']),
+                                           app.config['EXPORT_WORKERS'], app.config['EXPORT_KEEP'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m exports',
+                                     description='Write a statement of purchases and deposits.')
+    parser.add_argument('output', help='file to write')
+    parser.add_argument('--format', choices=FORMATS, help='defaults to the extension of the output file')
+    parser.add_argument('--user', type=int, help='export one user instead of everyone')
+    parser.add_argument('--from', dest='start', help='only items dated on or after this')
+    parser.add_argument('--to', dest='end', help='only items dated up to and including this')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'sharded'], help='defaults to STORAGE_BACKEND')
+    args = parser.parse_args(argv)
+
+    export_format = args.format or (PARQUET if args.output.endswith('.parquet') else CSV)
+    end = args.end + '\uffff' if args.end else None
+    try:
+        count = export(create_store(args.backend), args.output, export_format, args.user, args.start, end)
+    except (ExportError, LookupError) as error:
+        parser.error(str(error.args[0]))
+    print(f'Wrote {count} rows to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+gunicorn.conf.py
+
+Settings for serving wsgi:app with gunicorn (see wsgi.py), taken from the
+WEB_* variables in config.py.
+
+Workers share the data through the store's own coordination: the JSON
+backend locks users across processes and replays the journal written by the
+others, and the SQLite backend runs in WAL mode and resets the derived views
+of a worker when another one wrote. Every worker keeps its own copy of the
+JSON data in memory, and its own metrics.
+"""
+
+# gunicorn reads every module-level name, and "config" is one of its settings
+import config as app_config
+
+bind = app_config.WEB_BIND
+workers = app_config.WEB_WORKERS
+threads = app_config.WEB_THREADS
+worker_class = 'gthread'
+timeout = app_config.WEB_TIMEOUT
+
+# Each worker opens its own store, connections and lock file on first use
+preload_app = False
+
+
+def post_fork(server, worker):
+    # Never reuse a store (and its SQLite connections) created before the fork
+    from storage import set_store
+    set_store(None)
@@ -0,0 +1,60 @@
+"""
+logs.py
+
+Logging for the backend. Modules log through get_logger() instead of print(),
+and configure() sets up the shared "budget" logger from config.py:
+
+    LOG_LEVEL         DEBUG, INFO, WARNING, ERROR or OFF
+    LOG_SAMPLE_RATE   Fraction of DEBUG and INFO records that are written
+
+Sampling keeps per-request messages affordable on busy servers; warnings and
+errors are always written. Messages must not contain emails, passwords or
+request bodies; log ids instead.
+"""
+
+import logging
+import random
+
+import config
+
+ROOT = 'budget'
+
+
+class SampleFilter(logging.Filter):
+    """Let through a random fraction of records below WARNING."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+def get_logger(name):
+    """Return the logger for a module, under the shared "budget" logger."""
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+def configure(level=None, sample_rate=None):
+    """
+    Set the level and sampling of the backend's logs.
+
+    Args:
+        level (str): A logging level name or "OFF". Defaults to config.LOG_LEVEL.
+        sample_rate (float): Defaults to config.LOG_SAMPLE_RATE.
+    """
+    level = (level or config.LOG_LEVEL).upper()
+    sample_rate = config.LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    logger = logging.getLogger(ROOT)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    if level == 'OFF':
+        logger.setLevel(logging.CRITICAL + 1)
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler.addFilter(SampleFilter(sample_rate))
+    logger.addHandler(handler)
+    logger.setLevel(level)
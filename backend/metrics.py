@@ -0,0 +1,241 @@
+"""
+metrics.py
+
+In-process request and storage metrics, exposed in the Prometheus text format
+at GET /metrics.
+
+Recorded:
+    http_requests_total              Requests per route, method and status
+    http_request_duration_seconds    Latency histogram per route and method
+    http_request_size_bytes          Request body sizes per route
+    http_response_size_bytes         Response body sizes per route (when known)
+    storage_io_total                 Reads and writes of the data files
+    storage_io_bytes_total           Bytes read and written
+    storage_io_duration_seconds      Time spent on each read or write
+
+Latency is measured until the handler returns, which for streamed responses
+is before the body is sent. Routes are labelled with their URL rule (/api/data/purchase/<int:user_id>),
+not the concrete path, so the number of series stays fixed. Each worker
+process keeps its own numbers; a scraper sees the worker that answered.
+
+Set METRICS_ENABLED=0 to turn the hooks and the endpoint off.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + ','.join(pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _labels(self.labels, labels), value
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        pos = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[pos] += 1
+            series[-1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        bounds = [_number(float(b)) for b in self.buckets] + ['+Inf']
+        for labels, series in items:
+            total = 0
+            for bound, count in zip(bounds, series):
+                total += count
+                yield f'{self.name}_bucket', _labels(self.labels + ('le',), labels + (bound,)), total
+            yield f'{self.name}_sum', _labels(self.labels, labels), series[-1]
+            yield f'{self.name}_count', _labels(self.labels, labels), total
+
+
+class Registry:
+    """The metrics of one process."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP requests handled.', ('route', 'method', 'status')))
+LATENCY = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('route', 'method')))
+REQUEST_SIZE = REGISTRY.register(Histogram(
+    'http_request_size_bytes', 'Size of request bodies.', ('route',), SIZE_BUCKETS))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    'http_response_size_bytes', 'Size of response bodies that have a known length.', ('route',), SIZE_BUCKETS))
+IO_OPS = REGISTRY.register(Counter(
+    'storage_io_total', 'Reads and writes of the data files.', ('op', 'file')))
+IO_BYTES = REGISTRY.register(Counter(
+    'storage_io_bytes_total', 'Bytes read from and written to the data files.', ('op', 'file')))
+IO_DURATION = REGISTRY.register(Histogram(
+    'storage_io_duration_seconds', 'Time spent reading or writing the data files.', ('op', 'file')))
+
+
+@contextmanager
+def record_io(op, file):
+    """
+    Time one read or write of a data file.
+
+    Usage:
+        with record_io('write', 'journal') as io:
+            io.bytes = len(line)
+
+    Args:
+        op (str): "read" or "write".
+        file (str): Which file, e.g. "snapshot" or "journal".
+    """
+    io = _Io()
+    start = time.perf_counter()
+    try:
+        yield io
+    finally:
+        IO_DURATION.observe(time.perf_counter() - start, op, file)
+        IO_OPS.inc(op, file)
+        if io.bytes:
+            IO_BYTES.inc(op, file, amount=io.bytes)
+
+
+class _Io:
+    __slots__ = ('bytes',)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+
+def _start():
+    g.metrics_start = time.perf_counter()
+
+
+def _finish(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    route = _route()
+    LATENCY.observe(time.perf_counter() - start, route, request.method)
+    REQUESTS.inc(route, request.method, str(response.status_code))
+    if request.content_length:
+        REQUEST_SIZE.observe(request.content_length, route)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, route)
+    elif response.is_streamed:
+        # Streamed bodies are counted as they are sent
+        body = response.response = _CountedBody(response.response)
+        response.call_on_close(lambda: RESPONSE_SIZE.observe(body.bytes, route))
+    return response
+
+
+class _CountedBody:
+    """Wraps a streamed response body and counts the bytes sent."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.bytes = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.bytes += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+
+
+def metrics_endpoint():
+    """
+    GET /metrics
+    Returns the metrics of this process in the Prometheus text format.
+    """
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def install(app):
+    """Add the request hooks and the /metrics route to a Flask app, unless METRICS_ENABLED is off."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
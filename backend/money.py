@@ -0,0 +1,236 @@
+"""
+money.py
+
+Exact money arithmetic and conversion between currencies.
+
+Amounts stay plain JSON numbers in data.json and in the API, in the currency
+of their user (preferredCurrency, or BASE_CURRENCY when unset). Arithmetic on
+them is done in Decimal, read from the number's shortest decimal form (so
+0.1 is 0.1, not the binary float nearest to it) and rounded to the
+currency's minor unit only when a result is stored or returned. Sums of many
+amounts therefore do not drift the way repeated float additions do. A result
+with at most 15 significant digits converts back to a float whose JSON form
+is exactly the rounded decimal.
+
+Purchases and deposits may carry a "currency" of their own. Adding one
+converts it to the user's currency for the balance and records the rate used
+as "exchangeRate" on the item, so removing it later takes off exactly what
+adding it put on.
+
+Conversions use the rate table in RATES_FILE, loaded locally and reloaded
+when the file changes:
+
+    {"base": "USD", "date": "2025-06-01", "rates": {"EUR": 0.92, "JPY": 151.2}}
+
+meaning one unit of the base buys that many units of each currency. The rate
+between two currencies is computed once per table and then reused.
+"""
+
+import json
+import os
+import re
+import threading
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import config
+
+# Digits after the decimal point, for the ISO 4217 currencies that do not use 2
+MINOR_UNITS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0, 'PYG': 0,
+    'RWF': 0, 'UGX': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+
+ZERO = Decimal(0)
+
+_CODE = re.compile(r'[A-Z]{3}')
+
+
+class CurrencyError(ValueError):
+    """Raised for an invalid currency code or one missing from the rate table."""
+
+
+def exponent(currency):
+    """Return the number of decimal places of a currency's minor unit."""
+    return MINOR_UNITS.get(currency, 2)
+
+
+def decimal(value):
+    """
+    Return an amount as a Decimal.
+
+    Raises:
+        ValueError: If the value is not a finite number or numeric string.
+    """
+    if isinstance(value, Decimal):
+        amount = value
+    elif isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f'Not an amount: {value!r}')
+    else:
+        try:
+            amount = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f'Not an amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Not an amount: {value!r}')
+    return amount
+
+
+def quantize(amount, currency=None):
+    """Round a Decimal to the minor unit of a currency, halves away from zero."""
+    return amount.quantize(Decimal(1).scaleb(-exponent(currency)), ROUND_HALF_UP)
+
+
+def number(amount, currency=None):
+    """Return an amount rounded to the currency's minor unit, as a JSON number."""
+    amount = quantize(decimal(amount), currency)
+    return int(amount) if exponent(currency) == 0 else float(amount)
+
+
+def to_minor(amount, currency=None):
+    """Return an amount as an integer count of the currency's minor units."""
+    return int(quantize(decimal(amount), currency).scaleb(exponent(currency)))
+
+
+def from_minor(units, currency=None):
+    """Return a count of minor units as a JSON number."""
+    return number(Decimal(units).scaleb(-exponent(currency)), currency)
+
+
+def code(value):
+    """
+    Return a currency code in upper case.
+
+    Raises:
+        CurrencyError: If the value is not a three-letter code.
+    """
+    if not isinstance(value, str) or not _CODE.fullmatch(value.upper()):
+        raise CurrencyError(f'Invalid currency code: {value!r}')
+    return value.upper()
+
+
+def currency_of(user):
+    """Return the currency a user's balance and amounts are kept in."""
+    try:
+        return code(user.get('preferredCurrency'))
+    except CurrencyError:
+        return config.BASE_CURRENCY
+
+
+class RateTable:
+    """Exchange rates against a base currency, with memoized cross rates."""
+
+    def __init__(self, base, rates=None, date=None):
+        """
+        Args:
+            base (str): The base currency.
+            rates (dict): {code: units of that currency per unit of the base}.
+            date (str): The day the rates are from, for information.
+        """
+        self.base = code(base)
+        self.date = date
+        self.rates = {code(currency): decimal(rate) for currency, rate in (rates or {}).items()}
+        self.rates[self.base] = Decimal(1)
+        if any(rate <= 0 for rate in self.rates.values()):
+            raise ValueError('Exchange rates must be positive')
+        self._cross = {}
+
+    def __contains__(self, currency):
+        return currency in self.rates
+
+    def rate(self, source, target):
+        """
+        Return how many units of target one unit of source buys.
+
+        Raises:
+            CurrencyError: If either currency is not in the table.
+        """
+        key = (source, target)
+        rate = self._cross.get(key)
+        if rate is None:
+            if source == target:
+                rate = Decimal(1)
+            else:
+                for currency in key:
+                    if currency not in self.rates:
+                        raise CurrencyError(f'No exchange rate for {currency}')
+                rate = self.rates[target] / self.rates[source]
+            self._cross[key] = rate
+        return rate
+
+    def convert(self, amount, source, target):
+        """Return an amount in source converted to target, unrounded."""
+        return decimal(amount) * self.rate(source, target)
+
+
+def load_rates(path):
+    """
+    Read a rate table file.
+
+    Returns:
+        RateTable: The table, or one with only BASE_CURRENCY if there is no file.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f, parse_float=Decimal)
+    except FileNotFoundError:
+        return RateTable(config.BASE_CURRENCY)
+    return RateTable(data.get('base', config.BASE_CURRENCY), data.get('rates'), data.get('date'))
+
+
+_loaded = (None, None)  # ((path, mtime), RateTable)
+_load_lock = threading.Lock()
+
+
+def rates():
+    """Return the rate table of RATES_FILE, reading it again only when it has changed."""
+    global _loaded
+    path = os.path.join(config.BASE_DIR, config.RATES_FILE)
+    try:
+        stamp = (path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        stamp = (path, None)
+    if _loaded[0] != stamp:
+        with _load_lock:
+            if _loaded[0] != stamp:
+                _loaded = (stamp, load_rates(path))
+    return _loaded[1]
+
+
+def prepare_item(user, item):
+    """
+    Check the currency of a new purchase or deposit and record its exchange rate.
+
+    Items without a currency are in the user's currency. For any other
+    currency the rate to the user's currency is stored on the item.
+
+    Raises:
+        CurrencyError: If the currency is invalid or has no rate.
+    """
+    if item.get('currency') is None:
+        return
+    currency = item['currency'] = code(item['currency'])
+    if currency == currency_of(user):
+        item.pop('exchangeRate', None)
+    else:
+        item['exchangeRate'] = float(rates().rate(currency, currency_of(user)))
+
+
+def balance_amount(user, item, amount_key):
+    """
+    Return what an item adds to its user's balance, in the user's currency.
+
+    Raises:
+        ValueError: If the amount is not a number.
+    """
+    amount = decimal(item.get(amount_key))
+    currency = item.get('currency')
+    if currency is not None and currency != currency_of(user):
+        rate = item.get('exchangeRate')
+        amount *= decimal(rate) if rate is not None else rates().rate(currency, currency_of(user))
+    return quantize(amount, currency_of(user))
+
+
+def add(user, balance, delta):
+    """Return a balance plus a Decimal delta, in the user's currency, as a JSON number."""
+    return number(decimal(balance) + delta, currency_of(user))
@@ -0,0 +1,299 @@
+"""
+reporting.py
+
+Cross-user reports computed with pandas.
+
+All purchases, deposits and the per-user budget fields are loaded into three
+columnar DataFrames, and every report is a vectorized groupby over them
+instead of a Python loop over each user's history. The frames are cached per
+store and only rebuilt after the store reports a change.
+
+Reports:
+    spending  - Spend, income and counts per month and category
+    budget    - Each user's spend in a month against their totalMonthlyBudget
+    cohorts   - Balance and spending statistics per signup month
+
+Usage (from the backend directory):
+    python -m reporting spending [--month YYYY-MM] [--category NAME]
+    python -m reporting budget [--month YYYY-MM] [--over]
+    python -m reporting cohorts
+    python -m reporting budget --backend sqlite --csv budget.csv
+
+Purchases follow the same sign convention as the rollups: negative costs are
+money spent, positive costs are income.
+"""
+
+import argparse
+import sys
+import threading
+
+import pandas as pd
+
+from storage import create_store, user_key
+from storage.rollups import UNCATEGORIZED, UNDATED, month_of
+
+USER_COLUMNS = ['userId', 'budget', 'balance', 'income', 'cohort']
+PURCHASE_COLUMNS = ['userId', 'month', 'category', 'cost']
+DEPOSIT_COLUMNS = ['userId', 'month', 'amount']
+
+
+class Frames:
+    """Users, purchases and deposits as DataFrames."""
+
+    def __init__(self, users, purchases, deposits):
+        self.users = users
+        self.purchases = purchases
+        self.deposits = deposits
+
+    @classmethod
+    def from_users(cls, users):
+        """
+        Flatten a list of user records into frames.
+
+        Args:
+            users (list): User dictionaries in the data.json shape.
+
+        Returns:
+            Frames: The flattened data.
+        """
+        user_rows, purchase_rows, deposit_rows = [], [], []
+        for user in users:
+            uid = user_key(user)
+            if uid is None:
+                continue
+            user_rows.append((uid, user.get('totalMonthlyBudget'), user.get('currentBalance'),
+                              user.get('monthlyIncome'), month_of(user.get('timestamp'))))
+            for item in user.get('purchases') or []:
+                purchase_rows.append((uid, month_of(item.get('purchaseDate')),
+                                      item.get('purchaseCategory') or UNCATEGORIZED, item.get('purchaseCost')))
+            for item in user.get('deposits') or []:
+                deposit_rows.append((uid, month_of(item.get('depositDate')), item.get('depositAmount')))
+
+        users = pd.DataFrame.from_records(user_rows, columns=USER_COLUMNS)
+        # Lookups by id keep the first record, like the store indexes
+        users = users.drop_duplicates('userId').set_index('userId')
+        for column in ('budget', 'balance', 'income'):
+            users[column] = _numeric(users[column])
+        users['cohort'] = users['cohort'].astype('category')
+
+        purchases = pd.DataFrame.from_records(purchase_rows, columns=PURCHASE_COLUMNS)
+        purchases['cost'] = _numeric(purchases['cost'])
+        purchases['month'] = purchases['month'].astype('category')
+        purchases['category'] = purchases['category'].astype('category')
+        purchases['spent'] = (-purchases['cost']).clip(lower=0)
+        purchases['earned'] = purchases['cost'].clip(lower=0)
+
+        deposits = pd.DataFrame.from_records(deposit_rows, columns=DEPOSIT_COLUMNS)
+        # Deposits are always money in, whatever sign they were entered with
+        deposits['amount'] = _numeric(deposits['amount']).abs()
+        deposits['month'] = deposits['month'].astype('category')
+        return cls(users, purchases, deposits)
+
+    def latest_month(self):
+        """Return the most recent dated month with any purchase, or None."""
+        months = [m for m in self.purchases['month'].unique() if m != UNDATED]
+        return max(months) if months else None
+
+
+def _numeric(column):
+    return pd.to_numeric(column, errors='coerce').fillna(0.0).astype('float64')
+
+
+def spending(frames, month=None, category=None):
+    """
+    Spend, income and purchase counts per month and category across all users.
+
+    Args:
+        frames (Frames): The data to report on.
+        month (str): Only this YYYY-MM month, or None for every month.
+        category (str): Only this purchase category, or None for all.
+
+    Returns:
+        DataFrame: One row per (month, category).
+    """
+    purchases = frames.purchases
+    if month is not None:
+        purchases = purchases[purchases['month'] == month]
+    if category is not None:
+        purchases = purchases[purchases['category'] == category]
+    grouped = purchases.groupby(['month', 'category'], observed=True)
+    report = grouped.agg(spent=('spent', 'sum'), income=('earned', 'sum'),
+                         count=('cost', 'size'), users=('userId', 'nunique'))
+    return report.reset_index().sort_values(['month', 'category'], ignore_index=True)
+
+
+def budget_vs_actual(frames, month=None, over_only=False):
+    """
+    Compare every user's spending in one month with their monthly budget.
+
+    Args:
+        frames (Frames): The data to report on.
+        month (str): The YYYY-MM month. Defaults to the latest month with purchases.
+        over_only (bool): Only include users who spent more than their budget.
+
+    Returns:
+        DataFrame: One row per user with budget, spent, remaining and usedPct.
+    """
+    month = month or frames.latest_month()
+    purchases = frames.purchases[frames.purchases['month'] == month]
+    spent = purchases.groupby('userId')['spent'].sum()
+    report = frames.users[['budget']].join(spent.rename('spent'), how='left')
+    report['spent'] = report['spent'].fillna(0.0)
+    report['remaining'] = report['budget'] - report['spent']
+    budget = report['budget'].where(report['budget'] > 0)
+    report['usedPct'] = report['spent'] / budget * 100
+    report['overBudget'] = report['budget'].gt(0) & report['spent'].gt(report['budget'])
+    if over_only:
+        report = report[report['overBudget']]
+    report.insert(0, 'month', month)
+    return report.reset_index()
+
+
+def cohorts(frames):
+    """
+    Statistics per signup month (the month of the user's timestamp).
+
+    Monthly spend is a user's total spend divided by the number of months in
+    which they made any purchase.
+
+    Args:
+        frames (Frames): The data to report on.
+
+    Returns:
+        DataFrame: One row per cohort.
+    """
+    purchases = frames.purchases
+    per_user = purchases.groupby('userId').agg(spent=('spent', 'sum'),
+                                               months=('month', 'nunique'))
+    users = frames.users.join(per_user, how='left')
+    users['monthlySpend'] = (users['spent'] / users['months']).fillna(0.0)
+    users['deposited'] = frames.deposits.groupby('userId')['amount'].sum()
+    users['deposited'] = users['deposited'].fillna(0.0)
+    users['overBudget'] = users['budget'].gt(0) & users['monthlySpend'].gt(users['budget'])
+    report = users.groupby('cohort', observed=True).agg(
+        users=('budget', 'size'),
+        avgBalance=('balance', 'mean'),
+        medianBalance=('balance', 'median'),
+        avgMonthlySpend=('monthlySpend', 'mean'),
+        medianMonthlySpend=('monthlySpend', 'median'),
+        avgDeposited=('deposited', 'mean'),
+        overBudgetShare=('overBudget', 'mean'),
+    )
+    return report.reset_index().sort_values('cohort', ignore_index=True)
+
+
+REPORTS = {
+    'spending': spending,
+    'budget': budget_vs_actual,
+    'cohorts': cohorts,
+}
+
+
+def records(report):
+    """Convert a report to JSON-ready rows, rounding money and dropping NaN."""
+    report = report.round(2).astype(object)
+    report = report.where(report.notna(), None)
+    return report.to_dict(orient='records')
+
+
+class Reports:
+    """
+    Frames for one store, cached until the store changes.
+
+    The store notifies every subscribed view of each change, which bumps a
+    version number here; the frames are rebuilt on the next report if the
+    version moved since they were built.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._version = 0
+        self._built = None
+        self._results = {}
+        self._lock = threading.Lock()
+        store.subscribe(self)
+
+    def on_change(self, change):
+        self._version += 1
+
+    def reset(self, users=None):
+        self._version += 1
+
+    def frames(self):
+        """Return the cached frames, rebuilding them if the store changed."""
+        # Catch up with writes made by other processes first
+        self.store._refresh()
+        with self._lock:
+            if self._built is None or self._built[0] != self._version:
+                # Read the version first so a change made during the build
+                # leaves the result stale instead of being lost
+                version = self._version
+                self._built = (version, Frames.from_users(self.store.all_users()))
+                self._results = {}
+            return self._built[1]
+
+    def run(self, name, **params):
+        """
+        Run a report by name.
+
+        Args:
+            name (str): A key of REPORTS.
+            **params: Keyword arguments for the report function.
+
+        Returns:
+            DataFrame: The report. Results are reused until the data changes.
+        """
+        report = REPORTS[name]
+        frames = self.frames()
+        key = (name, tuple(sorted(params.items())))
+        with self._lock:
+            result = self._results.get(key)
+        if result is None:
+            result = report(frames, **params)
+            with self._lock:
+                if self._built[1] is frames:
+                    self._results[key] = result
+        return result
+
+
+_reports_lock = threading.Lock()
+
+
+def reports_for(store):
+    """Return the Reports attached to a store, creating it on first use."""
+    with _reports_lock:
+        reports = getattr(store, 'reports', None)
+        if reports is None:
+            reports = store.reports = Reports(store)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reporting', description='Cross-user reports.')
+    parser.add_argument('report', choices=sorted(REPORTS))
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'sharded'], help='defaults to STORAGE_BACKEND')
+    parser.add_argument('--month', help='YYYY-MM (spending, budget)')
+    parser.add_argument('--category', help='only this category (spending)')
+    parser.add_argument('--over', action='store_true', help='only users over budget (budget)')
+    parser.add_argument('--csv', metavar='PATH', help='write the report to a CSV file instead')
+    args = parser.parse_args(argv)
+
+    params = {}
+    if args.report in ('spending', 'budget') and args.month:
+        params['month'] = args.month
+    if args.report == 'spending' and args.category:
+        params['category'] = args.category
+    if args.report == 'budget' and args.over:
+        params['over_only'] = True
+
+    report = Reports(create_store(args.backend)).run(args.report, **params)
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+        print(f'Wrote {len(report)} rows to {args.csv}')
+    else:
+        print(report.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
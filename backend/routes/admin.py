@@ -0,0 +1,68 @@
+"""
+admin.py
+
+This module defines the admin reporting routes. Reports cover every user, so
+each request must send the configured ADMIN_TOKEN in the X-Admin-Token header;
+without a configured token the routes are disabled.
+"""
+
+from flask import Blueprint, current_app, jsonify, request
+import hmac
+import re
+from storage import get_store
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+def token_error():
+    """
+    Check the X-Admin-Token header of the current request.
+
+    @return None if it matches ADMIN_TOKEN, otherwise the error response.
+    """
+    admin_token = current_app.config.get('ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({'error': 'Admin endpoints are disabled.'}), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), admin_token.encode()):
+        return jsonify({'error': 'Invalid admin token.'}), 401
+    return None
+
+
+@admin_bp.before_request
+def check_token():
+    return token_error()
+
+
+@admin_bp.route('/reports/<name>', methods=['GET'])
+def get_report(name):
+    """
+    GET /api/admin/reports/<name>
+    Runs one of the cross-user reports in reporting.py.
+
+    Reports and their optional query parameters:
+        spending - month (YYYY-MM), category
+        budget   - month (YYYY-MM), over=true to list only users over budget
+        cohorts  - none
+
+    @param name - spending, budget or cohorts.
+    @return JSON {"report": name, "rows": [...]} or 404 for an unknown report.
+    """
+    # pandas is slow to import, so it is only loaded once a report is requested
+    import reporting
+
+    if name not in reporting.REPORTS:
+        return jsonify({'error': f'Unknown report: {name}'}), 404
+    params = {}
+    month = request.args.get('month')
+    if month is not None and name in ('spending', 'budget'):
+        if not re.fullmatch(r'\d{4}-\d{2}', month):
+            return jsonify({'error': 'month must be in YYYY-MM format.'}), 400
+        params['month'] = month
+    if name == 'spending' and request.args.get('category'):
+        params['category'] = request.args['category']
+    if name == 'budget' and request.args.get('over') == 'true':
+        params['over_only'] = True
+
+    report = reporting.reports_for(get_store()).run(name, **params)
+    return jsonify({'report': name, 'rows': reporting.records(report)}), 200
@@ -5,27 +5,26 @@ This module defines routes for handling user data in the budgeting application.
 It provides endpoints for retrieving all user data and adding a new user to the JSON-based database.
 """
 
-from flask import Blueprint, jsonify, request
-import json
-import os
-from datetime import datetime
+from flask import Blueprint
+from storage import get_store
+from routes.pagination import PageError, page_args, page_error, page_response
+from routes.streaming import stream_users
 
 all_users_bp = Blueprint('all_users', __name__, url_prefix='/api/data')
 
-# Path to your JSON file acting as the "database"
-DATA_FILE = 'data.json'
-
-# Ensure the file exists
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, 'w') as f:
-        json.dump([], f)
-
 @all_users_bp.route('', methods=['GET'])
 def get_data():
     """
     GET /api/data
     Retrieves all users data from the JSON file and returns it as a JSON response.
+    Optional query parameters limit and after return one page of users instead
+    (see routes/pagination.py). The full list is streamed, as NDJSON with
+    ?format=ndjson (see routes/streaming.py).
     """
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-    return jsonify(data), 200
\ No newline at end of file
+    try:
+        page = page_args(dated=False)
+    except PageError as error:
+        return page_error(error)
+    if page is not None:
+        return page_response(*get_store().list_users(**page))
+    return stream_users(get_store().iter_users())
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+auth.py
+
+This module defines the login route for the budgeting application. The user is
+looked up through the storage email index and only a small summary of their
+account is returned, so logging in no longer downloads every user.
+"""
+
+from flask import Blueprint, jsonify, request
+import hmac
+from storage import get_store, user_key
+
+auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+# Account fields returned on login; purchase, deposit and goal history is not included
+SUMMARY_FIELDS = ('fullName', 'email', 'preferredCurrency', 'language',
+                  'currentBalance', 'monthlyIncome', 'totalMonthlyBudget')
+
+
+@auth_bp.route('/login', methods=['POST'])
+def login():
+    """
+    POST /api/auth/login
+    Checks a user's email and password.
+
+    Expected JSON in request body:
+    {
+        "email": str,
+        "password": str
+    }
+
+    @return The user's id and account summary, or 401 if the credentials do not match.
+    """
+    credentials = request.get_json(silent=True) or {}
+    if not isinstance(credentials, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    email = credentials.get('email')
+    password = credentials.get('password')
+    if not email or not password:
+        return jsonify({'error': 'Missing email or password.'}), 400
+
+    user = get_store().get_user_by_email(email)
+    stored = user.get('password') if user is not None else None
+    if not isinstance(stored, str) or not hmac.compare_digest(stored.encode(), str(password).encode()):
+        return jsonify({'error': 'Invalid email or password.'}), 401
+
+    summary = {field: user[field] for field in SUMMARY_FIELDS if field in user}
+    summary['userId'] = user_key(user)
+    return jsonify({'user': summary}), 200
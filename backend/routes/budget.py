@@ -0,0 +1,215 @@
+"""
+budget.py
+
+This module compares each user's spending with their budget on the server.
+
+Month-to-date spend per user and per category comes from the store's running
+rollups (storage/rollups.py), so checking a budget never rescans purchases.
+Whenever a write adds spending, the routes call record_alerts() inside their
+transaction: every threshold of THRESHOLDS that the month's spending has
+reached for the first time is added to the user's "budgetAlerts" list in the
+same commit.
+
+Budgets:
+    totalMonthlyBudget  Limit for all spending in a month
+    categoryBudgets     Optional {"<purchaseCategory>": limit} for single categories
+
+Spending is the sum of negative purchaseCost values, as in the rollups.
+Budgets, spending and alerts are in the user's currency (see money.py) and
+compared as exact Decimals.
+"""
+
+import re
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request
+import money
+from storage import get_store
+from storage.rollups import UNCATEGORIZED, UNDATED, month_of
+
+budget_bp = Blueprint('budget', __name__, url_prefix='/api/data')
+
+# Percentages of a budget that raise an alert, once per month
+THRESHOLDS = (50, 80, 100)
+
+# Alerts kept per user; the oldest are dropped first
+MAX_ALERTS = 100
+
+
+def current_month():
+    """Return the current YYYY-MM month in UTC, the timezone of purchaseDate values."""
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+
+def _limit(value):
+    try:
+        value = money.decimal(value)
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def spends_of(user, purchases):
+    """
+    Return the spending a list of new purchases adds, per (month, category).
+
+    Args:
+        user (dict): The user the purchases belong to.
+        purchases (list): Purchase dictionaries about to be added, with their
+            exchange rates recorded (see money.prepare_item()).
+
+    Returns:
+        dict: {(month, category): Decimal amount spent in the user's currency}
+    """
+    spends = {}
+    for item in purchases:
+        try:
+            cost = money.balance_amount(user, item, 'purchaseCost')
+        except ValueError:
+            continue
+        if cost < 0:
+            key = (month_of(item.get('purchaseDate')), item.get('purchaseCategory') or UNCATEGORIZED)
+            spends[key] = spends.get(key, money.ZERO) - cost
+    return spends
+
+
+def new_alerts(store, user_id, user, spends):
+    """
+    Return the alerts that a change in spending raises.
+
+    Args:
+        store (Store): The store, whose rollups hold the committed spending.
+        user_id: The id of the user.
+        user (dict): The user, with the budget fields to check against.
+        spends (dict): {(month, category): spending not yet committed}. Use
+            an amount of 0 to check a month against changed budgets.
+
+    Returns:
+        list: New alert dictionaries, oldest threshold first.
+    """
+    raised = {(a.get('month'), a.get('category'), a.get('threshold')) for a in user.get('budgetAlerts') or []}
+    now = datetime.now().isoformat()
+    currency = money.currency_of(user)
+    checks = {}
+    for (month, category), amount in spends.items():
+        if month == UNDATED:
+            continue
+        checks[(month, None)] = checks.get((month, None), money.ZERO) + amount
+        checks[(month, category)] = checks.get((month, category), money.ZERO) + amount
+
+    alerts = []
+    category_budgets = user.get('categoryBudgets') or {}
+    for (month, category), amount in checks.items():
+        if category is None:
+            limit = _limit(user.get('totalMonthlyBudget'))
+        else:
+            limit = _limit(category_budgets.get(category)) if isinstance(category_budgets, dict) else None
+        if limit is None:
+            continue
+        spent = money.quantize(store.rollups.spent(user_id, month, category) + amount, currency)
+        for threshold in THRESHOLDS:
+            if spent >= limit * threshold / 100 and (month, category, threshold) not in raised:
+                alerts.append({'month': month, 'category': category, 'threshold': threshold,
+                               'spent': money.number(spent, currency), 'budget': money.number(limit, currency),
+                               'timestamp': now})
+    return alerts
+
+
+def record_alerts(store, tx, user_id, user, spends):
+    """
+    Add the alerts raised by new spending to a transaction.
+
+    Call inside store.transaction(user_id), before the block ends.
+
+    Returns:
+        list: The new alerts, empty if no threshold was reached.
+    """
+    alerts = new_alerts(store, user_id, user, spends)
+    if alerts:
+        kept = (list(user.get('budgetAlerts') or []) + alerts)[-MAX_ALERTS:]
+        tx.update_user(user_id, {'budgetAlerts': kept})
+    return alerts
+
+
+def _month_arg():
+    month = request.args.get('month')
+    if month is not None and not re.fullmatch(r'\d{4}-\d{2}', month):
+        raise ValueError('month must be in YYYY-MM format.')
+    return month
+
+
+@budget_bp.route('/<int:user_id>/budget', methods=['GET'])
+def get_budget(user_id):
+    """
+    GET /api/data/<user_id>/budget
+    Returns a user's spending against their budget for one month, taken from
+    the running totals.
+
+    Optional query parameters:
+        month - YYYY-MM, defaults to the current month
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return Budget status, in the user's currency:
+    {
+        "userId": 0, "month": "2025-05", "currency": "USD",
+        "budget": 1000.0, "spent": 812.5, "remaining": 187.5, "usedPct": 81.25, "overBudget": false,
+        "categories": {"Food & Drink": {"budget": 300.0, "spent": 310.0, "remaining": -10.0,
+                                        "usedPct": 103.33, "overBudget": true}},
+        "alerts": [...]
+    }
+    """
+    try:
+        month = _month_arg() or current_month()
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    store = get_store()
+    user = store.get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found.'}), 404
+
+    currency = money.currency_of(user)
+
+    def status(limit, spent):
+        spent = money.quantize(spent, currency)
+        return {
+            'budget': money.number(limit, currency) if limit is not None else None,
+            'spent': money.number(spent, currency),
+            'remaining': money.number(limit - spent, currency) if limit is not None else None,
+            'usedPct': money.number(spent / limit * 100) if limit else None,
+            'overBudget': limit is not None and spent > limit,
+        }
+
+    category_budgets = user.get('categoryBudgets')
+    categories = {}
+    if isinstance(category_budgets, dict):
+        for category, limit in sorted(category_budgets.items()):
+            categories[category] = status(_limit(limit), store.rollups.spent(user_id, month, category))
+    body = dict(userId=user_id, month=month, currency=currency,
+                **status(_limit(user.get('totalMonthlyBudget')), store.rollups.spent(user_id, month)))
+    body['categories'] = categories
+    body['alerts'] = [a for a in user.get('budgetAlerts') or [] if a.get('month') == month]
+    return jsonify(body), 200
+
+
+@budget_bp.route('/<int:user_id>/alerts', methods=['GET'])
+def get_alerts(user_id):
+    """
+    GET /api/data/<user_id>/alerts
+    Returns the budget alerts raised for a user, oldest first.
+
+    Optional query parameters:
+        month - YYYY-MM, only alerts for that month
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return {"alerts": [{"month", "category", "threshold", "spent", "budget", "timestamp"}, ...]}
+    """
+    try:
+        month = _month_arg()
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    user = get_store().get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found.'}), 404
+    alerts = user.get('budgetAlerts') or []
+    if month is not None:
+        alerts = [a for a in alerts if a.get('month') == month]
+    return jsonify({'alerts': alerts}), 200
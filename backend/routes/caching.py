@@ -0,0 +1,81 @@
+"""
+caching.py
+
+Conditional GET for the endpoints that return one user's data.
+
+Every transaction bumps the version of the users it changes (see
+Store.transaction()), so a user's version identifies the state of everything
+stored for them. The version is sent as the ETag, and the time of the change
+as Last-Modified. A client that sends the ETag back in If-None-Match, or the
+date in If-Modified-Since, gets 304 Not Modified with an empty body when
+nothing changed. The version is read on its own, so a 304 never loads or
+serializes the user.
+
+Usage:
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found.'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    return validated(jsonify(...), version)
+
+Versions only change through the store, so a data file edited by hand keeps
+its old ETags until the user is next changed through the API.
+"""
+
+from datetime import datetime, timezone
+from flask import current_app, request
+
+# Clients may keep responses but must check with the server before reusing one
+CACHE_CONTROL = 'private, no-cache'
+
+
+def etag(version):
+    """Return the entity tag for a user version."""
+    return f'{version.user_id}.{version.number}'
+
+
+def last_modified(version):
+    """Return the time of a user's last change as a datetime, or None if unknown."""
+    if not version.modified:
+        return None
+    try:
+        modified = datetime.fromisoformat(version.modified.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return modified.replace(microsecond=0)
+
+
+def not_modified(version):
+    """
+    Check the conditional headers of the current request against a version.
+
+    If-None-Match is used when present, If-Modified-Since otherwise.
+
+    Args:
+        version (Version): The user's current version.
+
+    Returns:
+        Response: A 304 response if the client's copy is current, else None.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag(version))
+    else:
+        modified = last_modified(version)
+        since = request.if_modified_since
+        fresh = modified is not None and since is not None and modified <= since
+    if not fresh:
+        return None
+    return validated(current_app.response_class(status=304), version)
+
+
+def validated(response, version):
+    """Add the ETag, Last-Modified and Cache-Control headers to a response."""
+    response.set_etag(etag(version))
+    response.last_modified = last_modified(version)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
-import json
 from datetime import datetime
+import money
+from storage import get_store
+from routes.caching import not_modified, validated
+from routes.goals import allocate, contribute
+from routes.pagination import PageError, page_args, page_error, page_response
 
 """
 This module defines routes for managing deposit records in the budgeting application.
@@ -8,7 +12,6 @@ It provides endpoints to retrieve, record, and delete deposit entries for users.
 """
 
 deposit_bp = Blueprint('deposits', __name__, url_prefix='/api/data/deposit')
-DATA_FILE = 'data.json' # WARNING: THIS IS DANGEROUS. MUST STORE AS AN ENVIRONMENT VARIABLE IF THIS GETS PUBLICLY DEPLOYED
 
 @deposit_bp.route('/<int:user_id>', methods=['GET'])
 def get_deposits(user_id):
@@ -16,18 +19,38 @@ def get_deposits(user_id):
     GET /api/data/deposit/<user_id>
     Retrieves the recent deposits record for a given user.
 
-    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
-    @return A JSON representation of all recent deposits made by the user.
-    """
-    new_entry = request.json
+    Optional query parameters limit, after, from, to and order return one
+    page sorted by depositDate instead (see routes/pagination.py).
 
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
+    Answers 304 when the user has not changed since the client's copy (see
+    routes/caching.py).
 
-    for user in data:
-        if user['user_id'] == user_id:
-            return jsonify(user.get('deposits', []))
-        
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return A JSON representation of all recent deposits made by the user,
+            or {"items": [...], "next": cursor} when paginated.
+    """
+    try:
+        page = page_args()
+    except PageError as error:
+        return page_error(error)
+
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found.'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    if page is not None:
+        result = store.list_items(user_id, 'deposits', **page)
+        if result is None:
+            return jsonify({'error': 'User not found.'}), 404
+        return validated(page_response(*result), version)
+
+    user = store.get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found.'}), 404
+    return validated(jsonify(user.get('deposits', [])), version)
 
 @deposit_bp.route('/<int:user_id>', methods=['PATCH'])
 def record_deposit(user_id):
@@ -37,38 +60,61 @@ def record_deposit(user_id):
 
     Expected JSON in request body:
     {
-        "depositAmount": float (amount to deposit)
+        "depositAmount": float (amount to deposit),
+        "currency": str (optional, defaults to the user's preferredCurrency),
+        "allocateToGoals": float (optional, 0 to 1; defaults to the user's "goalAllocation")
     }
 
+    A deposit in another currency is converted for the balance and the goals
+    with the rate table, and keeps the rate used as "exchangeRate".
+
+    That fraction of the deposit is shared among the user's unfinished goals
+    in the same write (see routes/goals.py).
+
     @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
-    @return Confirmation message or error if input is invalid or user not found.
+    @return Confirmation message with the goal allocations, or error if input
+            is invalid or user not found.
     """
     new_entry = request.json
 
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-
-    for user in data:
-        if user['user_id'] == user_id:
-            try:
-                if float(new_entry.get('depositAmount', 0)) < 0:
-                    return jsonify({'error': 'Cannot deposit a negative amount.'}), 400
-                user['currentBalance'] = round(user['currentBalance'] + float(new_entry['depositAmount']), 2)
-                recent_deposit = user.get('deposits', [])
-                new_entry['depositId'] = len(recent_deposit)
-                new_entry['timestamp'] = datetime.now().isoformat()
-                recent_deposit.append(new_entry)
-                user['deposits'] = recent_deposit
-                break
-            except (KeyError, TypeError, ValueError):
-                return jsonify({'error': 'Invalid or missing depositAmount value.'}), 400
-    else:
-        return jsonify({'error': 'User not found.'}), 404
-
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
-
-    return jsonify({'message': 'Deposit recorded successfully'}), 201
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+
+        try:
+            money.prepare_item(user, new_entry)
+        except money.CurrencyError as error:
+            return jsonify({'error': str(error)}), 400
+        try:
+            if money.decimal(new_entry.get('depositAmount', 0)) < 0:
+                return jsonify({'error': 'Cannot deposit a negative amount.'}), 400
+            amount = money.balance_amount(user, new_entry, 'depositAmount')
+            balance = money.add(user, user['currentBalance'], amount)
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Invalid or missing depositAmount value.'}), 400
+
+        fraction = new_entry.pop('allocateToGoals', user.get('goalAllocation'))
+        try:
+            fraction = float(fraction or 0)
+        except (TypeError, ValueError):
+            fraction = -1
+        if not 0 <= fraction <= 1:
+            return jsonify({'error': 'allocateToGoals must be a fraction between 0 and 1.'}), 400
+
+        new_entry['depositId'] = tx.allocate_id(user_id, user, 'deposits')
+        new_entry['timestamp'] = datetime.now().isoformat()
+        tx.update_user(user_id, {'currentBalance': balance})
+        tx.add(user_id, 'deposits', new_entry)
+        allocations = []
+        if fraction:
+            allocations = allocate(user.get('financialGoals') or [], amount * money.decimal(fraction),
+                                   money.currency_of(user))
+            contribute(store, tx, user_id, allocations)
+
+    return jsonify({'message': 'Deposit recorded successfully',
+                    'allocations': [{'goalId': goal_id, 'amount': amount} for goal_id, amount in allocations]}), 201
 
 
 
@@ -93,33 +139,22 @@ def delete_deposit(user_id):
     if deposit_id is None:
         return jsonify({'error': 'Missing depositId in request.'}), 400
 
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-
-    for user in data:
-        if user['user_id'] == user_id:
-            deposits = user.get('deposits', [])
-            break
-    else:
-        return jsonify({'error': 'User not found.'}), 404
-
-    for i, d in enumerate(deposits):
-        if d['depositId'] == deposit_id:
-            try:
-                user['currentBalance'] = round(user['currentBalance'] - float(d['depositAmount']), 2)
-            except (KeyError, TypeError, ValueError):
-                return jsonify({'error': 'Invalid or missing depositAmount value.'}), 400
-
-            deposits.pop(i)  # Remove the deposit from the JSON
-            # Reindex remaining deposits to ensure continuity
-            for idx, deposit in enumerate(deposits):
-                deposit['depositId'] = idx
-
-            user['deposits'] = deposits
-
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-
-            return jsonify({'message': 'Deposit deleted successfully'}), 200
-
-    return jsonify({'error': 'Deposit not found.'}), 404
\ No newline at end of file
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+        d = store.get_item(user_id, 'deposits', deposit_id)
+        if d is None:
+            return jsonify({'error': 'Deposit not found.'}), 404
+
+        try:
+            balance = money.add(user, user['currentBalance'], -money.balance_amount(user, d, 'depositAmount'))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Invalid or missing depositAmount value.'}), 400
+
+        # The other deposits keep their ids
+        tx.update_user(user_id, {'currentBalance': balance})
+        tx.remove(user_id, 'deposits', deposit_id, user)
+
+    return jsonify({'message': 'Deposit deleted successfully'}), 200
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+goals.py
+
+This module keeps financial goals up to date as money is put towards them,
+and defines the route that applies many contributions at once.
+
+Goals are read through the store's per-user id index (Store.get_item()), so a
+contribution touches only its goal, and only the changed fields of each goal
+are written. currentAmount and percentageCompleted are updated together from
+the goal's stored amount; nothing is recomputed over the user's other goals.
+
+Deposits can also fund goals as they arrive: a deposit with "allocateToGoals"
+(or a user with "goalAllocation") puts that fraction of the amount towards the
+user's unfinished goals in the same commit (see routes/deposit.py).
+
+Goal amounts are in the user's currency and added as exact Decimals (see
+money.py).
+"""
+
+from flask import Blueprint, jsonify, request
+import money
+from storage import get_store
+
+goals_bp = Blueprint('goals', __name__)
+
+# Upper limit on the contributions of one batch
+MAX_CONTRIBUTIONS = 1000
+
+
+def progress(goal, amount, currency=None):
+    """
+    Return the fields that change when an amount is added to a goal.
+
+    Args:
+        goal (dict): The goal as stored.
+        amount: The amount to add; negative amounts withdraw.
+        currency (str): The user's currency, for rounding.
+
+    Returns:
+        dict: The new currentAmount and, for goals with a target, percentageCompleted.
+    """
+    current = money.quantize((_amount(goal.get('currentAmount')) or money.ZERO) + money.decimal(amount), currency)
+    changes = {'currentAmount': money.number(current, currency)}
+    target = _amount(goal.get('targetAmount'))
+    if target:
+        changes['percentageCompleted'] = int((current / target) * 100)
+    return changes
+
+
+def _amount(value):
+    try:
+        return money.decimal(value)
+    except ValueError:
+        return None
+
+
+def _remaining(goal, currency):
+    target = _amount(goal.get('targetAmount'))
+    if not target:
+        return money.ZERO
+    return max(money.ZERO, money.quantize(target - (_amount(goal.get('currentAmount')) or money.ZERO), currency))
+
+
+def allocate(goals, amount, currency=None):
+    """
+    Split an amount among unfinished goals.
+
+    The amount is shared equally, but no goal gets more than it still needs;
+    what one goal cannot take goes to the others. Whatever is left when every
+    goal is complete is not allocated. The split is done in whole minor units
+    of the currency, with the units that do not divide evenly going to the
+    first goals, so the shares always add up to exactly the allocated amount.
+
+    Args:
+        goals (list): The user's goals.
+        amount: The amount to split.
+        currency (str): The user's currency, for rounding.
+
+    Returns:
+        list: (goalId, amount) pairs, in the order of the goals.
+    """
+    needs = {goal.get('goalId'): money.to_minor(_remaining(goal, currency), currency) for goal in goals}
+    needs = {goal_id: need for goal_id, need in needs.items() if need > 0}
+    shares = dict.fromkeys(needs, 0)
+    left = money.to_minor(amount, currency)
+    while needs and left > 0:
+        share, extra = divmod(left, len(needs))
+        for position, (goal_id, need) in enumerate(list(needs.items())):
+            given = min(share + (position < extra), need)
+            shares[goal_id] += given
+            left -= given
+            if given == need:
+                del needs[goal_id]
+            else:
+                needs[goal_id] = need - given
+    return [(goal_id, money.from_minor(share, currency)) for goal_id, share in shares.items() if share > 0]
+
+
+def contribute(store, tx, user_id, contributions):
+    """
+    Add contributions to a user's goals as part of a transaction.
+
+    Call inside store.transaction(user_id). Several contributions to one goal
+    add up, and each goal is written once.
+
+    Args:
+        store (Store): The store to read the goals from.
+        tx (Transaction): The open transaction.
+        user_id: The id of the user.
+        contributions (list): (goalId, amount) pairs.
+
+    Returns:
+        dict: {goalId: updated goal}
+
+    Raises:
+        LookupError: If a goal does not exist; nothing is added to the transaction.
+    """
+    goals, changes = {}, {}
+    currency = money.currency_of(store.get_user(user_id) or {})
+    for goal_id, amount in contributions:
+        if goal_id not in goals:
+            goal = store.get_item(user_id, 'financialGoals', goal_id)
+            if goal is None:
+                raise LookupError(goal_id)
+            goals[goal_id] = dict(goal)
+        fields = progress(goals[goal_id], amount, currency)
+        goals[goal_id].update(fields)
+        changes.setdefault(goal_id, {}).update(fields)
+    for goal_id, fields in changes.items():
+        tx.update(user_id, 'financialGoals', goal_id, fields)
+    return goals
+
+
+def _contributions(body):
+    """Parse the body of a batch into (goalId, amount) pairs, raising ValueError."""
+    if isinstance(body, dict):
+        body = body.get('contributions')
+    if not isinstance(body, list) or not body:
+        raise ValueError('Expected a non-empty list of contributions.')
+    if len(body) > MAX_CONTRIBUTIONS:
+        raise ValueError(f'At most {MAX_CONTRIBUTIONS} contributions per request.')
+    pairs = []
+    for index, entry in enumerate(body):
+        goal_id = entry.get('goalId') if isinstance(entry, dict) else None
+        amount = _amount(entry.get('amountToAdd')) if isinstance(entry, dict) else None
+        if not isinstance(goal_id, int) or isinstance(goal_id, bool) or amount is None:
+            raise ValueError(f'Contribution {index} needs an integer goalId and a numeric amountToAdd.')
+        pairs.append((goal_id, amount))
+    return pairs
+
+
+@goals_bp.route('/users/<int:user_id>/goals/contributions', methods=['POST'])
+def add_contributions(user_id):
+    """
+    POST /users/<user_id>/goals/contributions
+    Adds many contributions across a user's goals in one write. Either all of
+    them are applied or, if one names an unknown goal, none.
+
+    Expected JSON in request body:
+    {
+        "contributions": [{"goalId": 0, "amountToAdd": 25.0}, {"goalId": 2, "amountToAdd": 10}, ...]
+    }
+    (a bare list of contributions is accepted as well)
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return {"goals": [updated goal, ...]}, in the order the goals first appear
+    """
+    try:
+        contributions = _contributions(request.get_json(silent=True))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        if store.get_user(user_id) is None:
+            return jsonify({'error': 'User not found'}), 404
+        try:
+            goals = contribute(store, tx, user_id, contributions)
+        except LookupError as error:
+            return jsonify({'error': f'Goal {error.args[0]} not found'}), 404
+    return jsonify({'goals': list(goals.values())}), 200
@@ -0,0 +1,214 @@
+"""
+ingest.py
+
+This module defines the bulk import route, used to load a bank statement or
+any other batch of purchases and deposits in one request instead of one call
+per row. Every row is validated, ids are assigned in one pass, the balance is
+updated once and everything is committed as a single write.
+
+Accepted bodies:
+    application/json      {"purchases": [...], "deposits": [...]}, or an array
+                          of rows that each carry "type": "purchase" | "deposit"
+    application/x-ndjson  One JSON row per line, each with a "type"
+    text/csv              A header line, then one row per line with a type column
+
+Rows use the same fields as the single-item routes (purchaseCost,
+purchaseDate, purchaseCategory, name / depositAmount, depositDate,
+depositCategory, name). NDJSON and CSV bodies are read line by line from the
+request stream. A row may give a "currency"; it is converted for the balance
+as in the single-item routes (see money.py).
+"""
+
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+import money
+from routes.budget import record_alerts, spends_of
+from storage import get_store
+
+ingest_bp = Blueprint('ingest', __name__, url_prefix='/api/data')
+
+# Upper limit on the rows of one import
+MAX_ROWS = 10000
+
+# Row type -> (collection, id field, amount field, date field)
+ROW_TYPES = {
+    'purchase': ('purchases', 'purchaseId', 'purchaseCost', 'purchaseDate'),
+    'deposit': ('deposits', 'depositId', 'depositAmount', 'depositDate'),
+}
+
+
+class RowError(ValueError):
+    """Raised when one row of an import is invalid."""
+
+
+class TooManyRows(ValueError):
+    """Raised when an import has more than MAX_ROWS rows."""
+
+
+def read_rows():
+    """
+    Yield (type, row) pairs from the request body.
+
+    The type is None when a streamed row does not say what it is; it is
+    reported as an error for that row.
+    """
+    content_type = request.mimetype
+    if content_type == 'application/x-ndjson':
+        for line in io.TextIOWrapper(request.stream, encoding='utf-8'):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield _typed(row)
+    elif content_type == 'text/csv':
+        for row in csv.DictReader(io.TextIOWrapper(request.stream, encoding='utf-8', newline='')):
+            # Blank cells are missing fields, not empty strings
+            yield _typed({key: value for key, value in row.items() if key and value not in (None, '')})
+    else:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            for row_type, (coll, _, _, _) in ROW_TYPES.items():
+                for row in body.get(coll) or []:
+                    yield row_type, row
+        elif isinstance(body, list):
+            for row in body:
+                yield _typed(row)
+        else:
+            raise RowError('Body must be JSON, NDJSON or CSV.')
+
+
+def _typed(row):
+    if not isinstance(row, dict):
+        return None, row
+    row = dict(row)
+    return row.pop('type', None), row
+
+
+def validate(row_type, row):
+    """
+    Check one row and return the item to store.
+
+    Raises:
+        RowError: If the row is not a valid purchase or deposit.
+    """
+    if row_type not in ROW_TYPES:
+        raise RowError('type must be "purchase" or "deposit".')
+    if not isinstance(row, dict):
+        raise RowError('Row must be an object.')
+    _, id_key, amount_key, date_key = ROW_TYPES[row_type]
+    try:
+        amount = float(row[amount_key])
+    except (KeyError, TypeError, ValueError):
+        amount = math.nan
+    if not math.isfinite(amount):
+        raise RowError(f'Invalid or missing {amount_key} value.')
+    if row_type == 'deposit' and amount < 0:
+        raise RowError('Cannot deposit a negative amount.')
+    if row.get('currency') is not None:
+        try:
+            money.code(row['currency'])
+        except money.CurrencyError as error:
+            raise RowError(str(error))
+    date = row.get(date_key)
+    try:
+        datetime.fromisoformat(str(date).replace('Z', '+00:00'))
+    except ValueError:
+        raise RowError(f'Invalid or missing {date_key} value.')
+    item = dict(row, **{amount_key: amount})
+    item.pop(id_key, None)
+    return item
+
+
+@ingest_bp.route('/<int:user_id>/import', methods=['POST'])
+def import_rows(user_id):
+    """
+    POST /api/data/<user_id>/import
+    Imports a batch of purchases and deposits for a user.
+
+    Valid rows are stored and invalid ones are reported; with ?atomic=true a
+    single invalid row rejects the whole import.
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return Per-row results:
+    {
+        "imported": int,
+        "failed": int,
+        "currentBalance": float,
+        "results": [{"row": 0, "type": "purchase", "status": "ok", "id": 7},
+                    {"row": 1, "status": "error", "error": "..."}, ...],
+        "alerts": [...]  # budget thresholds reached, see routes/budget.py
+    }
+    """
+    atomic = request.args.get('atomic') == 'true'
+
+    # Read and validate everything before taking the user's lock
+    results, accepted = [], []
+    try:
+        for index, (row_type, row) in enumerate(read_rows()):
+            if index >= MAX_ROWS:
+                raise TooManyRows()
+            try:
+                accepted.append((index, row_type, validate(row_type, row)))
+                results.append({'row': index, 'type': row_type, 'status': 'ok'})
+            except RowError as error:
+                results.append({'row': index, 'status': 'error', 'error': str(error)})
+    except TooManyRows:
+        return jsonify({'error': f'An import is limited to {MAX_ROWS} rows.'}), 413
+    except (RowError, UnicodeDecodeError) as error:
+        message = str(error) if isinstance(error, RowError) else 'Body must be UTF-8.'
+        return jsonify({'error': message}), 400
+
+    failed = len(results) - len(accepted)
+    if atomic and failed:
+        return jsonify({'imported': 0, 'failed': failed, 'results': results}), 400
+
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+        # Rows in another currency need a rate to the user's currency
+        rejected = set()
+        for index, _, item in accepted:
+            try:
+                money.prepare_item(user, item)
+            except money.CurrencyError as error:
+                rejected.add(index)
+                results[index] = {'row': index, 'status': 'error', 'error': str(error)}
+        if rejected:
+            failed += len(rejected)
+            if atomic:
+                return jsonify({'imported': 0, 'failed': failed, 'results': results}), 400
+            accepted = [entry for entry in accepted if entry[0] not in rejected]
+        delta = money.ZERO
+        now = datetime.now().isoformat()
+        for index, row_type, item in accepted:
+            coll, id_key, amount_key, _ = ROW_TYPES[row_type]
+            item[id_key] = tx.allocate_id(user_id, user, coll)
+            if row_type == 'deposit':
+                item['timestamp'] = now
+            delta += money.balance_amount(user, item, amount_key)
+            tx.add(user_id, coll, item)
+            results[index]['id'] = item[id_key]
+        balance = user.get('currentBalance')
+        try:
+            balance = money.add(user, balance, delta)
+            if accepted:
+                tx.update_user(user_id, {'currentBalance': balance})
+        except ValueError:
+            pass
+        purchases = [item for _, row_type, item in accepted if row_type == 'purchase']
+        alerts = record_alerts(store, tx, user_id, user, spends_of(user, purchases))
+
+    return jsonify({
+        'imported': len(accepted),
+        'failed': failed,
+        'currentBalance': balance,
+        'results': results,
+        'alerts': alerts,
+    }), 200
@@ -0,0 +1,118 @@
+"""
+pagination.py
+
+Helpers for the keyset pagination shared by the list endpoints.
+
+List endpoints keep returning the full array when called without parameters.
+When any of the parameters below is given they return one page instead:
+
+    limit   Maximum number of records (1-500, default 100)
+    after   Cursor returned as "next" with the previous page
+    from    Only records dated on or after this ISO date/time
+    to      Only records dated up to and including this ISO date/time
+    order   "asc" (default) or "desc" to start from the newest record
+
+    Response: {"items": [...], "next": "<cursor>" or null}
+"""
+
+import base64
+import json
+from flask import jsonify, request
+from storage import get_store
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+PAGE_PARAMS = ('limit', 'after', 'from', 'to', 'order')
+
+
+class PageError(ValueError):
+    """Raised when the pagination parameters of a request are invalid."""
+
+
+def encode_cursor(key):
+    """Turn a store cursor key into an opaque URL-safe string."""
+    if key is None:
+        return None
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _fits(value, kind):
+    # Cursors never hold booleans or negative numbers, though JSON has them
+    if isinstance(value, bool) or not isinstance(value, kind):
+        return False
+    return not isinstance(value, int) or value >= 0
+
+
+def decode_cursor(cursor, shape):
+    """
+    Turn a cursor string from a request back into a store cursor key.
+
+    Args:
+        cursor (str): The "after" parameter.
+        shape: The type of the keys of the listed records, or a tuple of the
+            types of a pair (see Store.user_cursor and Store.item_cursor).
+
+    Raises:
+        PageError: If the cursor is not a key of that shape, e.g. one returned
+            by another endpoint.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise PageError('Invalid cursor.')
+    if not isinstance(shape, tuple):
+        if not _fits(key, shape):
+            raise PageError('Invalid cursor.')
+        return key
+    if (not isinstance(key, list) or len(key) != len(shape)
+            or not all(_fits(value, kind) for value, kind in zip(key, shape))):
+        raise PageError('Invalid cursor.')
+    return tuple(key)
+
+
+def page_args(dated=True):
+    """
+    Read the pagination parameters of the current request.
+
+    Args:
+        dated (bool): Whether the listed records can be filtered by date: a
+            user's items rather than the users themselves.
+
+    Returns:
+        dict: Keyword arguments for Store.list_items()/list_users(), or None
+        if the request did not ask for a page.
+    """
+    args = request.args
+    if not any(name in args for name in PAGE_PARAMS):
+        return None
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise PageError('Invalid limit.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise PageError(f'limit must be between 1 and {MAX_LIMIT}.')
+    page = {'limit': limit}
+    if 'after' in args:
+        store = get_store()
+        page['after'] = decode_cursor(args['after'], store.item_cursor if dated else store.user_cursor)
+    if dated:
+        if args.get('order', 'asc') not in ('asc', 'desc'):
+            raise PageError('order must be "asc" or "desc".')
+        page['descending'] = args.get('order') == 'desc'
+        page['start'] = args.get('from')
+        # "to" is inclusive, so a bare date also matches times later that day
+        page['end'] = args['to'] + '\uffff' if 'to' in args else None
+    return page
+
+
+def page_response(items, next_key):
+    """Build the JSON response for one page."""
+    return jsonify({'items': items, 'next': encode_cursor(next_key)})
+
+
+def page_error(error):
+    """Build the JSON response for invalid pagination parameters."""
+    return jsonify({'error': str(error)}), 400
@@ -1,9 +1,16 @@
+import re
 from flask import Blueprint, jsonify, request
-import json
-from datetime import datetime
+import money
+from storage import get_store
+from routes.budget import record_alerts, spends_of
+from routes.caching import not_modified, validated
+from routes.pagination import PageError, page_args, page_error, page_response
 
 purchase_bp = Blueprint('purchases', __name__, url_prefix='/api/data/purchase')
-DATA_FILE = 'data.json'
+
+# Default and largest number of purchases returned by a search
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
 
 
 @purchase_bp.route('/<int:user_id>', methods=['GET'])
@@ -13,42 +20,107 @@ def get_purchase(user_id):
     Fetches all purchase records for a specific user by their user_id.
     Returns a list of purchases associated with the user.
 
-    Response: JSON array of purchase objects.
+    Optional query parameters limit, after, from, to and order return one
+    page sorted by purchaseDate instead (see routes/pagination.py).
+
+    Answers 304 when the user has not changed since the client's copy (see
+    routes/caching.py).
+
+    Response: JSON array of purchase objects, or {"items": [...], "next": cursor} when paginated.
     """
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
+    try:
+        page = page_args()
+    except PageError as error:
+        return page_error(error)
+
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found.'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    if page is not None:
+        result = store.list_items(user_id, 'purchases', **page)
+        if result is None:
+            return jsonify({'error': 'User not found.'}), 404
+        return validated(page_response(*result), version)
+
+    user = store.get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found.'}), 404
+    return validated(jsonify(user.get('purchases', [])), version)
 
-    for user in data:
-        if user['user_id'] == user_id:
-            return jsonify(user.get('purchases', []))
+@purchase_bp.route('/<int:user_id>/search', methods=['GET'])
+def search_purchases(user_id):
+    """
+    GET /api/data/purchase/<user_id>/search
+    Finds a user's purchases by the words of their name and category, with
+    counts per category and month, from an index kept in memory (see
+    storage/search.py) instead of filtering the full history on the client.
+
+    Optional query parameters:
+        q        - Words that must start words of the name or category ("cof sta")
+        category - Only purchases in this category
+        month    - YYYY-MM, only purchases in that month
+        limit    - Most purchases to return, newest first (default 50, at most 500)
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return Matches:
+    {
+        "total": 12,
+        "items": [{purchase}, ...],
+        "facets": {"category": {"Food & Drink": 9, "Shopping": 3}, "month": {"2025-04": 5, "2025-05": 7}}
+    }
+    """
+    month = request.args.get('month')
+    if month is not None and not re.fullmatch(r'\d{4}-\d{2}', month):
+        return jsonify({'error': 'month must be in YYYY-MM format.'}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        limit = -1
+    if not 0 <= limit <= MAX_SEARCH_LIMIT:
+        return jsonify({'error': f'limit must be an integer from 0 to {MAX_SEARCH_LIMIT}.'}), 400
+
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found.'}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    result = store.search.search(user_id, request.args.get('q', ''), request.args.get('category'), month, limit)
+    if result is None:
+        return jsonify({'error': 'User not found.'}), 404
+    return validated(jsonify(result), version)
 
 @purchase_bp.route('/users/<int:user_id>/transactions', methods=['POST'])
 def add_transaction(user_id):
     new_transaction = request.json
-    with open(DATA_FILE, 'r') as f:
-        users = json.load(f)
-    # Find the user
-    for user in users:
-        if user.get('user_id') == user_id or user.get('userId') == user_id:
-            if 'purchases' not in user:
-                user['purchases'] = []
-            new_transaction['purchaseId'] = len(user['purchases'])
-            user['purchases'].append(new_transaction)
-            # Update currentBalance
-            try:
-                cost = float(new_transaction.get('purchaseCost', 0))
-                if cost < 0:
-                    user['currentBalance'] = round(float(user['currentBalance']) + cost, 2)
-                else:
-                    user['currentBalance'] = round(float(user['currentBalance']) + cost, 2)
-            except (KeyError, TypeError, ValueError):
-                pass
-            break
-    else:
-        return jsonify({'error': 'User not found'}), 404
-    with open(DATA_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
-    return jsonify({'success': True, 'user': user})
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        # Find the user
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        # A purchase in another currency records its exchange rate (see money.py)
+        try:
+            money.prepare_item(user, new_transaction)
+        except money.CurrencyError as error:
+            return jsonify({'error': str(error)}), 400
+        new_transaction['purchaseId'] = tx.allocate_id(user_id, user, 'purchases')
+        tx.add(user_id, 'purchases', new_transaction)
+        # Update currentBalance
+        try:
+            cost = money.balance_amount(user, new_transaction, 'purchaseCost')
+            tx.update_user(user_id, {'currentBalance': money.add(user, user['currentBalance'], cost)})
+        except (KeyError, ValueError):
+            pass
+        # Budget thresholds this purchase reaches (see routes/budget.py)
+        alerts = record_alerts(store, tx, user_id, user, spends_of(user, [new_transaction]))
+    # The user read above is from before the commit (and may be the store's own copy)
+    return jsonify({'success': True, 'user': store.get_user(user_id), 'alerts': alerts})
 
 @purchase_bp.route('/<int:user_id>', methods=['DELETE'])
 def delete_purchase(user_id):
@@ -56,6 +128,7 @@ def delete_purchase(user_id):
     DELETE /api/data/purchase/<user_id>
     Deletes a purchase from a specific user's purchase list by matching the purchaseId.
     Also refunds the cost of the deleted purchase back to the user's current balance.
+    The month-to-date totals behind the budget checks follow the removal.
 
     Expected JSON in request body:
     {
@@ -71,34 +144,22 @@ def delete_purchase(user_id):
     if purchase_id is None:
         return jsonify({'error': 'Missing purchaseId in request.'}), 400
 
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-
-    for user in data:
-        if user.get('user_id') == user_id or user.get('userId') == user_id or user.get('id') == user_id:
-            purchases = user.get('purchases', [])
-            break
-    else:
-        return jsonify({'error': 'User not found.'}), 404
-
-    for i, p in enumerate(purchases):
-        if p['purchaseId'] == purchase_id:
-            try:
-                cost = float(p['purchaseCost'])
-                user['currentBalance'] = round(float(user['currentBalance']) - cost, 2)
-            except (KeyError, TypeError, ValueError):
-                return jsonify({'error': 'Invalid or missing purchaseCost value.'}), 400
-
-            purchases.pop(i)  # Remove the purchase from the JSON
-            # Reindex remaining purchases to ensure continuity
-            for idx, purchase in enumerate(purchases):
-                purchase['purchaseId'] = idx
-
-            user['purchases'] = purchases
-
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-
-            return jsonify({'message': 'Purchase deleted successfully'}), 200
-
-    return jsonify({'error': 'Purchase not found.'}), 404
\ No newline at end of file
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+        p = store.get_item(user_id, 'purchases', purchase_id)
+        if p is None:
+            return jsonify({'error': 'Purchase not found.'}), 404
+
+        try:
+            balance = money.add(user, user['currentBalance'], -money.balance_amount(user, p, 'purchaseCost'))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Invalid or missing purchaseCost value.'}), 400
+
+        # The other purchases keep their ids
+        tx.update_user(user_id, {'currentBalance': balance})
+        tx.remove(user_id, 'purchases', purchase_id, user)
+
+    return jsonify({'message': 'Purchase deleted successfully'}), 200
\ No newline at end of file
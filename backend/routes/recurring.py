@@ -0,0 +1,146 @@
+"""
+recurring.py
+
+This module defines the routes that manage a user's recurring rules. The
+occurrences themselves are created by scheduler.py, not by these routes.
+"""
+
+from datetime import date
+from flask import Blueprint, jsonify, request
+import money
+import scheduler
+from storage import get_store
+
+recurring_bp = Blueprint('recurring', __name__, url_prefix='/api/data')
+
+# Upper limit on the rules of one user
+MAX_RULES = 100
+
+
+def parse_rule(body):
+    """
+    Validate a new rule and return it in its stored form, without a ruleId.
+
+    Raises:
+        ValueError: With a message for the client if the rule is invalid.
+    """
+    if not isinstance(body, dict):
+        raise ValueError('Expected a JSON object.')
+    kind = body.get('type')
+    if kind not in scheduler.RULE_TYPES:
+        raise ValueError('type must be "purchase" or "deposit".')
+    amount_key = scheduler.RULE_TYPES[kind][2]
+    item = body.get('item')
+    if not isinstance(item, dict):
+        raise ValueError('item must be an object with the fields of each occurrence.')
+    try:
+        amount = float(item[amount_key])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'item.{amount_key} must be a number.')
+    if kind == 'deposit' and amount < 0:
+        raise ValueError('Cannot deposit a negative amount.')
+    if item.get('currency') is not None:
+        item = dict(item, currency=money.code(item['currency']))
+
+    frequency = body.get('frequency')
+    if frequency not in scheduler.FREQUENCIES:
+        raise ValueError('frequency must be "monthly" or "weekly".')
+    day = body.get('day')
+    low, high = (1, 31) if frequency == 'monthly' else (0, 6)
+    if not isinstance(day, int) or isinstance(day, bool) or not low <= day <= high:
+        raise ValueError(f'day must be an integer from {low} to {high} for {frequency} rules.')
+
+    try:
+        start = date.fromisoformat(body['start']) if body.get('start') else scheduler.today()
+        end = date.fromisoformat(body['end']) if body.get('end') else None
+    except (TypeError, ValueError):
+        raise ValueError('start and end must be dates in YYYY-MM-DD format.')
+    if end is not None and end < start:
+        raise ValueError('end must not be before start.')
+
+    rule = {'type': kind, 'item': item, 'frequency': frequency, 'day': day,
+            'start': start.isoformat(), 'end': end and end.isoformat()}
+    first = scheduler.first_occurrence(rule, start)
+    rule['nextDate'] = first.isoformat() if end is None or first <= end else None
+    return rule
+
+
+@recurring_bp.route('/<int:user_id>/recurring', methods=['GET'])
+def get_rules(user_id):
+    """
+    GET /api/data/<user_id>/recurring
+    Returns a user's recurring rules.
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return {"rules": [...]}
+    """
+    user = get_store().get_user(user_id)
+    if user is None:
+        return jsonify({'error': 'User not found.'}), 404
+    return jsonify({'rules': user.get(scheduler.RULES) or []}), 200
+
+
+@recurring_bp.route('/<int:user_id>/recurring', methods=['POST'])
+def add_rule(user_id):
+    """
+    POST /api/data/<user_id>/recurring
+    Adds a recurring purchase or deposit. Occurrences from start on are
+    created by the next scheduler run.
+
+    Expected JSON in request body:
+    {
+        "type": "purchase",
+        "item": {"name": "Rent", "purchaseCost": -1200, "purchaseCategory": "Bills"},
+        "frequency": "monthly",
+        "day": 1,
+        "start": "2025-06-01",   (optional, defaults to today)
+        "end": "2026-05-31"      (optional)
+    }
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return {"rule": {...}} with its ruleId and nextDate
+    """
+    try:
+        rule = parse_rule(request.get_json(silent=True))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+        try:
+            # Occurrences are converted to the user's currency, so there must be a rate
+            money.prepare_item(user, dict(rule['item']))
+        except money.CurrencyError as error:
+            return jsonify({'error': str(error)}), 400
+        rules = list(user.get(scheduler.RULES) or [])
+        if len(rules) >= MAX_RULES:
+            return jsonify({'error': f'At most {MAX_RULES} recurring rules per user.'}), 400
+        rule = dict(ruleId=tx.allocate_id(user_id, user, scheduler.RULES), **rule)
+        tx.update_user(user_id, {scheduler.RULES: rules + [rule]})
+    return jsonify({'rule': rule}), 201
+
+
+@recurring_bp.route('/<int:user_id>/recurring/<int:rule_id>', methods=['DELETE'])
+def delete_rule(user_id, rule_id):
+    """
+    DELETE /api/data/<user_id>/recurring/<rule_id>
+    Stops a recurring rule. Occurrences already created are kept.
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @param rule_id - The id of the rule. Provided by the URL variable, <int:rule_id>
+    @return Confirmation message or error if the user or rule is not found.
+    """
+    store = get_store()
+    with store.transaction(user_id) as tx:
+        user = store.get_user(user_id)
+        if user is None:
+            return jsonify({'error': 'User not found.'}), 404
+        rules = user.get(scheduler.RULES) or []
+        kept = [rule for rule in rules if rule.get('ruleId') != rule_id]
+        if len(kept) == len(rules):
+            return jsonify({'error': 'Rule not found.'}), 404
+        tx.update_user(user_id, {scheduler.RULES: kept})
+    return jsonify({'message': 'Rule deleted successfully'}), 200
@@ -0,0 +1,146 @@
+"""
+statements.py
+
+This module defines the statement export routes. A single user's statement can
+be downloaded directly as CSV, streamed out while it is produced. Everything
+else, and Parquet in particular, goes through export jobs: the request only
+queues the job (see exports.py in the backend directory), and the client
+polls its status and downloads the file once it is done.
+
+Exports of every user need the ADMIN_TOKEN in the X-Admin-Token header, as
+the admin reports do.
+"""
+
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+import exports
+from logs import get_logger
+from routes.admin import token_error
+from routes.streaming import CHUNK_BYTES
+from storage import get_store
+
+statements_bp = Blueprint('statements', __name__, url_prefix='/api')
+log = get_logger('routes.statements')
+
+MIMETYPES = {exports.CSV: 'text/csv', exports.PARQUET: 'application/vnd.apache.parquet'}
+
+
+def _dates(args):
+    # "to" is inclusive, so a bare date also matches times later that day
+    end = args.get('to')
+    return args.get('from'), end + '\uffff' if end else None
+
+
+def _jobs():
+    return current_app.extensions[exports.EXTENSION]
+
+
+def _with_urls(job):
+    job = dict(job, statusUrl=f"/api/exports/{job['jobId']}")
+    if job['status'] == exports.DONE:
+        job['downloadUrl'] = f"/api/exports/{job['jobId']}/download"
+    return job
+
+
+@statements_bp.route('/data/<int:user_id>/export', methods=['GET'])
+def export_user(user_id):
+    """
+    GET /api/data/<user_id>/export
+    Streams a user's purchases and deposits as a CSV statement, oldest first.
+
+    Optional query parameters:
+        from - only items dated on or after this ISO date/time
+        to   - only items dated up to and including this ISO date/time
+
+    @param user_id - The ID of the user to export.
+    @return CSV attachment, or 404 error if the user is not found.
+    """
+    if request.args.get('format', exports.CSV) != exports.CSV:
+        return jsonify({'error': 'Only CSV is streamed; queue other formats with POST /api/exports.'}), 400
+    store = get_store()
+    if store.get_version(user_id) is None:
+        return jsonify({'error': 'User not found'}), 404
+    rows = exports.rows(store, user_id, *_dates(request.args))
+    return Response(exports.csv_chunks(rows, CHUNK_BYTES), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename=statement-{user_id}.csv'})
+
+
+@statements_bp.route('/exports', methods=['POST'])
+def create_export():
+    """
+    POST /api/exports
+    Queues an export job and returns at once.
+
+    Body: JSON {"format": "csv" | "parquet", "userId": id, "from": date, "to": date},
+    all optional. Without userId every user is exported, which needs the admin token.
+
+    @return 202 with the job status, 400 for an invalid request or 404 for an unknown user.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    user_id = body.get('userId')
+    if user_id is None:
+        denied = token_error()
+        if denied is not None:
+            return denied
+    elif isinstance(user_id, bool) or not isinstance(user_id, int):
+        return jsonify({'error': 'userId must be an integer.'}), 400
+    if any(not isinstance(body.get(name), (str, type(None))) for name in ('from', 'to')):
+        return jsonify({'error': 'from and to must be dates.'}), 400
+    start, end = _dates(body)
+    try:
+        job = _jobs().submit(get_store(), body.get('format', exports.CSV), user_id, start, end)
+    except exports.ExportError as error:
+        return jsonify({'error': str(error)}), 400
+    except LookupError:
+        return jsonify({'error': 'User not found'}), 404
+    job = _with_urls(job)
+    return jsonify(job), 202, {'Location': job['statusUrl']}
+
+
+def _find(job_id):
+    """Return (job, None) for a job the request may see, or (None, error response)."""
+    job = _jobs().status(job_id)
+    if job is None:
+        return None, (jsonify({'error': 'Export not found'}), 404)
+    if job['userId'] is None:
+        denied = token_error()
+        if denied is not None:
+            return None, denied
+    return job, None
+
+
+@statements_bp.route('/exports/<job_id>', methods=['GET'])
+def get_export(job_id):
+    """
+    GET /api/exports/<job_id>
+    Returns the status of an export job: queued, running, done or failed, with
+    the row count and size once it is done and the error if it failed.
+
+    @param job_id - The id returned when the job was queued.
+    @return JSON job status or 404 error if there is no such job.
+    """
+    job, error = _find(job_id)
+    if error is not None:
+        return error
+    return jsonify(_with_urls(job)), 200
+
+
+@statements_bp.route('/exports/<job_id>/download', methods=['GET'])
+def download_export(job_id):
+    """
+    GET /api/exports/<job_id>/download
+    Sends the file of a finished export job.
+
+    @param job_id - The id returned when the job was queued.
+    @return The file, 409 if the job has not finished or failed, or 404 if there is no such job.
+    """
+    job, error = _find(job_id)
+    if error is not None:
+        return error
+    if job['status'] != exports.DONE:
+        return jsonify({'error': f"Export is {job['status']}.", 'status': job['status']}), 409
+    scope = 'all' if job['userId'] is None else job['userId']
+    log.debug('Sending export %s', job_id)
+    return send_file(_jobs().output_path(job), mimetype=MIMETYPES[job['format']], as_attachment=True,
+                     download_name=f"statement-{scope}.{job['format']}")
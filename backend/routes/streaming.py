@@ -0,0 +1,62 @@
+"""
+streaming.py
+
+Helpers for the endpoints that return every user.
+
+The response is written out a chunk at a time while the users are read from
+the store in batches (Store.iter_users), so neither the full list nor its
+serialized form is built in memory. The body is a JSON array, the same as
+before, or newline-delimited JSON when the client asks for it with
+?format=ndjson or an "Accept: application/x-ndjson" header.
+"""
+
+import json
+from flask import Response, request
+
+# Serialized users are sent in chunks of about this many bytes
+CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson():
+    """Return True if the request asked for newline-delimited JSON."""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def _chunks(users, ndjson):
+    parts, size = [] if ndjson else ['['], 0
+    separator = '' if ndjson else ','
+    first = True
+    for user in users:
+        text = json.dumps(user, separators=(',', ':'))
+        if ndjson:
+            text += '\n'
+        elif not first:
+            text = separator + text
+        first = False
+        parts.append(text)
+        size += len(text)
+        if size >= CHUNK_BYTES:
+            yield ''.join(parts)
+            parts, size = [], 0
+    if not ndjson:
+        parts.append(']')
+    if parts:
+        yield ''.join(parts)
+
+
+def stream_users(users, status=200):
+    """
+    Build a streamed response from an iterable of users.
+
+    Args:
+        users: Iterable of user dictionaries, normally store.iter_users().
+        status (int): HTTP status code.
+
+    Returns:
+        Response: A chunked JSON array or NDJSON response.
+    """
+    ndjson = wants_ndjson()
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(_chunks(users, ndjson), status=status, mimetype=mimetype)
@@ -0,0 +1,68 @@
+"""
+sync.py
+
+This module defines the delta sync route. A client keeps the "seq" of its
+last sync and asks for what changed since then, instead of downloading the
+whole user with every purchase, deposit and goal again.
+
+The seq is the user's version, which every write bumps (see
+storage/transaction.py). Changes come from the store's in-memory change log
+(storage/changelog.py); when it no longer covers the requested range the
+response is a full snapshot instead, and the client replaces its copy.
+
+Clients should apply inserts and updates as upserts by id and ignore deletes
+of records they do not have.
+"""
+
+from flask import Blueprint, jsonify, request
+from storage import get_store, version_of
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+
+@sync_bp.route('/<int:user_id>', methods=['GET'])
+def sync(user_id):
+    """
+    GET /api/sync/<user_id>?since=<seq>
+    Returns the changes made to a user after the given seq.
+
+    Without since, or when the change log does not reach back that far, the
+    whole user is returned with "full": true.
+
+    @param user_id - The id of the user. Provided by the URL variable, <int:user_id>
+    @return Changes:
+    {
+        "userId": 0,
+        "seq": 42,
+        "full": false,
+        "changes": [{"seq": 41, "type": "purchases", "op": "insert", "id": 7, "record": {...}},
+                    {"seq": 42, "type": "deposits", "op": "delete", "id": 2, "record": null},
+                    {"seq": 42, "type": "profile", "op": "update", "id": null,
+                     "record": {"currentBalance": 120.5}}]
+    }
+    or a snapshot: {"userId": 0, "seq": 42, "full": true, "user": {...}}
+    """
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            return jsonify({'error': 'since must be a non-negative integer.'}), 400
+
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({'error': 'User not found.'}), 404
+
+    changes = None
+    if since is not None and since <= version.number:
+        changes = store.changes.since(user_id, since, version.number)
+    if changes is not None:
+        return jsonify({'userId': user_id, 'seq': version.number, 'full': False, 'changes': changes}), 200
+
+    # A write may have landed since the version was read; the snapshot carries its own
+    user = store.get_user(user_id)
+    seq = version_of(user).number
+    return jsonify({'userId': user_id, 'seq': seq, 'full': True, 'user': user}), 200
@@ -6,13 +6,13 @@ It provides endpoints to add new transactions and retrieve transaction history.
 """
 
 from flask import Blueprint, request, jsonify
-import json
-import os
 from datetime import datetime
+from storage import get_store
+from routes.pagination import PageError, page_args, page_error, page_response
+from routes.streaming import stream_users
 
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/api/transactions/')
 
-DATA_FILE = 'data.json'
 
 @transactions_bp.route('/', methods=['POST'])
 def add_transaction():
@@ -32,19 +32,11 @@ def add_transaction():
         JSON: Success message and 201 status code if successful
     """
     transaction = request.json
+    store = get_store()
 
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
-    
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-    
     transaction['timestamp'] = datetime.now().isoformat()
-    data.append(transaction)
-
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    with store.transaction() as tx:
+        tx.insert(transaction)
 
     return jsonify({'message': 'Transaction added successfully'}), 201   
 
@@ -52,14 +44,20 @@ def add_transaction():
 def get_transactions():
     """
     Retrieve all transactions from the system.
+
+    Optional query parameters limit and after return one page of records
+    instead (see routes/pagination.py).
     
     Returns:
-        JSON: List of all transactions, or empty list if no transactions exist
+        JSON: List of all transactions, streamed (NDJSON with ?format=ndjson),
+              or empty list if no transactions exist
     """
-    if not os.path.exists(DATA_FILE):
-        return jsonify([]), 200
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-    return jsonify(data), 200
+    try:
+        page = page_args(dated=False)
+    except PageError as error:
+        return page_error(error)
+    if page is not None:
+        return page_response(*get_store().list_users(**page))
+    return stream_users(get_store().iter_users())
     
     
\ No newline at end of file
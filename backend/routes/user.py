@@ -6,38 +6,67 @@ It provides endpoints for retrieving all user data and adding a new user to the
 """
 
 from flask import Blueprint, jsonify, request
-import json
-import os
+import re
 from datetime import datetime
+from logs import get_logger
+import money
+from routes.caching import not_modified, validated
+from storage import get_store
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/data')
-
-# Path to your JSON file acting as the "database"
-DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data.json')
-DATA_FILE = os.path.abspath(DATA_FILE)
-
-# Ensure the file exists
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, 'w') as f:
-        json.dump([], f)
+log = get_logger('routes.user')
 
 @user_bp.route('/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """
     GET /api/data/<user_id>
     Retrieves a specific user's data from the JSON database based on user_id.
+    Answers 304 when If-None-Match or If-Modified-Since show the client's
+    copy is current (see routes/caching.py).
 
     @param user_id - The ID of the user to retrieve.
-    @return JSON user data or 404 error if not found.
+    @return JSON user data, 304 if unchanged, or 404 error if not found.
     """
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-
-    for user in data:
-        if user["user_id"] == user_id:
-            return jsonify(user), 200
+    store = get_store()
+    version = store.get_version(user_id)
+    if version is None:
+        return jsonify({"message": "User not found."}), 404
+    unchanged = not_modified(version)
+    if unchanged is not None:
+        return unchanged
+    return validated(jsonify(store.get_user(user_id)), version), 200
+
+
+@user_bp.route('/<int:user_id>/summary', methods=['GET'])
+def get_summary(user_id):
+    """
+    GET /api/data/<user_id>/summary
+    Returns a user's spending and deposit totals, overall, per category and per month.
+    The totals come from running rollups that are updated on every purchase and
+    deposit change, so no purchase history is scanned to answer.
+
+    Optional query parameters:
+        month    - YYYY-MM, only totals for that month
+        category - only purchases in that purchaseCategory
+        currency - convert the totals to this currency (default: the user's
+                   preferredCurrency) with the rate table of money.py
+
+    @param user_id - The ID of the user to summarize.
+    @return JSON summary or 404 error if not found.
+    """
+    month = request.args.get('month')
+    if month is not None and not re.fullmatch(r'\d{4}-\d{2}', month):
+        return jsonify({"message": "month must be in YYYY-MM format."}), 400
 
-    return jsonify({"message": "User not found."}), 404
+    try:
+        currency = request.args.get('currency')
+        currency = money.code(currency) if currency is not None else None
+        summary = get_store().rollups.summary(user_id, month, request.args.get('category'), currency)
+    except money.CurrencyError as error:
+        return jsonify({"message": str(error)}), 400
+    if summary is None:
+        return jsonify({"message": "User not found."}), 404
+    return jsonify(summary), 200
 
 
 @user_bp.route('', methods=['POST'])
@@ -64,15 +93,12 @@ def add_user():
     The function automatically assigns a user_id and a current timestamp to the new user.
     """
     new_entry = request.json
-    with open(DATA_FILE, 'r') as f:
-        data = json.load(f)
-
-    new_entry['userId'] = len(data)
-    new_entry['timestamp'] = datetime.now().isoformat()
-    data.append(new_entry)
+    store = get_store()
 
-    with open(DATA_FILE, 'w') as f:
-        print('Writing to:', DATA_FILE)
-        json.dump(data, f, indent=4)
+    with store.transaction() as tx:
+        new_entry['userId'] = store.next_user_id()
+        new_entry['timestamp'] = datetime.now().isoformat()
+        tx.insert(new_entry)
+    log.info('Added user %s to %r', new_entry['userId'], store)
 
     return jsonify({'message': 'Data added successfully'}), 201
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+scheduler.py
+
+Recurring purchases and deposits, such as rent, subscriptions and salary.
+
+Each user keeps their rules in "recurringRules" (managed through
+routes/recurring.py). A rule holds the fields of the purchase or deposit to
+create, how often it repeats and "nextDate", the first occurrence that has
+not been created yet. run() creates every due occurrence across all users and
+moves each rule's nextDate past them. The due users are written in batches
+(Store.batch()), one commit per BATCH_USERS users instead of one per
+occurrence, and their balances are updated once per user.
+
+Runs are safe to repeat or overlap: every user is read again under its lock
+and only occurrences from nextDate on are created. After downtime a run
+catches up on every occurrence that was missed; with catch_up=False only the
+latest due occurrence of each rule is created and the older ones are skipped.
+An occurrence that cannot be created, such as one in a currency that lost its
+exchange rate, stays due and holds its rule back until a later run manages.
+
+Rules:
+    {"ruleId": 0, "type": "purchase" | "deposit",
+     "item": {"name": "Rent", "purchaseCost": -1200, "purchaseCategory": "Bills"},
+     "frequency": "monthly" | "weekly",
+     "day": 1-31 for monthly rules (shorter months use their last day),
+            0-6 for weekly rules (Monday is 0),
+     "start": "YYYY-MM-DD", "end": "YYYY-MM-DD" or null,
+     "nextDate": "YYYY-MM-DD" or null once the rule has ended}
+
+Usage (from the backend directory):
+    python -m scheduler [--date YYYY-MM-DD] [--skip-missed] [--backend sqlite|sharded]
+
+Set RECURRING_INTERVAL to a number of seconds to run it from a background
+thread of the app instead (see Scheduler).
+"""
+
+import argparse
+import calendar
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import logs
+import money
+from routes.budget import record_alerts, spends_of
+from storage import create_store, user_key
+
+log = logs.get_logger('scheduler')
+
+RULES = 'recurringRules'
+
+# Rule type -> (collection, id field, amount field, date field)
+RULE_TYPES = {
+    'purchase': ('purchases', 'purchaseId', 'purchaseCost', 'purchaseDate'),
+    'deposit': ('deposits', 'depositId', 'depositAmount', 'depositDate'),
+}
+
+FREQUENCIES = ('monthly', 'weekly')
+
+# Users written per commit
+BATCH_USERS = 500
+
+# Occurrences of one rule created per run; a rule further behind finishes on the next run
+MAX_OCCURRENCES = 1000
+
+
+def today():
+    """Return the current date in UTC, the timezone of stored dates."""
+    return datetime.now(timezone.utc).date()
+
+
+def _monthly(year, month, day):
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def first_occurrence(rule, start):
+    """Return the first date on or after start on which a rule falls."""
+    if rule['frequency'] == 'weekly':
+        return start + timedelta(days=(rule['day'] - start.weekday()) % 7)
+    candidate = _monthly(start.year, start.month, rule['day'])
+    if candidate < start:
+        candidate = next_occurrence(rule, candidate)
+    return candidate
+
+
+def next_occurrence(rule, previous):
+    """Return the date a rule falls on after the given occurrence."""
+    if rule['frequency'] == 'weekly':
+        return previous + timedelta(days=7)
+    year, month = divmod(previous.year * 12 + previous.month, 12)
+    return _monthly(year, month + 1, rule['day'])
+
+
+def due_dates(rule, until):
+    """
+    Return the occurrences of a rule that are due, oldest first.
+
+    Args:
+        rule (dict): A stored rule.
+        until (date): The last day to include.
+
+    Returns:
+        tuple: (dates, next date) where next date is the first occurrence
+        left for later, or None once the rule has ended.
+    """
+    if not rule.get('nextDate'):
+        return [], None
+    current = date.fromisoformat(rule['nextDate'])
+    end = date.fromisoformat(rule['end']) if rule.get('end') else None
+    dates = []
+    while current <= until and (end is None or current <= end) and len(dates) < MAX_OCCURRENCES:
+        dates.append(current)
+        current = next_occurrence(rule, current)
+    if end is not None and current > end:
+        current = None
+    return dates, current
+
+
+def is_due(user, until):
+    """Return whether any of a user's rules has an occurrence due by a date."""
+    until = until.isoformat()
+    return any(rule.get('nextDate') and rule['nextDate'] <= until for rule in user.get(RULES) or [])
+
+
+def materialize(store, tx, user_id, user, until, catch_up=True):
+    """
+    Add a user's due occurrences to a transaction.
+
+    Call while holding the user's lock, with the user as read under it.
+
+    Returns:
+        int: The number of purchases and deposits created.
+    """
+    rules, created, purchases = [], 0, []
+    # As with a new purchase or deposit, a user without a balance starts from zero
+    balance = user.get('currentBalance')
+    if balance is None:
+        balance = 0
+    for rule in user.get(RULES) or []:
+        dates, upcoming = due_dates(rule, until)
+        if not dates:
+            rules.append(rule)
+            continue
+        if not catch_up:
+            dates = dates[-1:]
+        coll, id_key, amount_key, date_key = RULE_TYPES[rule['type']]
+        next_date = upcoming.isoformat() if upcoming else None
+        for day in dates:
+            item = dict(rule['item'])
+            try:
+                money.prepare_item(user, item)
+                balance = money.add(user, balance, money.balance_amount(user, item, amount_key))
+            except ValueError as error:
+                # Rules are checked when added, but a rate can leave the table later and a
+                # balance can be set to something that is not an amount
+                log.warning('Could not create the %s occurrence of rule %s of user %s, '
+                            'retrying on the next run: %s', day, rule['ruleId'], user_id, error)
+                next_date = day.isoformat()
+                break
+            item[id_key] = tx.allocate_id(user_id, user, coll)
+            item[date_key] = f'{day.isoformat()}T00:00:00Z'
+            item['recurringRuleId'] = rule['ruleId']
+            if coll == 'deposits':
+                item['timestamp'] = datetime.now().isoformat()
+            else:
+                purchases.append(item)
+            tx.add(user_id, coll, item)
+            created += 1
+        rules.append(dict(rule, nextDate=next_date))
+    if rules != (user.get(RULES) or []):
+        tx.update_user(user_id, {RULES: rules, 'currentBalance': balance})
+    if created:
+        record_alerts(store, tx, user_id, user, spends_of(user, purchases))
+    return created
+
+
+def run(store, until=None, catch_up=True, batch_users=BATCH_USERS):
+    """
+    Create every due occurrence of every user's recurring rules.
+
+    Args:
+        store (Store): The store to read and write.
+        until (date): The last day to create occurrences for. Defaults to today.
+        catch_up (bool): Create every missed occurrence, or only the latest
+            one of each rule.
+        batch_users (int): Users written per commit.
+
+    Returns:
+        dict: {"users": users changed, "occurrences": items created, "commits": writes}
+    """
+    until = until or today()
+    due = [user_key(user) for user in store.iter_users() if is_due(user, until)]
+    stats = {'users': 0, 'occurrences': 0, 'commits': 0}
+    for start in range(0, len(due), batch_users):
+        chunk = due[start:start + batch_users]
+        with store.batch(chunk) as tx:
+            for user_id in chunk:
+                user = store.get_user(user_id)
+                created = materialize(store, tx, user_id, user, until, catch_up) if user else 0
+                stats['users'] += bool(created)
+                stats['occurrences'] += created
+        stats['commits'] += bool(tx.ops)
+    log.info('Recurring run up to %s: %s', until, stats)
+    return stats
+
+
+class Scheduler:
+    """Runs run() for an app every few seconds from a daemon thread."""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='recurring', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        from storage import get_store
+
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    run(get_store())
+            except Exception:
+                log.exception('Recurring run failed')
+
+
+def init_app(app):
+    """Start a Scheduler for an app if its RECURRING_INTERVAL is set."""
+    interval = app.config.get('RECURRING_INTERVAL') or 0
+    if interval > 0:
+        app.extensions['budget.scheduler'] = Scheduler(app, interval).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scheduler',
+                                     description='Create the due occurrences of recurring rules.')
+    parser.add_argument('--date', type=date.fromisoformat, help='run as of this day (YYYY-MM-DD), default today')
+    parser.add_argument('--skip-missed', action='store_true',
+                        help='create only the latest due occurrence of each rule')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'sharded'], help='defaults to STORAGE_BACKEND')
+    args = parser.parse_args(argv)
+
+    stats = run(create_store(args.backend), args.date, catch_up=not args.skip_missed)
+    print(f"Created {stats['occurrences']} occurrences for {stats['users']} users in {stats['commits']} commits")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
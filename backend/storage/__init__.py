@@ -0,0 +1,134 @@
+"""
+storage
+
+Shared access layer for the budgeting "database". Route handlers call
+get_store() instead of opening and parsing data.json themselves. Every app
+built by create_app() carries one StoreHandle, so all of its blueprints use
+the same store; the store is created from the app's settings on first use,
+which keeps importing and building the app free of file I/O. Changes are made
+through store.transaction().
+
+Backends:
+    json    - data.json (or a binary snapshot, see snapshot.py) cached in memory,
+              writes journaled (json_store.py)
+    sqlite  - indexed SQLite database in WAL mode (sqlite_store.py)
+    sharded - users split over several JSON data files by id, with an email
+              directory (sharded_store.py)
+"""
+
+import os
+import threading
+
+from flask import current_app, has_app_context
+
+import config
+
+from .base import Store, user_key, version_of
+from .json_store import JsonStore
+from .sharded_store import ShardedStore
+from .sqlite_store import SqliteStore
+
+# Settings that decide which store an app gets
+STORE_SETTINGS = ('STORAGE_BACKEND', 'DATA_FILE', 'SQLITE_PATH', 'SQLITE_POOL_SIZE', 'SNAPSHOT_FORMAT',
+                  'SHARD_DIR', 'SHARD_COUNT')
+
+# Key of the StoreHandle in app.extensions
+EXTENSION = 'budget.store'
+
+
+def _setting(settings, name):
+    return getattr(config, name) if settings is None else settings[name]
+
+
+def _path(path):
+    # Relative paths are relative to the backend directory, not the working directory
+    return os.path.join(config.BASE_DIR, path)
+
+
+def create_store(backend=None, settings=None):
+    """
+    Build a store for the configured backend.
+
+    Args:
+        backend (str): "json", "sqlite" or "sharded". Defaults to the STORAGE_BACKEND setting.
+        settings (Mapping): Settings such as app.config, or None for config.py.
+
+    Returns:
+        Store: A new store instance.
+    """
+    backend = backend or _setting(settings, 'STORAGE_BACKEND')
+    if backend == 'json':
+        return JsonStore(_path(_setting(settings, 'DATA_FILE')),
+                         snapshot_format=_setting(settings, 'SNAPSHOT_FORMAT'))
+    if backend == 'sqlite':
+        return SqliteStore(_path(_setting(settings, 'SQLITE_PATH')),
+                           pool_size=_setting(settings, 'SQLITE_POOL_SIZE'))
+    if backend == 'sharded':
+        return ShardedStore(_path(_setting(settings, 'SHARD_DIR')), shards=_setting(settings, 'SHARD_COUNT'),
+                            snapshot_format=_setting(settings, 'SNAPSHOT_FORMAT'))
+    raise ValueError(f'Unknown storage backend: {backend}')
+
+
+class StoreHandle:
+    """A store that is created on first use and shared from then on."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the store, creating it on first use."""
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._factory()
+        return self._store
+
+    def replace(self, store):
+        """Swap in another store (None to create a new one on next use) and return the old one."""
+        with self._lock:
+            previous, self._store = self._store, store
+        return previous
+
+
+# Used outside of an app, and by apps that keep the settings of config.py
+_shared = StoreHandle(create_store)
+
+
+def init_app(app, store=None):
+    """
+    Give an app its store handle.
+
+    Apps whose storage settings match config.py share the process-wide store,
+    so set_store() also swaps theirs; apps configured differently get a store
+    of their own.
+
+    Args:
+        app (Flask): The app being built.
+        store (Store): Use this store instead of creating one.
+    """
+    if store is not None:
+        handle = StoreHandle(lambda: store)
+    elif all(app.config[name] == getattr(config, name) for name in STORE_SETTINGS):
+        handle = _shared
+    else:
+        settings = {name: app.config[name] for name in STORE_SETTINGS}
+        handle = StoreHandle(lambda: create_store(settings=settings))
+    app.extensions[EXTENSION] = handle
+
+
+def get_store():
+    """Return the store of the current app, or the process-wide store outside of one."""
+    handle = current_app.extensions.get(EXTENSION) if has_app_context() else None
+    return (handle or _shared).get()
+
+
+def set_store(store):
+    """
+    Replace the process-wide store, for example with one pointing at a test file.
+
+    Returns:
+        Store: The store that was in use before, or None.
+    """
+    return _shared.replace(store)
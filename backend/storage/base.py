@@ -0,0 +1,265 @@
+"""
+base.py
+
+The interface every storage backend implements. Route handlers only use the
+methods defined here, so the backend can be swapped through configuration
+without touching them.
+
+Stores also keep derived views (such as the spending rollups, the sync
+change log and the purchase search index) current. Every committed change is passed to the subscribed views
+as a Change record, and a view can build its state for one user on demand with
+paused_writes().
+"""
+
+import contextlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from .changelog import ChangeLog
+from .locks import WRITER, RangeLocks, user_region
+from .rollups import Rollups
+from .search import SearchIndex
+from .transaction import MODIFIED_KEY, VERSION_KEY, Transaction
+
+# Users fetched per read while iterating over every user
+ITER_BATCH = 500
+
+# How many times a user has been changed, and when that last happened (an ISO
+# date/time in UTC, or None for records that predate versioning)
+Version = namedtuple('Version', 'user_id number modified')
+
+
+def user_key(user):
+    """
+    Return the id of a user record.
+
+    Older records store the id under "user_id" while users created through
+    POST /api/data store it under "userId", so both are checked.
+    """
+    if 'user_id' in user:
+        return user['user_id']
+    return user.get('userId')
+
+
+def version_of(user):
+    """Return the Version of a user record, or None if there is no user."""
+    if user is None:
+        return None
+    return Version(user_key(user), user.get(VERSION_KEY) or 0, user.get(MODIFIED_KEY))
+
+
+class Store:
+    """
+    Base class for storage backends.
+
+    Subclasses provide the reads and commit(). Users are returned as plain
+    dictionaries in the same shape as the records in data.json and must be
+    treated as read-only; all changes go through transaction().
+    """
+
+    # The shape of the cursor keys of list_users() and list_items(): a type,
+    # or a tuple of the types of the values of a pair
+    user_cursor = int
+    item_cursor = (str, int)
+
+    def __init__(self, path, views=True):
+        """
+        Args:
+            path (str): The data file or directory of the store.
+            views (bool): Attach the derived views. Stores that are part of
+                another store, such as the shards of a ShardedStore, leave
+                them to the outer store.
+        """
+        self.path = path
+        self.locks = RangeLocks(path + '.lock')
+        self._views = []
+        if views:
+            self.rollups = Rollups(self)
+            self.changes = ChangeLog(self)
+            self.search = SearchIndex(self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r})'
+
+    def all_users(self):
+        """Return the full list of users."""
+        raise NotImplementedError
+
+    def get_user(self, user_id):
+        """Return the user with the given id, or None."""
+        raise NotImplementedError
+
+    def get_user_by_email(self, email):
+        """Return the user with the given email address, or None."""
+        raise NotImplementedError
+
+    def get_version(self, user_id):
+        """Return the Version of the user with the given id, or None."""
+        return version_of(self.get_user(user_id))
+
+    def get_version_by_email(self, email):
+        """Return the Version of the user with the given email address, or None."""
+        return version_of(self.get_user_by_email(email))
+
+    def get_item(self, user_id, coll, item_id):
+        """Return the item with the given id from a user's collection, or None."""
+        raise NotImplementedError
+
+    def next_user_id(self):
+        """Return the id for the next new user: one past the highest id in use."""
+        raise NotImplementedError
+
+    def list_users(self, after=None, limit=None):
+        """
+        Return one page of users in insertion order.
+
+        Args:
+            after: Cursor key returned with the previous page, or None.
+            limit (int): Maximum number of users, or None for all of them.
+
+        Returns:
+            tuple: (users, next_key) where next_key is None on the last page.
+        """
+        raise NotImplementedError
+
+    def iter_users(self, batch_size=ITER_BATCH):
+        """
+        Yield every user in insertion order, reading them in batches.
+
+        Only one batch is held at a time, so callers that stream users out as
+        they go do not need the whole dataset in memory at once.
+        """
+        after = None
+        while True:
+            users, after = self.list_users(after, batch_size)
+            yield from users
+            if after is None:
+                return
+
+    def list_items(self, user_id, coll, after=None, limit=None, start=None, end=None, descending=False):
+        """
+        Return one page of a user's collection ordered by (date, id).
+
+        Args:
+            user_id: The id of the user.
+            coll (str): "purchases", "deposits" or "financialGoals".
+            after (tuple): Cursor key returned with the previous page, or None.
+            limit (int): Maximum number of items, or None for all of them.
+            start (str): Only include items dated on or after this, or None.
+            end (str): Only include items dated before this, or None.
+            descending (bool): Return the newest items first.
+
+        Returns:
+            tuple: (items, next_key), or None if the user does not exist.
+        """
+        raise NotImplementedError
+
+    def commit(self, ops):
+        """Persist a list of operations atomically."""
+        raise NotImplementedError
+
+    def _refresh(self):
+        """Hook for backends that cache state and need to catch up before a write."""
+
+    def _peek_user(self, user_id):
+        """Read a user while the caller holds the WRITER thread lock."""
+        return self.get_user(user_id)
+
+    def subscribe(self, view):
+        """
+        Register a derived view.
+
+        The view must provide on_change(change), called for every change
+        applied to the store, and reset(users=None), called when the store
+        reloads and cached state must be dropped: for every user, or only
+        for the user ids in users.
+        """
+        self._views.append(view)
+
+    def _emit(self, changes):
+        for change in changes:
+            for view in self._views:
+                view.on_change(change)
+
+    def _reset_views(self, users=None):
+        for view in self._views:
+            view.reset(users)
+
+    @contextlib.contextmanager
+    def paused_writes(self):
+        """
+        Hold off commits while a view reads a user to build its state.
+
+        Changes are delivered to views while commits hold the same lock, so
+        a view that registers a user inside this block will not miss or
+        double count a change.
+
+        Usage:
+            with store.paused_writes():
+                user = store._peek_user(user_id)
+        """
+        self._refresh()
+        with self.locks.thread_lock(WRITER):
+            yield
+
+    @contextlib.contextmanager
+    def transaction(self, user_id=None):
+        """
+        Lock a user, collect changes to them and commit them together.
+
+        Usage:
+            with store.transaction(user_id) as tx:
+                user = store.get_user(user_id)
+                tx.update_user(user_id, {'currentBalance': balance})
+                tx.add(user_id, 'deposits', deposit)
+
+        Reads made inside the block see the latest committed state and no
+        other thread or process can change the user until it ends, so
+        read-modify-write sequences do not lose updates. Transactions that
+        create new records pass no user_id and are serialized with each
+        other instead. Nothing is written if the block raises.
+
+        The commit also bumps the version of every user it changes.
+        """
+        with self.locks.hold(user_region(user_id)):
+            yield from self._collect()
+
+    @contextlib.contextmanager
+    def batch(self, user_ids):
+        """
+        Lock several users and commit the changes to all of them as one write.
+
+        Works like transaction() for a group of users, for jobs that change
+        many users at once. The locks are taken in a fixed order, so batches
+        that share users cannot deadlock.
+
+        Usage:
+            with store.batch([0, 4, 7]) as tx:
+                for user_id in (0, 4, 7):
+                    user = store.get_user(user_id)
+                    ...
+        """
+        with contextlib.ExitStack() as stack:
+            for region in sorted({user_region(user_id) for user_id in user_ids}):
+                stack.enter_context(self.locks.hold(region))
+            yield from self._collect()
+
+    def _collect(self):
+        self._refresh()
+        tx = Transaction()
+        yield tx
+        if tx.ops:
+            self._bump_versions(tx)
+            self.commit(tx.ops)
+
+    def _bump_versions(self, tx):
+        """Add the version and modification time updates to a transaction."""
+        modified = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        for record in tx.inserted():
+            record[VERSION_KEY] = 1
+            record[MODIFIED_KEY] = modified
+        for user_id in tx.users():
+            # The caller holds the user's lock, so the version cannot move under us
+            version = self.get_version(user_id)
+            if version is not None:
+                tx.update_user(user_id, {VERSION_KEY: version.number + 1, MODIFIED_KEY: modified})
@@ -0,0 +1,135 @@
+"""
+changelog.py
+
+A bounded in-memory log of recent changes per user, used by the sync route
+to send a client only what changed since its last sync.
+
+Changes are grouped by the version each transaction gives the user (see
+Store.transaction()), which doubles as the sync sequence number: the batch
+logged under seq N holds everything the transaction that produced version N
+changed. The store delivers a transaction's changes before the version
+update that closes it, so changes wait in a pending list until then.
+
+Only the last LOG_LENGTH transactions of the LOG_USERS most recently changed
+users are kept. A client that is further behind, or whose history has a gap
+(for example after another worker process wrote to a SQLite database, which
+resets the log), has to fall back to a full snapshot; since() returns None in
+that case.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from .transaction import ID_KEYS, MODIFIED_KEY, VERSION_KEY
+
+# Transactions kept per user
+LOG_LENGTH = 200
+
+# Users whose history is kept; the least recently changed are dropped first
+LOG_USERS = 1000
+
+PROFILE = 'profile'
+
+# The fields of the update that closes a transaction
+STAMP_KEYS = {VERSION_KEY, MODIFIED_KEY}
+
+
+class ChangeLog:
+    """Recent changes per user, attached to a store as a view."""
+
+    def __init__(self, store, length=LOG_LENGTH, users=LOG_USERS):
+        self.store = store
+        self.length = length
+        self.users = users
+        self._logs = OrderedDict()  # user_id -> deque of (seq, [entry, ...])
+        self._pending = {}          # user_id -> [entry, ...] not yet given a seq
+        self._lock = threading.Lock()
+        store.subscribe(self)
+
+    def reset(self, users=None):
+        with self._lock:
+            if users is None:
+                self._logs = OrderedDict()
+                self._pending = {}
+            else:
+                self._logs = OrderedDict((uid, log) for uid, log in self._logs.items() if uid not in users)
+                self._pending = {uid: entries for uid, entries in self._pending.items() if uid not in users}
+
+    def on_change(self, change):
+        with self._lock:
+            if change.coll is not None:
+                id_key = ID_KEYS[change.coll]
+                if change.new is None:
+                    entry = (change.coll, 'delete', change.old.get(id_key), None)
+                else:
+                    op = 'insert' if change.old is None else 'update'
+                    entry = (change.coll, op, change.new.get(id_key), dict(change.new))
+                self._pending.setdefault(change.user_id, []).append(entry)
+            elif change.old is None:
+                # A new user: there is no earlier state to send changes against
+                self._pending.pop(change.user_id, None)
+            elif change.new.keys() == STAMP_KEYS:
+                self._close(change.user_id, change.new[VERSION_KEY])
+            else:
+                self._pending.setdefault(change.user_id, []).append(
+                    (PROFILE, 'update', None, dict(change.new)))
+
+    def _close(self, user_id, seq):
+        entries = self._pending.pop(user_id, [])
+        log = self._logs.get(user_id)
+        if log is None:
+            log = self._logs[user_id] = deque(maxlen=self.length)
+            if len(self._logs) > self.users:
+                self._logs.popitem(last=False)
+        else:
+            self._logs.move_to_end(user_id)
+        log.append((seq, entries))
+
+    def since(self, user_id, since, seq):
+        """
+        Return what changed for a user after one sequence number, up to another.
+
+        Several changes to one record are folded into one: the record's
+        latest state, or a delete. Records inserted and deleted again within
+        the range are left out.
+
+        Args:
+            user_id: The id of the user.
+            since (int): The seq the client last synced to.
+            seq (int): The user's current version.
+
+        Returns:
+            list: Change dicts {"seq", "type", "op", "id", "record"} in the
+            order they happened, or None if the log does not cover the range.
+        """
+        # Catch up with writes made by other processes first
+        self.store._refresh()
+        with self._lock:
+            log = self._logs.get(user_id)
+            batches = [batch for batch in (log or ()) if since < batch[0] <= seq]
+        if [batch_seq for batch_seq, _ in batches] != list(range(since + 1, seq + 1)):
+            return None
+
+        folded = {}
+        for batch_seq, entries in batches:
+            for kind, op, item_id, record in entries:
+                key = (kind, item_id)
+                previous = folded.pop(key, None)
+                if kind == PROFILE and previous is not None:
+                    record = dict(previous['record'], **record)
+                elif previous is not None and previous['op'] == 'insert':
+                    if op == 'delete':
+                        continue
+                    op = 'insert'
+                folded[key] = {'seq': batch_seq, 'type': kind, 'op': op, 'id': item_id, 'record': record}
+
+        changes = []
+        for change in folded.values():
+            if change['type'] == PROFILE:
+                # Collections replaced wholesale are also reported item by item
+                fields = {k: v for k, v in change['record'].items() if k not in STAMP_KEYS and k not in ID_KEYS}
+                if not fields:
+                    continue
+                change = dict(change, record=fields)
+            changes.append(change)
+        return sorted(changes, key=lambda change: change['seq'])
@@ -0,0 +1,88 @@
+"""
+date_index.py
+
+A user's purchases or deposits kept sorted by (date, id). Pages of history are
+located with a binary search and sliced out, so serving a page costs
+O(log n + page size) no matter how long the history is.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+def item_key(item, date_key, id_key):
+    """Return the (date, id) sort key of an item."""
+    item_id = item.get(id_key)
+    return (item.get(date_key) or '', item_id if isinstance(item_id, int) else -1)
+
+
+def page_bounds(keys, after, limit, start, end, descending):
+    """
+    Locate one page in a sorted list of keys.
+
+    Args:
+        keys (list): Sorted (date, id) keys.
+        after (tuple): Key of the last item on the previous page, or None.
+        limit (int): Maximum page size, or None for no limit.
+        start (str): Only include dates >= start, or None.
+        end (str): Only include dates < end, or None.
+        descending (bool): Walk from the newest item to the oldest.
+
+    Returns:
+        tuple: (lo, hi, more) - the slice of keys on the page and whether
+        further items remain after it.
+    """
+    lo = bisect_left(keys, (start,)) if start is not None else 0
+    hi = bisect_left(keys, (end,)) if end is not None else len(keys)
+    if after is not None:
+        if descending:
+            hi = min(hi, bisect_left(keys, after))
+        else:
+            lo = max(lo, bisect_right(keys, after))
+    if limit is None or hi - lo <= limit:
+        return lo, max(lo, hi), False
+    if descending:
+        return hi - limit, hi, True
+    return lo, lo + limit, True
+
+
+class DateIndex:
+    """Items of one collection sorted by (date, id)."""
+
+    def __init__(self, items, date_key, id_key):
+        self.date_key = date_key
+        self.id_key = id_key
+        pairs = sorted(((item_key(item, date_key, id_key), i) for i, item in enumerate(items)))
+        self.keys = [key for key, _ in pairs]
+        self.items = [items[i] for _, i in pairs]
+
+    def add(self, item):
+        """Insert a newly added item at its sorted position."""
+        key = item_key(item, self.date_key, self.id_key)
+        pos = bisect_right(self.keys, key)
+        self.keys.insert(pos, key)
+        self.items.insert(pos, item)
+
+    def remove(self, item):
+        """Drop a removed item."""
+        key = item_key(item, self.date_key, self.id_key)
+        pos = bisect_left(self.keys, key)
+        while self.items[pos] is not item:
+            pos += 1
+        del self.keys[pos]
+        del self.items[pos]
+
+    def page(self, after=None, limit=None, start=None, end=None, descending=False):
+        """
+        Return one page of items.
+
+        Returns:
+            tuple: (items, next_key) where next_key is the cursor for the
+            following page, or None if this is the last one.
+        """
+        lo, hi, more = page_bounds(self.keys, after, limit, start, end, descending)
+        items = self.items[lo:hi]
+        if descending:
+            items.reverse()
+        if not more or not items:
+            return items, None
+        return items, self.keys[lo] if descending else self.keys[hi - 1]
@@ -0,0 +1,113 @@
+"""
+journal.py
+
+Append-only log of committed changes that sits next to the data file. Every
+commit is written as a single compact JSON line, so the cost of a write is
+proportional to the size of the change rather than the size of the database.
+The log is folded back into the data file from time to time by
+JsonStore.compact().
+
+The first line of the log is a header naming the snapshot the log applies to
+(the inode of the data file). Compaction replaces the data file with a new
+inode, so a log left behind by an interrupted compaction no longer matches and
+is discarded instead of being replayed twice.
+"""
+
+import json
+import os
+
+from metrics import record_io
+
+
+class Journal:
+    """A line-oriented JSON log bound to one snapshot of the data file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, snapshot_id, start=None):
+        """
+        Read every complete entry of the log.
+
+        Args:
+            snapshot_id: Identity of the snapshot currently on disk.
+            start (int): Offset of the first entry to read, as returned by an
+                earlier read(). When omitted the header is checked and the
+                whole log is read.
+
+        Returns:
+            tuple: (entries, end) where end is the byte offset just past the
+            last complete entry, or ([], None) if there is no log for this
+            snapshot.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], None
+        with f, record_io('read', 'journal') as io:
+            if start is None:
+                try:
+                    header = json.loads(f.readline())
+                except ValueError:
+                    return [], None
+                if header.get('snapshot') != snapshot_id:
+                    return [], None
+            else:
+                f.seek(start)
+            entries = []
+            end = f.tell()
+            while True:
+                line = f.readline()
+                # A line without its newline was cut short by a crash mid-write
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                end = f.tell()
+            io.bytes = f.tell() - (start or 0)
+        return entries, end
+
+    def size(self):
+        """Return the current size of the log in bytes, or None if it is missing."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+
+    def truncate(self, end):
+        """Drop anything after the given offset, such as a torn final line."""
+        with open(self.path, 'r+b') as f:
+            f.truncate(end)
+
+    def append(self, entry):
+        """
+        Append one entry to the log.
+
+        Returns:
+            int: The size of the log after the write.
+        """
+        line = json.dumps(entry, separators=(',', ':')).encode() + b'\n'
+        with record_io('write', 'journal') as io, open(self.path, 'ab') as f:
+            io.bytes = len(line)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def reset(self, snapshot_id):
+        """
+        Replace the log with an empty one bound to a new snapshot.
+
+        Returns:
+            int: The size of the new, empty log.
+        """
+        header = json.dumps({'snapshot': snapshot_id}).encode() + b'\n'
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return len(header)
@@ -0,0 +1,327 @@
+"""
+json_store.py
+
+In-memory view of the JSON "database". The data file is parsed once and kept
+in memory together with hash indexes on the user id and email, so looking up a
+single user is a dictionary lookup instead of a scan over every user. The file
+is only parsed again when its modification time changes on disk.
+
+Writes do not rewrite the data file. Each committed transaction is appended to
+a journal next to it (see journal.py) and replayed on top of the data file when
+the store loads. Once the journal grows past a size limit it is compacted: the
+current state is written out as a new data file and the journal starts over.
+
+The data file is either JSON or the binary snapshot format of snapshot.py,
+whose users are decoded one at a time as they are read. The cached users are
+held in list order and the indexes map ids and emails to positions in it.
+
+Several threads or worker processes may share one data file. Transactions
+lock only the user they change (see locks.py), and every process catches up
+with journal entries written by the others before it reads or commits.
+"""
+
+import os
+from bisect import bisect_left
+
+from metrics import record_io
+
+from . import snapshot
+from .base import Store, user_key, version_of
+from .date_index import DateIndex
+from .journal import Journal
+from .locks import WRITER
+from .transaction import DATE_KEYS, ID_KEYS, Change
+
+# Fold the journal back into the data file once it grows past this many bytes
+COMPACT_BYTES = 1024 * 1024
+
+
+def _position(items, item, id_key):
+    """
+    Return the position of an item in its collection.
+
+    Ids are handed out in increasing order and items are appended, so the
+    list is normally sorted by id and a binary search finds the item. Lists
+    that were edited out of order fall back to a scan.
+    """
+    try:
+        pos = bisect_left(items, item[id_key], key=lambda other: other[id_key])
+        if pos < len(items) and items[pos] is item:
+            return pos
+    except (KeyError, TypeError):
+        pass
+    for pos, other in enumerate(items):
+        if other is item:
+            return pos
+    raise ValueError('Item is not in the collection')
+
+
+class JsonStore(Store):
+    """
+    Cached, indexed access to the list of users stored in a JSON file.
+
+    The user dictionaries returned by the getters are the cached objects
+    themselves, which is why they must not be modified directly.
+    """
+
+    def __init__(self, path, compact_bytes=COMPACT_BYTES, snapshot_format=None, views=True):
+        """
+        Args:
+            path (str): The data file.
+            compact_bytes (int): Journal size that triggers a compaction.
+            snapshot_format (str): "json" or "binary", the format compactions
+                write. By default the data file keeps the format it has.
+            views (bool): Attach the derived views (see Store).
+        """
+        super().__init__(path, views)
+        if snapshot_format not in (None,) + snapshot.FORMATS:
+            raise ValueError(f'Unknown snapshot format: {snapshot_format}')
+        self.compact_bytes = compact_bytes
+        self.snapshot_format = snapshot_format
+        self.file_format = snapshot_format or snapshot.JSON
+        self.journal = Journal(path + '.journal')
+        self._users = []
+        self._by_id = {}
+        self._by_email = {}
+        self._date_indexes = {}
+        self._id_indexes = {}
+        self._next_uid = 0
+        self._stamp = None
+        self._journal_end = None
+        self._journal_size = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def _refresh(self):
+        """Pick up changes made to the files since they were last read."""
+        if self._file_stamp() == self._stamp and self.journal.size() == self._journal_size:
+            return
+        with self.locks.hold(WRITER, shared=True):
+            self._catch_up()
+
+    def _catch_up(self):
+        """
+        Bring the cached state up to date with the files on disk.
+
+        Reloads everything if the data file was replaced or edited, otherwise
+        replays only the journal entries appended since the last read. The
+        caller must hold the WRITER lock.
+        """
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._load(stamp)
+            return
+        if stamp is not None:
+            entries, end = self.journal.read(stamp[0], self._journal_end)
+            for ops in entries:
+                for op in ops:
+                    self._emit(self._apply(op))
+            self._journal_end = end
+        self._journal_size = self.journal.size()
+
+    def _load(self, stamp):
+        """Read the data file and replay the journal on top of it."""
+        if stamp is None:
+            self._users = []
+            entries, end = [], None
+        else:
+            with record_io('read', 'snapshot') as io, open(self.path, 'rb') as f:
+                self._users, self.file_format = snapshot.load(f)
+                io.bytes = f.tell() if self.file_format == snapshot.JSON else self._users.index_bytes
+            entries, end = self.journal.read(stamp[0])
+        self._reindex()
+        for ops in entries:
+            for op in ops:
+                self._apply(op)
+        self._stamp = stamp
+        self._journal_end = end
+        self._journal_size = self.journal.size()
+        self._reset_views()
+
+    def _reindex(self):
+        self._by_id = {}
+        self._by_email = {}
+        self._date_indexes = {}
+        self._id_indexes = {}
+        self._next_uid = 0
+        for pos, (uid, email) in enumerate(snapshot.keys(self._users)):
+            self._index(pos, uid, email)
+
+    def _index(self, pos, uid, email):
+        # setdefault keeps the first match, like the linear scans it replaces
+        if uid is not None:
+            self._by_id.setdefault(uid, pos)
+            if isinstance(uid, int):
+                self._next_uid = max(self._next_uid, uid + 1)
+        if email is not None:
+            self._by_email.setdefault(email, pos)
+
+    def _lookup(self, index, key):
+        pos = index.get(key)
+        return None if pos is None else self._users[pos]
+
+    def _peek_user(self, user_id):
+        return self._lookup(self._by_id, user_id)
+
+    def _id_index(self, uid, coll):
+        """Return {id: item} for a user's collection, building it on first use."""
+        index = self._id_indexes.get((uid, coll))
+        if index is None:
+            id_key = ID_KEYS[coll]
+            index = {}
+            for item in self._lookup(self._by_id, uid).get(coll) or []:
+                index.setdefault(item.get(id_key), item)
+            self._id_indexes[(uid, coll)] = index
+        return index
+
+    def all_users(self):
+        """Return the full list of users."""
+        self._refresh()
+        users = self._users
+        return users if isinstance(users, list) else list(users)
+
+    def get_user(self, user_id):
+        """Return the user with the given id, or None."""
+        self._refresh()
+        return self._lookup(self._by_id, user_id)
+
+    def get_user_by_email(self, email):
+        """Return the user with the given email address, or None."""
+        self._refresh()
+        return self._lookup(self._by_email, email)
+
+    def get_version(self, user_id):
+        self._refresh()
+        return version_of(self._lookup(self._by_id, user_id))
+
+    def get_version_by_email(self, email):
+        self._refresh()
+        return version_of(self._lookup(self._by_email, email))
+
+    def get_item(self, user_id, coll, item_id):
+        self._refresh()
+        with self.locks.thread_lock(WRITER):
+            if user_id not in self._by_id:
+                return None
+            return self._id_index(user_id, coll).get(item_id)
+
+    def next_user_id(self):
+        self._refresh()
+        return self._next_uid
+
+    def list_users(self, after=None, limit=None):
+        self._refresh()
+        users = self._users
+        # The user list is append-only, so a position is a stable cursor
+        lo = 0 if after is None else after + 1
+        hi = len(users) if limit is None else min(len(users), lo + limit)
+        return users[lo:hi], (hi - 1 if hi < len(users) and hi > lo else None)
+
+    def list_items(self, user_id, coll, after=None, limit=None, start=None, end=None, descending=False):
+        self._refresh()
+        with self.locks.thread_lock(WRITER):
+            user = self._lookup(self._by_id, user_id)
+            if user is None:
+                return None
+            index = self._date_indexes.get((user_id, coll))
+            if index is None:
+                index = DateIndex(user.get(coll, []), DATE_KEYS[coll], ID_KEYS[coll])
+                self._date_indexes[(user_id, coll)] = index
+            return index.page(after, limit, start, end, descending)
+
+    def commit(self, ops):
+        """Journal a list of operations and apply them to the cached state."""
+        with self.locks.hold(WRITER):
+            self._catch_up()
+            for op in ops:
+                if 'user' in op and op['user'] not in self._by_id:
+                    raise KeyError(f"User {op['user']} not found")
+            if self._journal_end is None:
+                if self._stamp is None:
+                    self._write_snapshot()
+                self._journal_end = self.journal.reset(self._stamp[0])
+            elif self._journal_size != self._journal_end:
+                # Drop the torn tail of a writer that crashed mid-append
+                self.journal.truncate(self._journal_end)
+            self._journal_end = self._journal_size = self.journal.append(ops)
+            for op in ops:
+                self._emit(self._apply(op))
+            if self._journal_end > self.compact_bytes:
+                self._compact()
+
+    def _apply(self, op):
+        """Apply one operation to the cached state and return its Changes."""
+        kind = op['op']
+        if kind == 'insert':
+            record = op['record']
+            self._users.append(record)
+            uid = user_key(record)
+            self._index(len(self._users) - 1, uid, record.get('email'))
+            return [] if uid is None else [Change(uid, None, None, record)]
+        uid = op['user']
+        user = self._lookup(self._by_id, uid)
+        if kind == 'update_user':
+            fields = op['fields']
+            old = {key: user.get(key) for key in fields}
+            changes = [Change(uid, None, old, fields)]
+            for coll in ID_KEYS.keys() & fields.keys():
+                self._date_indexes.pop((uid, coll), None)
+                self._id_indexes.pop((uid, coll), None)
+                changes += [Change(uid, coll, item, None) for item in old[coll] or []]
+                changes += [Change(uid, coll, None, item) for item in fields[coll] or []]
+            user.update(fields)
+            if {'email', 'user_id', 'userId'} & fields.keys():
+                self._reindex()
+            return changes
+        coll = op['coll']
+        items = user.setdefault(coll, [])
+        id_key = ID_KEYS[coll]
+        ids = self._id_index(uid, coll)
+        dates = self._date_indexes.get((uid, coll))
+        if kind == 'add':
+            item = op['item']
+            items.append(item)
+            ids.setdefault(item.get(id_key), item)
+            if dates is not None:
+                dates.add(item)
+            return [Change(uid, coll, None, item)]
+        item = ids.get(op['id'])
+        if item is None:
+            return []
+        if kind == 'update':
+            old = dict(item)
+            item.update(op['fields'])
+            if {id_key, DATE_KEYS[coll]} & op['fields'].keys():
+                self._date_indexes.pop((uid, coll), None)
+                self._id_indexes.pop((uid, coll), None)
+            return [Change(uid, coll, old, item)]
+        if kind == 'remove':
+            items.pop(_position(items, item, id_key))
+            del ids[op['id']]
+            if dates is not None:
+                dates.remove(item)
+            return [Change(uid, coll, item, None)]
+        raise ValueError(f'Unknown operation: {kind}')
+
+    def _write_snapshot(self):
+        """Atomically replace the data file with the cached user list."""
+        fmt = self.snapshot_format or self.file_format
+        with record_io('write', 'snapshot') as io:
+            io.bytes = snapshot.save(self._users, self.path, fmt)
+        self.file_format = fmt
+        self._stamp = self._file_stamp()
+
+    def _compact(self):
+        self._write_snapshot()
+        self._journal_end = self._journal_size = self.journal.reset(self._stamp[0])
+
+    def compact(self):
+        """Fold the journal into a new data file and start an empty journal."""
+        with self.locks.hold(WRITER):
+            self._catch_up()
+            self._compact()
@@ -0,0 +1,119 @@
+"""
+locks.py
+
+Locking used by the store so that several threads, and several worker
+processes sharing one data file, can write safely.
+
+Each lock is a byte range of a lock file next to the data file, taken with
+fcntl.lockf(). Different ranges do not block each other, which is what lets
+writes to unrelated users proceed in parallel. POSIX record locks are held per
+process, so every range is paired with a threading lock that keeps threads of
+the same process out of each other's way first.
+
+On platforms without fcntl (Windows) only the threading locks are used, which
+is still safe for a single process.
+"""
+
+import contextlib
+import errno
+import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Range 0 guards the journal and data file, range 1 serializes new records,
+# and every user gets a range of their own after that.
+WRITER = 0
+INSERT = 1
+_USER_BASE = 2
+
+# Longest pause between attempts at a range refused as a deadlock, in seconds
+_RETRY_MAX = 0.05
+
+
+def user_region(user_id):
+    """Return the lock range for a user, or the insert range for new records."""
+    if user_id is None:
+        return INSERT
+    if isinstance(user_id, int) and user_id >= 0:
+        return _USER_BASE + user_id
+    return _USER_BASE + zlib.crc32(str(user_id).encode())
+
+
+class RangeLocks:
+    """Named locks backed by byte ranges of a single lock file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._guard = threading.Lock()
+        self._thread_locks = {}
+
+    def _file(self):
+        if self._fd is None:
+            with self._guard:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def thread_lock(self, region):
+        """Return the in-process lock for a range."""
+        lock = self._thread_locks.get(region)
+        if lock is None:
+            with self._guard:
+                lock = self._thread_locks.setdefault(region, threading.Lock())
+        return lock
+
+    @contextlib.contextmanager
+    def file_lock(self, region, shared=False):
+        """
+        Hold the cross-process lock for a range.
+
+        The caller must already hold thread_lock(region), because a second
+        thread of this process taking the same range would silently convert
+        or release the lock instead of waiting for it.
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = self._file()
+        _lock_range(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX, region)
+        try:
+            yield
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, region)
+
+    @contextlib.contextmanager
+    def hold(self, region, shared=False):
+        """Hold both the in-process and the cross-process lock for a range."""
+        with self.thread_lock(region):
+            with self.file_lock(region, shared):
+                yield
+
+
+def _lock_range(fd, mode, region):
+    """
+    Take a byte range lock, waiting for it.
+
+    The kernel tracks record locks per process, not per thread, so with
+    several threads in several processes it can see a cycle that does not
+    exist: one thread of A holding a user and waiting for WRITER, which a
+    thread of B holds while another thread of B waits for that user. B's
+    writer finishes without needing anything from A, but the kernel refuses
+    the request with EDEADLK. Such requests are retried after a short pause.
+    """
+    delay = 0.001
+    while True:
+        try:
+            fcntl.lockf(fd, mode, 1, region)
+            return
+        except OSError as error:
+            if error.errno != errno.EDEADLK:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, _RETRY_MAX)
@@ -0,0 +1,84 @@
+"""
+migrate.py
+
+One-shot migration of the JSON data file into a SQLite database, or into a
+sharded store (see sharded_store.py).
+
+Usage (from the backend directory):
+    python -m storage.migrate [data.json] [budget.db]
+    python -m storage.migrate data.json data.shards --to sharded [--shards 16] [--format binary]
+
+Any journal entries that have not been compacted yet are included, since the
+source is read through JsonStore. The target must be empty.
+"""
+
+import argparse
+import os
+
+from . import sharded_store, snapshot
+from .json_store import JsonStore
+from .sqlite_store import SqliteStore
+
+
+def migrate(json_path, sqlite_path):
+    """
+    Copy every record from a JSON data file into a SQLite database.
+
+    Args:
+        json_path (str): Path of the source data.json.
+        sqlite_path (str): Path of the target database. Created if missing.
+
+    Returns:
+        int: The number of records migrated.
+    """
+    users = JsonStore(os.path.abspath(json_path)).all_users()
+    target = SqliteStore(os.path.abspath(sqlite_path))
+    try:
+        if target.all_users():
+            raise ValueError(f'{sqlite_path} already contains data')
+        target.import_users(users)
+    finally:
+        target.close()
+    return len(users)
+
+
+def migrate_sharded(json_path, directory, shards=sharded_store.SHARDS, snapshot_format=snapshot.JSON):
+    """
+    Split a JSON data file into a new sharded store.
+
+    Args:
+        json_path (str): Path of the source data.json.
+        directory (str): Directory of the target store. Must not hold one yet.
+        shards (int): Number of shards to create.
+        snapshot_format (str): "json" or "binary", the format of the shard files.
+
+    Returns:
+        int: The number of records migrated.
+    """
+    users = JsonStore(os.path.abspath(json_path)).all_users()
+    return sharded_store.create(os.path.abspath(directory), users, shards, snapshot_format)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m storage.migrate')
+    parser.add_argument('source', nargs='?', default='data.json')
+    parser.add_argument('target', nargs='?')
+    parser.add_argument('--to', choices=['sqlite', 'sharded'], default='sqlite')
+    parser.add_argument('--shards', type=int, default=sharded_store.SHARDS)
+    parser.add_argument('--format', choices=snapshot.FORMATS, default=snapshot.JSON,
+                        help='format of the shard files')
+    args = parser.parse_args(argv)
+
+    if args.to == 'sharded':
+        target = args.target or 'data.shards'
+        count = migrate_sharded(args.source, target, args.shards, args.format)
+        print(f'Split {count} records from {args.source} into {args.shards} shards in {target}')
+    else:
+        target = args.target or 'budget.db'
+        count = migrate(args.source, target)
+        print(f'Migrated {count} records from {args.source} to {target}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""
+rollups.py
+
+Running spending totals per user, month and category.
+
+A user's rollup is built from their history the first time it is asked for
+and from then on kept current from the store's Change records, so reading a
+summary never rescans purchases or deposits.
+
+Purchases follow the frontend's sign convention: expenses have a negative
+purchaseCost and are totalled as "spent", positive costs are "income".
+
+Totals are exact Decimals kept separately per currency: items without a
+"currency" count in the user's currency, the others under their own. A
+summary converts each cell once with the rate table of money.py, so a
+summary in any currency costs one multiplication per cell, not per item.
+"""
+
+from collections import defaultdict
+
+import money
+from money import ZERO
+
+UNCATEGORIZED = 'Other'
+UNDATED = 'undated'
+
+
+def _amount(value):
+    try:
+        return money.decimal(value)
+    except ValueError:
+        return ZERO
+
+
+def _currency(item):
+    # None stands for the user's currency, whatever it is at the time
+    currency = item.get('currency')
+    return currency.upper() if isinstance(currency, str) else None
+
+
+def month_of(date):
+    """Return the YYYY-MM month of an ISO date string."""
+    if isinstance(date, str) and len(date) >= 7:
+        return date[:7]
+    return UNDATED
+
+
+class Cell:
+    """Totals for one (month, category) or one month of deposits."""
+
+    __slots__ = ('spent', 'income', 'count')
+
+    def __init__(self):
+        self.spent = ZERO
+        self.income = ZERO
+        self.count = 0
+
+    def add(self, amount, sign):
+        if amount < 0:
+            self.spent += sign * -amount
+        else:
+            self.income += sign * amount
+        self.count += sign
+
+    def merge(self, other, rate=1):
+        self.spent += other.spent * rate
+        self.income += other.income * rate
+        self.count += other.count
+
+    def to_json(self, currency=None):
+        return {'spent': money.number(self.spent, currency), 'income': money.number(self.income, currency),
+                'count': self.count}
+
+
+def _cells():
+    return defaultdict(Cell)
+
+
+class UserRollup:
+    """All running totals for one user."""
+
+    def __init__(self, user):
+        self.currency = money.currency_of(user)
+        self.purchases = defaultdict(_cells)  # (month, category) -> {currency: Cell}
+        self.months = defaultdict(_cells)     # month -> {currency: Cell} of every purchase category
+        self.deposits = defaultdict(_cells)   # month -> {currency: Cell}
+        for item in user.get('purchases') or []:
+            self.apply('purchases', item, 1)
+        for item in user.get('deposits') or []:
+            self.apply('deposits', item, 1)
+
+    def apply(self, coll, item, sign):
+        """Add (sign=1) or subtract (sign=-1) one item."""
+        currency = _currency(item)
+        if coll == 'purchases':
+            key = (month_of(item.get('purchaseDate')), item.get('purchaseCategory') or UNCATEGORIZED)
+            amount = _amount(item.get('purchaseCost'))
+            self.purchases[key][currency].add(amount, sign)
+            self.months[key[0]][currency].add(amount, sign)
+        elif coll == 'deposits':
+            # Deposits are always money in, whatever sign they were entered with
+            month = month_of(item.get('depositDate'))
+            self.deposits[month][currency].add(abs(_amount(item.get('depositAmount'))), sign)
+
+    def converted(self, cells, target, table):
+        """Merge the per-currency cells of one key into a Cell in the target currency."""
+        total = Cell()
+        for currency, cell in list(cells.items()):
+            if cell.count:
+                total.merge(cell, table.rate(currency or self.currency, target))
+        return total
+
+
+class Rollups:
+    """Per-user rollups attached to a store."""
+
+    def __init__(self, store):
+        self.store = store
+        self._users = {}
+        store.subscribe(self)
+
+    def reset(self, users=None):
+        if users is None:
+            self._users = {}
+        else:
+            self._users = {uid: rollup for uid, rollup in self._users.items() if uid not in users}
+
+    def on_change(self, change):
+        rollup = self._users.get(change.user_id)
+        if rollup is None:
+            return
+        if change.coll is None and change.new is not None and 'preferredCurrency' in change.new:
+            rollup.currency = money.currency_of(change.new)
+        if change.coll not in ('purchases', 'deposits'):
+            return
+        if change.old is not None:
+            rollup.apply(change.coll, change.old, -1)
+        if change.new is not None:
+            rollup.apply(change.coll, change.new, 1)
+
+    def _rollup(self, user_id):
+        rollup = self._users.get(user_id)
+        if rollup is None:
+            with self.store.paused_writes():
+                rollup = self._users.get(user_id)
+                if rollup is None:
+                    user = self.store._peek_user(user_id)
+                    if user is None:
+                        return None
+                    rollup = self._users[user_id] = UserRollup(user)
+        return rollup
+
+    def spent(self, user_id, month, category=None):
+        """
+        Return what a user spent in one month, without scanning their purchases.
+
+        Args:
+            user_id: The id of the user.
+            month (str): The YYYY-MM month.
+            category (str): Only this purchase category, or None for all.
+
+        Returns:
+            Decimal: The amount spent in the user's currency, 0 if nothing or
+            the user does not exist.
+        """
+        self.store._refresh()
+        rollup = self._rollup(user_id)
+        if rollup is None:
+            return ZERO
+        cells = rollup.months.get(month) if category is None else rollup.purchases.get((month, category))
+        if not cells:
+            return ZERO
+        return rollup.converted(cells, rollup.currency, money.rates()).spent
+
+    def summary(self, user_id, month=None, category=None, currency=None):
+        """
+        Summarize a user's purchases and deposits.
+
+        Args:
+            user_id: The id of the user.
+            month (str): Only this YYYY-MM month, or None for every month.
+            category (str): Only purchases in this category, or None for all.
+            currency (str): Convert the totals to this currency instead of
+                the user's own.
+
+        Returns:
+            dict: Totals overall, by category and by month, or None if the
+            user does not exist.
+
+        Raises:
+            money.CurrencyError: If a currency involved is not in the rate table.
+        """
+        # Catch up with writes made by other processes first
+        self.store._refresh()
+        rollup = self._rollup(user_id)
+        if rollup is None:
+            return None
+        target = currency or rollup.currency
+        table = money.rates()
+        total = Cell()
+        by_category = defaultdict(Cell)
+        by_month = defaultdict(Cell)
+        for (cell_month, cell_category), cells in list(rollup.purchases.items()):
+            if (month is not None and cell_month != month) or (category is not None and cell_category != category):
+                continue
+            cell = rollup.converted(cells, target, table)
+            if cell.count:
+                total.merge(cell)
+                by_category[cell_category].merge(cell)
+                by_month[cell_month].merge(cell)
+        deposits = Cell()
+        deposits_by_month = {}
+        for cell_month, cells in list(rollup.deposits.items()):
+            if month is None or cell_month == month:
+                cell = rollup.converted(cells, target, table)
+                if cell.count:
+                    deposits.merge(cell)
+                    deposits_by_month[cell_month] = cell
+        months = sorted(set(by_month) | set(deposits_by_month))
+        return {
+            'userId': user_id,
+            'month': month,
+            'category': category,
+            'currency': target,
+            'purchases': dict(total.to_json(target),
+                              byCategory={k: v.to_json(target) for k, v in sorted(by_category.items())}),
+            'deposits': {'total': money.number(deposits.income, target), 'count': deposits.count},
+            'byMonth': {
+                m: {
+                    'purchases': by_month[m].to_json(target),
+                    'deposits': money.number(deposits_by_month[m].income if m in deposits_by_month else ZERO,
+                                             target),
+                }
+                for m in months
+            },
+        }
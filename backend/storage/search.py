@@ -0,0 +1,219 @@
+"""
+search.py
+
+In-memory inverted index over each user's purchase history, for searching
+purchases by name and category without sending the whole history to the
+client.
+
+A user's index is built from their purchases the first time they search and
+from then on kept current from the store's Change records, like the rollups.
+It maps every word of a purchase's name and category to the ids of the
+purchases that contain it, and keeps the distinct words sorted so that a
+prefix is found by binary search. Purchases are also grouped by category and
+by month for filtering and facet counts.
+
+A query costs time in proportion to the words and purchases that match it,
+not to the length of the user's history. Only a search with neither words
+nor filters goes over every purchase.
+"""
+
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+from .rollups import UNCATEGORIZED, month_of
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    """Return the lowercase words of a string."""
+    return _WORD.findall(text.lower()) if isinstance(text, str) else []
+
+
+def _newest(item):
+    item_id = item.get('purchaseId')
+    return str(item.get('purchaseDate') or ''), item_id if isinstance(item_id, int) else -1
+
+
+class UserIndex:
+    """The search index of one user's purchases."""
+
+    def __init__(self, user):
+        self.items = {}       # purchaseId -> purchase
+        self.keys = {}        # purchaseId -> (words, category, month) as indexed
+        self.postings = {}    # word -> {purchaseId}
+        self.vocabulary = []  # sorted words that have postings
+        self.categories = {}  # category -> {purchaseId}
+        self.months = {}      # YYYY-MM -> {purchaseId}
+        for item in user.get('purchases') or []:
+            self.add(item)
+
+    @staticmethod
+    def _keys(item):
+        # The category as shown, so uncategorized purchases are found by "other"
+        category = item.get('purchaseCategory') or UNCATEGORIZED
+        return set(words(item.get('name'))) | set(words(category)), category, month_of(item.get('purchaseDate'))
+
+    def add(self, item):
+        item_id = item.get('purchaseId')
+        if item_id in self.items:
+            self.remove(self.items[item_id])
+        self.items[item_id] = item
+        terms, category, month = self.keys[item_id] = self._keys(item)
+        for term in terms:
+            ids = self.postings.get(term)
+            if ids is None:
+                ids = self.postings[term] = set()
+                insort(self.vocabulary, term)
+            ids.add(item_id)
+        self.categories.setdefault(category, set()).add(item_id)
+        self.months.setdefault(month, set()).add(item_id)
+
+    def remove(self, item):
+        item_id = item.get('purchaseId')
+        if self.items.pop(item_id, None) is None:
+            return
+        # The stored keys, since the store may have updated the item in place
+        terms, category, month = self.keys.pop(item_id)
+        for term in terms:
+            ids = self.postings[term]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+        for groups, key in ((self.categories, category), (self.months, month)):
+            groups[key].discard(item_id)
+            if not groups[key]:
+                del groups[key]
+
+    def prefixed(self, prefix):
+        """Return the ids of the purchases with a word that starts with prefix."""
+        ids = set()
+        pos = bisect_left(self.vocabulary, prefix)
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(prefix):
+            ids |= self.postings[self.vocabulary[pos]]
+            pos += 1
+        return ids
+
+    def matching(self, query):
+        """Return the ids of the purchases that have every word of a query as a prefix, or None for all."""
+        matches = None
+        for prefix in sorted(set(words(query)), key=len, reverse=True):
+            ids = self.prefixed(prefix)
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                break
+        return matches
+
+
+class SearchIndex:
+    """Per-user purchase search indexes attached to a store."""
+
+    def __init__(self, store):
+        self.store = store
+        self._users = {}
+        self._lock = threading.Lock()
+        store.subscribe(self)
+
+    def reset(self, users=None):
+        with self._lock:
+            if users is None:
+                self._users = {}
+            else:
+                self._users = {uid: index for uid, index in self._users.items() if uid not in users}
+
+    def on_change(self, change):
+        index = self._users.get(change.user_id)
+        if index is None or change.coll != 'purchases':
+            return
+        with self._lock:
+            if change.old is not None:
+                index.remove(change.old)
+            if change.new is not None:
+                index.add(change.new)
+
+    def _index(self, user_id):
+        index = self._users.get(user_id)
+        if index is None:
+            with self.store.paused_writes():
+                index = self._users.get(user_id)
+                if index is None:
+                    user = self.store._peek_user(user_id)
+                    if user is None:
+                        return None
+                    index = self._users[user_id] = UserIndex(user)
+        return index
+
+    @staticmethod
+    def _browse(index, in_category, in_month):
+        """Facets and results without query words, from the groups rather than every purchase."""
+        def count(ids, field):
+            return Counter(index.keys[item_id][field] for item_id in ids)
+
+        if in_month is None:
+            by_category = Counter({key: len(ids) for key, ids in index.categories.items()})
+        else:
+            by_category = count(in_month, 1)
+        if in_category is None:
+            by_month = Counter({key: len(ids) for key, ids in index.months.items()})
+        else:
+            by_month = count(in_category, 2)
+        if in_category is None and in_month is None:
+            return by_category, by_month, list(index.items.values())
+        filters = sorted((ids for ids in (in_category, in_month) if ids is not None), key=len)
+        ids = filters[0] if len(filters) == 1 else filters[0] & filters[1]
+        return by_category, by_month, [index.items[item_id] for item_id in ids]
+
+    def search(self, user_id, query='', category=None, month=None, limit=50):
+        """
+        Find a user's purchases by words of their name or category.
+
+        Every word of the query must start a word of the purchase, so "cof
+        sta" finds "Starbucks Coffee". The facet counts cover the purchases
+        matching the query and the other filter, so a client can show how
+        many results each category or month would give.
+
+        Args:
+            user_id: The id of the user.
+            query (str): Words to look for; empty matches every purchase.
+            category (str): Only purchases in this category.
+            month (str): Only purchases in this YYYY-MM month.
+            limit (int): Most purchases to return, newest first.
+
+        Returns:
+            dict: {"total", "items", "facets": {"category": {...}, "month": {...}}},
+            or None if the user does not exist.
+        """
+        # Catch up with writes made by other processes first
+        self.store._refresh()
+        index = self._index(user_id)
+        if index is None:
+            return None
+        with self._lock:
+            matches = index.matching(query)
+            in_category = index.categories.get(category, set()) if category is not None else None
+            in_month = index.months.get(month, set()) if month is not None else None
+            if matches is None:
+                by_category, by_month, results = self._browse(index, in_category, in_month)
+            else:
+                by_category, by_month = Counter(), Counter()
+                results = []
+                for item_id in matches:
+                    _, item_category, item_month = index.keys[item_id]
+                    category_ok = in_category is None or item_id in in_category
+                    month_ok = in_month is None or item_id in in_month
+                    if month_ok:
+                        by_category[item_category] += 1
+                    if category_ok:
+                        by_month[item_month] += 1
+                    if category_ok and month_ok:
+                        results.append(index.items[item_id])
+
+        return {
+            'total': len(results),
+            'items': heapq.nlargest(limit, results, key=_newest),
+            'facets': {'category': dict(sorted(by_category.items())), 'month': dict(sorted(by_month.items()))},
+        }
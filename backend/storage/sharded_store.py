@@ -0,0 +1,344 @@
+"""
+sharded_store.py
+
+JSON storage split into shards, so that a write to one user locks, journals
+and compacts only the shard that holds them instead of the whole dataset.
+
+A sharded store is a directory:
+
+    shards.json          {"shards": N}, fixed when the directory is created
+    shard-000.json ...   The users whose id falls in each shard. Every shard is
+                         a JsonStore with its own journal, lock file and
+                         compactions, in the JSON or binary snapshot format.
+    directory.journal    Append-only log of the email -> user id directory
+
+Users are placed by id (see shard_of()), so reads and writes by id go
+straight to one shard. Lookups by email go through the directory, which only
+holds emails and ids and is only written when a user is created or changes
+their email. A shard is loaded the first time one of its users is read, so
+opening the store and answering a first request cost one shard, not every
+user.
+
+Transactions lock single users as with the other backends, and a commit
+takes the writer lock of the shards it writes to only, so writes to users in
+different shards do not wait for each other. A batch that spans shards is
+committed shard by shard; each user's changes are still written together.
+
+Listing users goes through the shards in order, so users come back grouped by
+shard rather than in the order they were created.
+
+Split an existing data file with:
+    python -m storage.migrate data.json data.shards --to sharded [--shards 16]
+"""
+
+import contextlib
+import json
+import os
+import zlib
+
+from . import snapshot
+from .base import Store, user_key
+from .journal import Journal
+from .json_store import COMPACT_BYTES, JsonStore
+from .locks import WRITER, RangeLocks
+
+# Shards of a new store. Each holds a lock file open once it has been written
+# to, so keep the count well inside the open file limit.
+SHARDS = 16
+
+MANIFEST = 'shards.json'
+DIRECTORY = 'directory.journal'
+
+# Header of the directory log. Unlike a shard journal it is never compacted,
+# so it is not bound to a snapshot.
+DIRECTORY_ID = 'directory'
+
+# Fields that would move a user to another shard
+ID_FIELDS = ('user_id', 'userId')
+
+
+def shard_of(user_id, shards):
+    """Return the number of the shard that holds a user."""
+    if isinstance(user_id, int) and user_id >= 0:
+        return user_id % shards
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def shard_path(directory, number):
+    """Return the data file of one shard."""
+    return os.path.join(directory, f'shard-{number:03d}.json')
+
+
+def read_manifest(directory):
+    """Return the number of shards of a store directory, or None if it has no store yet."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)['shards']
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, shards):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'shards': shards}, f)
+    os.replace(path + '.tmp', path)
+
+
+def _directory_entry(users):
+    return [['+', user.get('email'), user_key(user)] for user in users]
+
+
+def create(directory, users, shards=SHARDS, snapshot_format=snapshot.JSON):
+    """
+    Write a new sharded store holding the given users.
+
+    Args:
+        directory (str): Where to create the store. Must not hold one yet.
+        users (list): User records, such as the users of a data.json.
+        shards (int): Number of shards to split the users into.
+        snapshot_format (str): "json" or "binary", the format of the shard files.
+
+    Returns:
+        int: The number of users written.
+    """
+    if shards < 1:
+        raise ValueError('A sharded store needs at least one shard')
+    os.makedirs(directory, exist_ok=True)
+    if read_manifest(directory) is not None:
+        raise ValueError(f'{directory} already contains a sharded store')
+    groups = [[] for _ in range(shards)]
+    for user in users:
+        groups[shard_of(user_key(user), shards)].append(user)
+    for number, group in enumerate(groups):
+        snapshot.save(group, shard_path(directory, number), snapshot_format)
+    directory_log = Journal(os.path.join(directory, DIRECTORY))
+    directory_log.reset(DIRECTORY_ID)
+    if users:
+        directory_log.append(_directory_entry(users))
+    # Written last, so an interrupted split does not look like a store
+    _write_manifest(directory, shards)
+    return len(users)
+
+
+class _ShardUsers:
+    """The ids of the users of one shard, as a container for Store._reset_views()."""
+
+    def __init__(self, number, shards):
+        self.number = number
+        self.shards = shards
+
+    def __contains__(self, user_id):
+        return shard_of(user_id, self.shards) == self.number
+
+
+class _Relay:
+    """Passes the changes of one shard on to the views of the sharded store."""
+
+    def __init__(self, store, number):
+        self.store = store
+        self.users = _ShardUsers(number, len(store.shards))
+
+    def on_change(self, change):
+        self.store._emit([change])
+
+    def reset(self, users=None):
+        # A shard (re)loading drops only what the views hold for its own users
+        self.store._reset_views(self.users)
+
+
+class ShardedStore(Store):
+    """
+    Users split over several JsonStores by id, with an email directory.
+
+    As with JsonStore, the user dictionaries returned by the getters are the
+    cached objects themselves and must not be modified directly.
+    """
+
+    # Users are paged by (shard, position in the shard)
+    user_cursor = (int, int)
+
+    def __init__(self, path, shards=SHARDS, compact_bytes=COMPACT_BYTES, snapshot_format=None):
+        """
+        Args:
+            path (str): The store directory. Created if missing.
+            shards (int): Number of shards if the directory has no store yet;
+                an existing store keeps the number it was created with.
+            compact_bytes (int): Journal size that triggers the compaction of a shard.
+            snapshot_format (str): "json" or "binary", the format shard
+                compactions write. By default each shard keeps its format.
+        """
+        os.makedirs(path, exist_ok=True)
+        count = read_manifest(path)
+        if count is None:
+            count = shards
+            _write_manifest(path, count)
+        super().__init__(path)
+        self.locks = RangeLocks(os.path.join(path, 'directory.lock'))
+        self.shards = [JsonStore(shard_path(path, number), compact_bytes, snapshot_format, views=False)
+                       for number in range(count)]
+        for number, shard in enumerate(self.shards):
+            shard.subscribe(_Relay(self, number))
+        self._opened = set()
+        self.directory = Journal(os.path.join(path, DIRECTORY))
+        self._emails = {}
+        self._next_uid = 0
+        self._directory_end = None
+        self._directory_size = None
+
+    def _open(self, number):
+        self._opened.add(number)
+        return self.shards[number]
+
+    def _shard(self, user_id):
+        return self._open(shard_of(user_id, len(self.shards)))
+
+    def _refresh(self):
+        """Catch up with the directory and with every shard read so far."""
+        self._refresh_directory()
+        for number in list(self._opened):
+            self.shards[number]._refresh()
+
+    def _refresh_directory(self):
+        if self.directory.size() == self._directory_size:
+            return
+        with self.locks.hold(WRITER, shared=True):
+            self._catch_up_directory()
+
+    def _catch_up_directory(self):
+        """Read directory entries written since the last read. The caller must hold the WRITER lock."""
+        if self._directory_end is None:
+            entries, end = self.directory.read(DIRECTORY_ID)
+            emails, self._next_uid = {}, 0
+        else:
+            entries, end = self.directory.read(DIRECTORY_ID, self._directory_end)
+            emails = self._emails
+        for entry in entries:
+            self._apply_directory(emails, entry)
+        self._emails = emails
+        self._directory_end = end
+        self._directory_size = self.directory.size()
+
+    def _apply_directory(self, emails, entry):
+        # Every user with an email is kept, in the order they got it, so that the
+        # first one is found as with JsonStore and the next takes over if it changes
+        for sign, email, user_id in entry:
+            if sign == '+':
+                if email is not None and user_id not in emails.setdefault(email, []):
+                    emails[email].append(user_id)
+                if isinstance(user_id, int):
+                    self._next_uid = max(self._next_uid, user_id + 1)
+            elif user_id in emails.get(email, ()):
+                emails[email].remove(user_id)
+                if not emails[email]:
+                    del emails[email]
+
+    def _write_directory(self, entry):
+        with self.locks.hold(WRITER):
+            self._catch_up_directory()
+            if self._directory_end is None:
+                self._directory_end = self.directory.reset(DIRECTORY_ID)
+            elif self._directory_size != self._directory_end:
+                # Drop the torn tail of a writer that crashed mid-append
+                self.directory.truncate(self._directory_end)
+            self._directory_end = self._directory_size = self.directory.append(entry)
+            self._apply_directory(self._emails, entry)
+
+    def _peek_user(self, user_id):
+        shard = self._shard(user_id)
+        # paused_writes() holds the shard's thread lock, so only its file lock is taken here
+        with shard.locks.file_lock(WRITER, shared=True):
+            shard._catch_up()
+        return shard._peek_user(user_id)
+
+    @contextlib.contextmanager
+    def paused_writes(self):
+        """
+        Hold off commits to every shard while a view reads a user.
+
+        Unlike Store.paused_writes() nothing is read up front; _peek_user()
+        catches up with the one shard it reads from.
+        """
+        with contextlib.ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.locks.thread_lock(WRITER))
+            yield
+
+    def all_users(self):
+        """Return the full list of users, shard by shard."""
+        return [user for number in range(len(self.shards)) for user in self._open(number).all_users()]
+
+    def get_user(self, user_id):
+        """Return the user with the given id, or None."""
+        return self._shard(user_id).get_user(user_id)
+
+    def get_user_by_email(self, email):
+        """Return the user with the given email address, or None."""
+        self._refresh_directory()
+        for user_id in list(self._emails.get(email, ())):
+            user = self._shard(user_id).get_user(user_id)
+            # The directory is written before the shard, so it can name a commit that failed
+            if user is not None and user.get('email') == email:
+                return user
+        return None
+
+    def get_version(self, user_id):
+        return self._shard(user_id).get_version(user_id)
+
+    def get_item(self, user_id, coll, item_id):
+        return self._shard(user_id).get_item(user_id, coll, item_id)
+
+    def next_user_id(self):
+        # Every user is in the directory, so this does not load the shards
+        self._refresh_directory()
+        return self._next_uid
+
+    def list_users(self, after=None, limit=None):
+        # The cursor is (shard, position in the shard) of the last user returned
+        number, pos = after if after is not None else (0, -1)
+        users = []
+        while number < len(self.shards):
+            room = None if limit is None else limit - len(users)
+            page, more = self._open(number).list_users(None if pos < 0 else pos, room)
+            users += page
+            pos += len(page)
+            if limit is not None and len(users) == limit:
+                if more is not None or any(self._open(later).list_users(None, 1)[0]
+                                           for later in range(number + 1, len(self.shards))):
+                    return users, (number, pos)
+                return users, None
+            number, pos = number + 1, -1
+        return users, None
+
+    def list_items(self, user_id, coll, after=None, limit=None, start=None, end=None, descending=False):
+        return self._shard(user_id).list_items(user_id, coll, after, limit, start, end, descending)
+
+    def commit(self, ops):
+        """Record email changes in the directory, then commit each shard's operations."""
+        groups = {}
+        entry = []
+        for op in ops:
+            if op['op'] == 'insert':
+                user_id = user_key(op['record'])
+                entry.append(['+', op['record'].get('email'), user_id])
+            else:
+                user_id = op['user']
+                user = self._shard(user_id).get_user(user_id)
+                if user is None:
+                    raise KeyError(f'User {user_id} not found')
+                if op['op'] == 'update_user':
+                    fields = op['fields']
+                    if any(fields.get(key, user_id) != user_id for key in ID_FIELDS):
+                        raise ValueError('The id of a user in a sharded store cannot change')
+                    if 'email' in fields and fields['email'] != user.get('email'):
+                        entry += [['-', user.get('email'), user_id], ['+', fields['email'], user_id]]
+            groups.setdefault(shard_of(user_id, len(self.shards)), []).append(op)
+        if entry:
+            self._write_directory(entry)
+        for number in sorted(groups):
+            self._open(number).commit(groups[number])
+
+    def compact(self):
+        """Fold every shard's journal into its data file."""
+        for number in range(len(self.shards)):
+            self._open(number).compact()
@@ -0,0 +1,224 @@
+"""
+snapshot.py
+
+Compact binary format for the data file, as an alternative to data.json.
+
+A JSON data file has to be parsed in full before the first request can be
+answered, and indent=4 makes it several times larger than its content. The
+binary format stores every user as a compact JSON blob and ends with an index
+of where each blob starts and which id and email it belongs to:
+
+    header   magic "BUDGSNP1", user count, offset of the index (<8sQQ)
+    blobs    one UTF-8 JSON object per user, without whitespace
+    index    (offset, length) of every blob (<QQ each), then a JSON list of
+             [user id, email] pairs in the same order
+
+JsonStore memory-maps the file and reads only the header and the index at
+startup. A user is decoded the first time it is read, so looking up one user
+never touches the bytes of the others, and a compaction copies the blobs of
+unchanged users as they are.
+
+The format of a store's data file is detected from its first bytes. New data
+files are written as JSON unless the SNAPSHOT_FORMAT setting says "binary".
+
+Convert an existing data file (from the backend directory):
+    python -m storage.snapshot data.json data.snap      # JSON to binary
+    python -m storage.snapshot data.snap data.json      # binary to JSON
+"""
+
+import contextlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Sequence
+
+from .base import user_key
+
+JSON = 'json'
+BINARY = 'binary'
+FORMATS = (JSON, BINARY)
+
+MAGIC = b'BUDGSNP1'
+HEADER = struct.Struct('<8sQQ')
+ENTRY = struct.Struct('<QQ')
+
+
+def encode(user):
+    """Return a user as a compact UTF-8 JSON blob."""
+    return json.dumps(user, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def is_binary(f):
+    """Return whether an open binary file starts with the snapshot magic; rewinds it."""
+    magic = f.read(len(MAGIC))
+    f.seek(0)
+    return magic == MAGIC
+
+
+class SnapshotUsers(Sequence):
+    """
+    The users of a binary data file, decoded on first access.
+
+    Behaves like the user list of a JSON data file: users can be read by
+    position and appended. A user read by position is decoded once and kept,
+    so the store's changes to it persist; iterating and slicing decode users
+    that were not read yet without keeping them.
+    """
+
+    def __init__(self, f):
+        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._index_at = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f'{f.name} is not a binary snapshot')
+        keys_at = self._index_at + self._count * ENTRY.size
+        self._keys = json.loads(self._map[keys_at:])
+        self.index_bytes = HEADER.size + len(self._map) - self._index_at
+        self._decoded = {}
+        self._added = []
+
+    def __len__(self):
+        return self._count + len(self._added)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self._user(i, keep=False) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+        return self._user(pos, keep=True)
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield self._user(pos, keep=False)
+
+    def append(self, user):
+        self._added.append(user)
+
+    def _blob(self, pos):
+        offset, length = ENTRY.unpack_from(self._map, self._index_at + pos * ENTRY.size)
+        return self._map[offset:offset + length]
+
+    def _user(self, pos, keep):
+        if pos >= self._count:
+            return self._added[pos - self._count]
+        user = self._decoded.get(pos)
+        if user is None:
+            user = json.loads(self._blob(pos))
+            if keep:
+                self._decoded[pos] = user
+        return user
+
+    def keys(self):
+        """Yield the (id, email) of every user, decoding none that were not read yet."""
+        for pos in range(len(self)):
+            user = self._decoded.get(pos) if pos < self._count else self._added[pos - self._count]
+            if user is None:
+                yield tuple(self._keys[pos])
+            else:
+                yield user_key(user), user.get('email')
+
+    def entries(self):
+        """Yield (id, email, blob) for every user, reusing the stored blobs of unread users."""
+        for pos, (uid, email) in enumerate(self.keys()):
+            if pos < self._count and pos not in self._decoded:
+                yield uid, email, self._blob(pos)
+            else:
+                yield uid, email, encode(self._user(pos, keep=False))
+
+
+def keys(users):
+    """Yield the (id, email) of every user in a user list or SnapshotUsers."""
+    if isinstance(users, SnapshotUsers):
+        return users.keys()
+    return ((user_key(user), user.get('email')) for user in users)
+
+
+def load(f):
+    """
+    Read the users of an open data file in either format.
+
+    Args:
+        f: The data file, opened in binary mode. A binary snapshot is
+            memory-mapped and can be closed afterwards; JSON is read in full.
+
+    Returns:
+        tuple: (users, format) where users is a list or SnapshotUsers.
+    """
+    if is_binary(f):
+        return SnapshotUsers(f), BINARY
+    return json.load(f), JSON
+
+
+def dump(users, f, fmt):
+    """
+    Write users to an open binary file in the given format.
+
+    Returns:
+        int: The number of bytes written.
+    """
+    if fmt == JSON:
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        json.dump(users if isinstance(users, list) else list(users), text, indent=4)
+        text.flush()
+        text.detach()
+        return f.tell()
+
+    entries = users.entries() if isinstance(users, SnapshotUsers) else (
+        (user_key(user), user.get('email'), encode(user)) for user in users)
+    f.write(HEADER.pack(MAGIC, 0, 0))
+    table, pairs, pos = [], [], HEADER.size
+    for uid, email, blob in entries:
+        f.write(blob)
+        table.append(ENTRY.pack(pos, len(blob)))
+        pairs.append([uid, email])
+        pos += len(blob)
+    keys_blob = encode(pairs)
+    f.write(b''.join(table))
+    f.write(keys_blob)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, len(table), pos))
+    return pos + len(table) * ENTRY.size + len(keys_blob)
+
+
+def save(users, path, fmt):
+    """Atomically replace a data file with users in the given format. Returns the bytes written."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.data-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            size = dump(users, f, fmt)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return size
+
+
+def convert(source, target):
+    """
+    Write a data file, including its uncompacted journal, in the other format.
+
+    Returns:
+        tuple: (number of users, format written)
+    """
+    from .json_store import JsonStore
+
+    store = JsonStore(os.path.abspath(source))
+    users = store.all_users()
+    fmt = JSON if store.file_format == BINARY else BINARY
+    save(users, os.path.abspath(target), fmt)
+    return len(users), fmt
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('Usage: python -m storage.snapshot SOURCE TARGET')
+    count, written = convert(sys.argv[1], sys.argv[2])
+    print(f'Wrote {count} users from {sys.argv[1]} to {sys.argv[2]} as {written}')
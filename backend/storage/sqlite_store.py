@@ -0,0 +1,335 @@
+"""
+sqlite_store.py
+
+SQLite storage backend. Users, purchases, deposits and goals live in their own
+tables with indexes on the user id, email and purchase/deposit date, so reads
+and writes touch only the rows involved instead of the whole dataset. The
+database runs in WAL mode, which lets readers proceed while a write commits,
+and connections are reused through a small pool.
+
+Every row keeps the full record as JSON next to the indexed columns, so
+records round-trip with whatever extra fields the frontend sent.
+
+Several worker processes can share one database. Each commit bumps a
+generation number stored in the database; a process that finds it moved by
+more than its own commits knows another process wrote, and drops the state of
+its derived views so they are rebuilt from the database.
+"""
+
+import contextlib
+import json
+import queue
+import sqlite3
+
+from .base import Store, Version, user_key
+from .locks import WRITER
+from .transaction import ID_KEYS, MODIFIED_KEY, VERSION_KEY, Change
+
+POOL_SIZE = 4
+
+# Indexed columns kept alongside the JSON of each item
+ITEM_TABLES = {
+    'purchases': ('purchases', 'purchaseDate', 'purchaseCategory'),
+    'deposits': ('deposits', 'depositDate', 'depositCategory'),
+    'financialGoals': ('goals', 'targetDate', 'category'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    row_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    email TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_user_id ON users (user_id);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (id, generation) VALUES (0, 0);
+"""
+
+ITEM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    row_id INTEGER PRIMARY KEY,
+    user_row INTEGER NOT NULL REFERENCES users (row_id),
+    item_id INTEGER,
+    date TEXT,
+    category TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {table}_user ON {table} (user_row, item_id);
+CREATE INDEX IF NOT EXISTS {table}_user_date ON {table} (user_row, date, item_id);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+class SqliteStore(Store):
+    """Storage backend on top of a SQLite database file."""
+
+    def __init__(self, path, pool_size=POOL_SIZE):
+        super().__init__(path)
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, _, _ in ITEM_TABLES.values():
+                conn.executescript(ITEM_SCHEMA.format(table=table))
+            self._generation = self._read_generation(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Borrow a connection from the pool."""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """Close every pooled connection."""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    # Coordination between processes
+
+    @staticmethod
+    def _read_generation(conn):
+        return conn.execute('SELECT generation FROM meta WHERE id = 0').fetchone()[0]
+
+    def _refresh(self):
+        """Reset the views if another process committed since this one last looked."""
+        with self._connection() as conn:
+            generation = self._read_generation(conn)
+        if generation != self._generation:
+            with self.locks.thread_lock(WRITER):
+                # Checked again: a commit of our own may have caught up meanwhile
+                if generation > self._generation:
+                    self._generation = generation
+                    self._reset_views()
+
+    # Reads
+
+    def _items(self, conn, coll, user_rows):
+        """Return {user_row: [item, ...]} for a collection, in insertion order."""
+        table = ITEM_TABLES[coll][0]
+        if user_rows is None:
+            rows = conn.execute(f'SELECT user_row, doc FROM {table} ORDER BY row_id')
+        else:
+            marks = ','.join('?' * len(user_rows))
+            rows = conn.execute(f'SELECT user_row, doc FROM {table} WHERE user_row IN ({marks}) '
+                                'ORDER BY row_id', user_rows)
+        items = {}
+        for user_row, doc in rows:
+            items.setdefault(user_row, []).append(json.loads(doc))
+        return items
+
+    def _assemble(self, conn, rows, all_rows=False):
+        """Turn user rows into user dictionaries with their collections attached."""
+        user_rows = None if all_rows else [row_id for row_id, _ in rows]
+        items = {coll: self._items(conn, coll, user_rows) for coll in ITEM_TABLES}
+        users = []
+        for row_id, doc in rows:
+            user = json.loads(doc)
+            # The user document keeps a placeholder for each collection it has
+            for coll in ITEM_TABLES:
+                if coll in user:
+                    user[coll] = items[coll].get(row_id, [])
+            users.append(user)
+        return users
+
+    def all_users(self):
+        with self._connection() as conn:
+            rows = conn.execute('SELECT row_id, doc FROM users ORDER BY row_id').fetchall()
+            return self._assemble(conn, rows, all_rows=True)
+
+    def _get_one(self, where, value):
+        with self._connection() as conn:
+            rows = conn.execute(f'SELECT row_id, doc FROM users WHERE {where} = ? '
+                                'ORDER BY row_id LIMIT 1', (value,)).fetchall()
+            users = self._assemble(conn, rows)
+        return users[0] if users else None
+
+    def get_user(self, user_id):
+        return self._get_one('user_id', user_id)
+
+    def get_user_by_email(self, email):
+        return self._get_one('email', email)
+
+    def _get_version(self, where, value):
+        # Read the two fields out of the stored document without loading any items
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT user_id, json_extract(doc, '$.{VERSION_KEY}'), "
+                               f"json_extract(doc, '$.{MODIFIED_KEY}') FROM users WHERE {where} = ? "
+                               'ORDER BY row_id LIMIT 1', (value,)).fetchone()
+        return Version(row[0], row[1] or 0, row[2]) if row else None
+
+    def get_version(self, user_id):
+        return self._get_version('user_id', user_id)
+
+    def get_version_by_email(self, email):
+        return self._get_version('email', email)
+
+    def get_item(self, user_id, coll, item_id):
+        table = ITEM_TABLES[coll][0]
+        with self._connection() as conn:
+            row = conn.execute(f'SELECT {table}.doc FROM users JOIN {table} ON {table}.user_row = users.row_id '
+                               f'WHERE users.user_id = ? AND {table}.item_id = ? '
+                               f'ORDER BY users.row_id, {table}.row_id LIMIT 1', (user_id, item_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def next_user_id(self):
+        with self._connection() as conn:
+            (highest,) = conn.execute("SELECT MAX(user_id) FROM users WHERE typeof(user_id) = 'integer'").fetchone()
+        return 0 if highest is None else highest + 1
+
+    def list_users(self, after=None, limit=None):
+        with self._connection() as conn:
+            sql = 'SELECT row_id, doc FROM users WHERE row_id > ? ORDER BY row_id'
+            params = [after if after is not None else 0]
+            if limit is not None:
+                sql += ' LIMIT ?'
+                params.append(limit + 1)
+            rows = conn.execute(sql, params).fetchall()
+            more = limit is not None and len(rows) > limit
+            rows = rows[:limit] if more else rows
+            return self._assemble(conn, rows), (rows[-1][0] if more else None)
+
+    def list_items(self, user_id, coll, after=None, limit=None, start=None, end=None, descending=False):
+        table = ITEM_TABLES[coll][0]
+        with self._connection() as conn:
+            row = conn.execute('SELECT row_id FROM users WHERE user_id = ? ORDER BY row_id LIMIT 1',
+                               (user_id,)).fetchone()
+            if row is None:
+                return None
+            clauses, params = ['user_row = ?'], [row[0]]
+            if start is not None:
+                clauses.append('date >= ?')
+                params.append(start)
+            if end is not None:
+                clauses.append('date < ?')
+                params.append(end)
+            if after is not None:
+                clauses.append('(date, item_id) < (?, ?)' if descending else '(date, item_id) > (?, ?)')
+                params.extend(after)
+            direction = 'DESC' if descending else 'ASC'
+            sql = (f'SELECT date, item_id, doc FROM {table} WHERE {" AND ".join(clauses)} '
+                   f'ORDER BY date {direction}, item_id {direction}')
+            if limit is not None:
+                sql += ' LIMIT ?'
+                params.append(limit + 1)
+            rows = conn.execute(sql, params).fetchall()
+        more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if more else rows
+        return [json.loads(doc) for _, _, doc in rows], ((rows[-1][0], rows[-1][1]) if more else None)
+
+    # Writes
+
+    def commit(self, ops):
+        with self.locks.hold(WRITER), self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            changes = []
+            try:
+                generation = self._read_generation(conn)
+                for op in ops:
+                    changes += self._apply(conn, op)
+                conn.execute('UPDATE meta SET generation = ? WHERE id = 0', (generation + 1,))
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            if generation != self._generation:
+                # Another process wrote since we last looked; our views missed it
+                self._reset_views()
+            else:
+                self._emit(changes)
+            self._generation = generation + 1
+
+    def _user_row(self, conn, user_id):
+        row = conn.execute('SELECT row_id, doc FROM users WHERE user_id = ? ORDER BY row_id LIMIT 1',
+                           (user_id,)).fetchone()
+        if row is None:
+            raise KeyError(f'User {user_id} not found')
+        return row[0], json.loads(row[1])
+
+    def _insert_user(self, conn, record):
+        doc = dict(record)
+        colls = {coll: doc[coll] for coll in ITEM_TABLES if isinstance(doc.get(coll), list)}
+        for coll in colls:
+            doc[coll] = None
+        cur = conn.execute('INSERT INTO users (user_id, email, doc) VALUES (?, ?, ?)',
+                           (user_key(record), record.get('email'), _dumps(doc)))
+        for coll, items in colls.items():
+            for item in items:
+                self._insert_item(conn, cur.lastrowid, coll, item)
+
+    def _insert_item(self, conn, user_row, coll, item):
+        table, date_key, category_key = ITEM_TABLES[coll]
+        conn.execute(f'INSERT INTO {table} (user_row, item_id, date, category, doc) VALUES (?, ?, ?, ?, ?)',
+                     (user_row, item.get(ID_KEYS[coll]), item.get(date_key) or '', item.get(category_key), _dumps(item)))
+
+    def _apply(self, conn, op):
+        """Apply one operation inside the open transaction and return its Changes."""
+        kind = op['op']
+        if kind == 'insert':
+            self._insert_user(conn, op['record'])
+            uid = user_key(op['record'])
+            return [] if uid is None else [Change(uid, None, None, op['record'])]
+        uid = op['user']
+        user_row, doc = self._user_row(conn, uid)
+        if kind == 'update_user':
+            fields = dict(op['fields'])
+            changes = [Change(uid, None, {key: doc.get(key) for key in fields}, op['fields'])]
+            for coll in ITEM_TABLES:
+                if coll in fields:
+                    table = ITEM_TABLES[coll][0]
+                    old_items = self._items(conn, coll, [user_row]).get(user_row, [])
+                    changes += [Change(uid, coll, item, None) for item in old_items]
+                    conn.execute(f'DELETE FROM {table} WHERE user_row = ?', (user_row,))
+                    for item in fields.pop(coll) or []:
+                        self._insert_item(conn, user_row, coll, item)
+                        changes.append(Change(uid, coll, None, item))
+                    doc[coll] = None
+            doc.update(fields)
+            conn.execute('UPDATE users SET user_id = ?, email = ?, doc = ? WHERE row_id = ?',
+                         (user_key(doc), doc.get('email'), _dumps(doc), user_row))
+            return changes
+        coll = op['coll']
+        table, date_key, category_key = ITEM_TABLES[coll]
+        if coll not in doc:
+            doc[coll] = None
+            conn.execute('UPDATE users SET doc = ? WHERE row_id = ?', (_dumps(doc), user_row))
+        if kind == 'add':
+            self._insert_item(conn, user_row, coll, op['item'])
+            return [Change(uid, coll, None, op['item'])]
+        row = conn.execute(f'SELECT row_id, doc FROM {table} WHERE user_row = ? AND item_id = ? '
+                           'ORDER BY row_id LIMIT 1', (user_row, op['id'])).fetchone()
+        if row is None:
+            return []
+        if kind == 'update':
+            old = json.loads(row[1])
+            item = dict(old, **op['fields'])
+            conn.execute(f'UPDATE {table} SET item_id = ?, date = ?, category = ?, doc = ? WHERE row_id = ?',
+                         (item.get(ID_KEYS[coll]), item.get(date_key) or '', item.get(category_key),
+                          _dumps(item), row[0]))
+            return [Change(uid, coll, old, item)]
+        if kind == 'remove':
+            conn.execute(f'DELETE FROM {table} WHERE row_id = ?', (row[0],))
+            return [Change(uid, coll, json.loads(row[1]), None)]
+        raise ValueError(f'Unknown operation: {kind}')
+
+    def import_users(self, users):
+        """Bulk load a list of user records in a single transaction."""
+        self.commit([{'op': 'insert', 'record': user} for user in users])
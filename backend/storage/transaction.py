@@ -0,0 +1,140 @@
+"""
+transaction.py
+
+Describes changes to the database as small operation records. Route handlers
+collect the operations for one request in a Transaction, and the store applies
+and persists all of them together when the transaction is committed.
+
+Operations are plain dictionaries so they can be written to the journal as-is:
+
+    {"op": "insert", "record": {...}}
+    {"op": "update_user", "user": 0, "fields": {...}}
+    {"op": "add", "user": 0, "coll": "purchases", "item": {...}}
+    {"op": "update", "user": 0, "coll": "financialGoals", "id": 1, "fields": {...}}
+    {"op": "remove", "user": 0, "coll": "deposits", "id": 2}
+
+Stores report what each applied operation did as Change records, which keep
+derived views such as the spending rollups up to date.
+
+Item ids are never reused: each user stores the next free id of every
+collection under "nextIds", and Transaction.allocate_id() advances it in the
+same commit that adds the item. Deleting an item leaves the other ids alone.
+
+Every committed transaction also bumps the "version" of each user it changes
+and records the time in "modifiedAt" (see Store.transaction()), which lets
+readers tell whether a user changed without comparing the whole record.
+"""
+
+from collections import namedtuple
+
+# user_id and coll say what changed (coll is None for the user's own fields).
+# old and new are the item before and after: old is None for additions, new is
+# None for removals. For user fields they map each changed field to its value.
+Change = namedtuple('Change', 'user_id coll old new')
+
+# The field that identifies an item in each per-user collection
+ID_KEYS = {
+    'purchases': 'purchaseId',
+    'deposits': 'depositId',
+    'financialGoals': 'goalId',
+}
+
+# Lists of items kept in a user field rather than a collection of their own,
+# whose ids are still handed out by allocate_id()
+FIELD_ID_KEYS = {
+    'recurringRules': 'ruleId',
+}
+
+# The field that dates an item, used to sort and filter history
+DATE_KEYS = {
+    'purchases': 'purchaseDate',
+    'deposits': 'depositDate',
+    'financialGoals': 'targetDate',
+}
+
+
+# User fields holding the version number and the time of the last change
+VERSION_KEY = 'version'
+MODIFIED_KEY = 'modifiedAt'
+
+
+def first_free_id(user, coll):
+    """Return the next id of a collection for a user that has no stored counter yet."""
+    id_key = ID_KEYS.get(coll) or FIELD_ID_KEYS[coll]
+    ids = (item.get(id_key) for item in user.get(coll) or [])
+    return max((item_id for item_id in ids if isinstance(item_id, int)), default=-1) + 1
+
+
+class Transaction:
+    """An ordered list of operations that is committed as a single unit."""
+
+    def __init__(self):
+        self.ops = []
+        self._counters = {}
+
+    def allocate_id(self, user_id, user, coll):
+        """
+        Reserve the next id in one of a user's collections.
+
+        The user's stored counter is advanced by this transaction, so an id is
+        handed out once even if its item is deleted later. Several ids can be
+        allocated in one transaction; the counter is written once.
+
+        Args:
+            user_id: The id of the user, whose lock the caller holds.
+            user (dict): The user as read inside the transaction.
+            coll (str): "purchases", "deposits", "financialGoals" or a
+                list in FIELD_ID_KEYS.
+
+        Returns:
+            int: The new id.
+        """
+        counters = self._counters_of(user_id, user, coll)
+        item_id = counters[coll]
+        counters[coll] = item_id + 1
+        return item_id
+
+    def _counters_of(self, user_id, user, coll):
+        counters = self._counters.get(user_id)
+        if counters is None:
+            counters = self._counters[user_id] = dict(user.get('nextIds') or {})
+            self.update_user(user_id, {'nextIds': counters})
+        if coll not in counters:
+            counters[coll] = first_free_id(user, coll)
+        return counters
+
+    def inserted(self):
+        """Return the records added by insert operations."""
+        return [op['record'] for op in self.ops if op['op'] == 'insert']
+
+    def users(self):
+        """Return the ids of the existing users changed by this transaction, in order."""
+        return list(dict.fromkeys(op['user'] for op in self.ops if 'user' in op))
+
+    def insert(self, record):
+        """Append a new top-level record, such as a new user."""
+        self.ops.append({'op': 'insert', 'record': record})
+
+    def update_user(self, user_id, fields):
+        """Set top-level fields on a user."""
+        self.ops.append({'op': 'update_user', 'user': user_id, 'fields': fields})
+
+    def add(self, user_id, coll, item):
+        """Append an item to one of a user's collections."""
+        self.ops.append({'op': 'add', 'user': user_id, 'coll': coll, 'item': item})
+
+    def update(self, user_id, coll, item_id, fields):
+        """Set fields on an item in one of a user's collections."""
+        self.ops.append({'op': 'update', 'user': user_id, 'coll': coll, 'id': item_id, 'fields': fields})
+
+    def remove(self, user_id, coll, item_id, user=None):
+        """
+        Remove an item from one of a user's collections.
+
+        Pass the user as read inside the transaction so that a user without a
+        stored counter gets one first; otherwise deleting the item with the
+        highest id would let that id be handed out again.
+        """
+        if user is not None:
+            self._counters_of(user_id, user, coll)
+        self.ops.append({'op': 'remove', 'user': user_id, 'coll': coll, 'id': item_id})
@@ -0,0 +1,69 @@
+"""
+store_cases.py
+
+Base classes for tests that run against every storage backend.
+
+A test case derives from StoreTestCase and sets USERS, the records its store
+starts with. Each test gets self.store, a JsonStore in a temporary directory
+that the app's routes use, and self.client for the app. The same tests run
+against another backend by listing its mixin first in a subclass:
+
+    class SqliteSummaryTestCase(store_cases.SqliteStoreMixin, SummaryTestCase):
+        pass
+"""
+
+import unittest
+import json
+import os
+import tempfile
+from backend.app import app
+from storage import set_store, sharded_store
+from storage.json_store import JsonStore
+from storage.sharded_store import ShardedStore
+from storage.sqlite_store import SqliteStore
+
+class StoreTestCase(unittest.TestCase):
+    """Runs against the JSON store; subclasses with a mixin below repeat every test"""
+
+    USERS = []
+
+    def make_store(self, users):
+        fd, path = tempfile.mkstemp(dir=self.tmpdir.name, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(users, f)
+        return JsonStore(path)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = self.use_store(self.USERS)
+        self.client = self.make_client()
+
+    def use_store(self, users):
+        """Create a store holding users and make it the one the routes use"""
+        store = self.make_store(users)
+        previous = set_store(store)
+        self.addCleanup(set_store, previous)
+        return store
+
+    def make_client(self):
+        return app.test_client()
+
+class SqliteStoreMixin:
+    """Runs the tests of a StoreTestCase against a SQLite database"""
+
+    def make_store(self, users):
+        store = SqliteStore(os.path.join(tempfile.mkdtemp(dir=self.tmpdir.name), 'budget.db'))
+        store.import_users(users)
+        self.addCleanup(store.close)
+        return store
+
+class ShardedStoreMixin:
+    """Runs the tests of a StoreTestCase against a sharded store"""
+
+    SHARDS = 3
+
+    def make_store(self, users):
+        path = os.path.join(tempfile.mkdtemp(dir=self.tmpdir.name), 'data.shards')
+        sharded_store.create(path, users, shards=self.SHARDS)
+        return ShardedStore(path)
@@ -1,15 +1,32 @@
 import unittest
 import json
+import os
+import shutil
+import tempfile
 from backend.app import app
+from storage import set_store
+from storage.json_store import JsonStore
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data.json')
 
 class FlaskAppTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
         """Runs once before all tests, setting up the Flask app context"""
+        # Work on a copy so the tests do not change the real data.json
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmpdir.name, 'data.json')
+        shutil.copy(DATA_FILE, path)
+        cls.previous_store = set_store(JsonStore(path))
         cls.app = app.test_client()  # Accessing the Flask test client
         cls.app.testing = True
 
+    @classmethod
+    def tearDownClass(cls):
+        set_store(cls.previous_store)
+        cls.tmpdir.cleanup()
+
     def test_get_all_users(self):
         """Test the /users route (GET request)"""
         response = self.app.get('/users')
@@ -0,0 +1,52 @@
+import unittest
+import json
+from backend.app import app
+
+class LoginTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+        cls.app.testing = True
+
+    def login(self, payload):
+        return self.app.post('/api/auth/login', data=json.dumps(payload), content_type='application/json')
+
+    def test_login_success(self):
+        """Valid credentials return the user's summary without their history"""
+        response = self.login({'email': 'samuel@test.edu', 'password': '1234567'})
+        self.assertEqual(response.status_code, 200)
+        user = response.json['user']
+        self.assertEqual(user['email'], 'samuel@test.edu')
+        self.assertEqual(user['userId'], 2)
+        self.assertNotIn('purchases', user)
+        self.assertNotIn('password', user)
+
+    def test_login_wrong_password(self):
+        """A wrong password is rejected"""
+        response = self.login({'email': 'samuel@test.edu', 'password': 'nope'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json, {'error': 'Invalid email or password.'})
+
+    def test_login_unknown_email(self):
+        """An unknown email is rejected the same way as a wrong password"""
+        response = self.login({'email': 'nobody@example.com', 'password': '1234567'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_user_without_password(self):
+        """Users that never set a password cannot log in"""
+        response = self.login({'email': 'alex@example.com', 'password': 'anything'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_missing_fields(self):
+        """Both email and password are required"""
+        response = self.login({'email': 'samuel@test.edu'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_body_not_an_object(self):
+        """A body that is not a JSON object is rejected"""
+        for body in ([1], 'samuel@test.edu', 5):
+            self.assertEqual(self.login(body).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+import contextlib
+import io
+from bench import load
+
+class LoadHarnessTestCase(unittest.TestCase):
+
+    def test_every_route_runs(self):
+        """A tiny load test reaches every route without server errors"""
+        args = load.parse_args(['--users', '5', '--requests', '2', '--concurrency', '2',
+                                '--backend', 'json', 'sqlite', '--server', 'client'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = load.run(args)
+        self.assertEqual(len(report['results']), 2 * len(load.ROUTES))
+        for result in report['results']:
+            self.assertFalse([s for s in result['statuses'] if s.startswith('5')], result)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['meta']['dataset']['users'], 5)
+
+    def test_percentile(self):
+        """Percentiles use the nearest-rank method"""
+        values = list(range(1, 101))
+        self.assertEqual(load.percentile(values, 0.5), 50)
+        self.assertEqual(load.percentile(values, 0.99), 99)
+        self.assertEqual(load.percentile([7], 0.99), 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import json
+from routes.budget import current_month
+import store_cases
+
+MONTH = current_month()
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 1000.0, 'totalMonthlyBudget': 100,
+    'categoryBudgets': {'Food & Drink': 40},
+    'purchases': [{'purchaseId': 0, 'purchaseDate': f'{MONTH}-01T10:00:00Z', 'purchaseCost': -30,
+                   'purchaseCategory': 'Shopping'},
+                  {'purchaseId': 1, 'purchaseDate': '2020-01-01T10:00:00Z', 'purchaseCost': -5}],
+    'deposits': [], 'financialGoals': [],
+}]
+
+class BudgetTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def add_purchase(self, cost, category='Shopping', date=f'{MONTH}-05T10:00:00Z'):
+        response = self.client.post('/api/data/purchase/users/0/transactions', content_type='application/json',
+                                    data=json.dumps({'purchaseDate': date, 'purchaseCost': cost,
+                                                     'purchaseCategory': category}))
+        self.assertEqual(response.status_code, 200)
+        return response.json['alerts']
+
+    def test_thresholds_fire_once(self):
+        """Each threshold raises one alert per month, stored with the user"""
+        self.assertEqual(self.add_purchase(-10), [])
+        alerts = self.add_purchase(-45)
+        self.assertEqual([(a['category'], a['threshold']) for a in alerts], [(None, 50), (None, 80)])
+        self.assertEqual(alerts[0]['spent'], 85.0)
+        self.assertEqual(self.add_purchase(-5), [])
+        self.assertEqual([a['threshold'] for a in self.add_purchase(-20)], [100])
+        stored = self.client.get('/api/data/0/alerts').json['alerts']
+        self.assertEqual([a['threshold'] for a in stored], [50, 80, 100])
+
+    def test_other_months_do_not_count(self):
+        """Spending is compared with the budget of the month it falls in"""
+        self.assertEqual(self.add_purchase(-10, date='2020-01-20T10:00:00Z'), [])
+        self.assertEqual(self.add_purchase(10), [])
+
+    def test_category_budgets(self):
+        """A category with its own budget raises its own alerts"""
+        alerts = self.add_purchase(-35, category='Food & Drink')
+        self.assertEqual([(a['category'], a['threshold']) for a in alerts],
+                         [(None, 50), ('Food & Drink', 50), ('Food & Drink', 80)])
+
+    def test_deleting_lowers_spend(self):
+        """The status follows deleted purchases"""
+        self.add_purchase(-40)
+        self.client.delete('/api/data/purchase/0', content_type='application/json', data=json.dumps({'purchaseId': 2}))
+        body = self.client.get('/api/data/0/budget').json
+        self.assertEqual(body['spent'], 30.0)
+
+    def test_lower_budget_raises_alerts(self):
+        """Lowering the budget checks the current month again"""
+        response = self.client.patch('/users/email/a%40example.com', content_type='application/json',
+                                     data=json.dumps({'totalMonthlyBudget': 30}))
+        self.assertEqual(response.status_code, 200)
+        alerts = self.client.get(f'/api/data/0/alerts?month={MONTH}').json['alerts']
+        self.assertEqual([a['threshold'] for a in alerts], [50, 80, 100])
+
+    def test_bad_user_updates(self):
+        """Updates must be objects and leave the fields the store manages alone"""
+        version = self.store.get_version(0).number
+        for body in ([], 'x', 5, {'version': 9}, {'nextIds': {'purchases': 0}, 'name': 'A'}):
+            response = self.client.patch('/users/email/a%40example.com', content_type='application/json',
+                                         data=json.dumps(body))
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(self.store.get_version(0).number, version)
+
+    def test_ingest_raises_alerts(self):
+        """Bulk imports are checked once, for all their purchases"""
+        rows = {'purchases': [{'purchaseDate': f'{MONTH}-06T10:00:00Z', 'purchaseCost': -15}] * 2}
+        response = self.client.post('/api/data/0/import', content_type='application/json',
+                                    data=json.dumps(rows))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a['threshold'] for a in response.json['alerts']], [50])
+
+    def test_status(self):
+        """The status reports spending against the total and each category budget"""
+        self.add_purchase(-50, category='Food & Drink')
+        body = self.client.get('/api/data/0/budget').json
+        self.assertEqual((body['month'], body['budget'], body['spent'], body['remaining'], body['usedPct']),
+                         (MONTH, 100.0, 80.0, 20.0, 80.0))
+        self.assertFalse(body['overBudget'])
+        food = body['categories']['Food & Drink']
+        self.assertEqual((food['spent'], food['remaining']), (50.0, -10.0))
+        self.assertTrue(food['overBudget'])
+        self.assertEqual(len(body['alerts']), 5)
+
+        old = self.client.get('/api/data/0/budget?month=2020-01').json
+        self.assertEqual((old['spent'], old['overBudget'], old['alerts']), (5.0, False, []))
+
+    def test_bad_requests(self):
+        """The month must be YYYY-MM and the user must exist"""
+        self.assertEqual(self.client.get('/api/data/0/budget?month=May').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/0/alerts?month=2025-5').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/9/budget').status_code, 404)
+        self.assertEqual(self.client.get('/api/data/9/alerts').status_code, 404)
+
+class SqliteBudgetTestCase(store_cases.SqliteStoreMixin, BudgetTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import json
+import store_cases
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+    'purchases': [{'purchaseId': 0, 'purchaseDate': '2025-05-01T10:00:00Z', 'purchaseCost': -10}],
+    'deposits': [{'depositId': 0, 'depositDate': '2025-05-02T10:00:00Z', 'depositAmount': 50}],
+    'financialGoals': [{'goalId': 0, 'currentAmount': 0, 'targetAmount': 100}],
+}, {
+    'user_id': 1, 'email': 'b@example.com', 'currentBalance': 5.0,
+}]
+
+URLS = [
+    '/api/data/0',
+    '/users/email/a%40example.com',
+    '/users/0/goals',
+    '/api/data/purchase/0',
+    '/api/data/purchase/0?limit=10',
+    '/api/data/deposit/0',
+]
+
+class ConditionalGetTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def deposit(self, user_id=0):
+        response = self.client.patch(f'/api/data/deposit/{user_id}', content_type='application/json',
+                                     data=json.dumps({'depositAmount': 5, 'depositDate': '2025-05-10T00:00:00Z'}))
+        self.assertEqual(response.status_code, 201)
+
+    def test_matching_etag_is_not_modified(self):
+        """Sending back the ETag gets an empty 304"""
+        for url in URLS:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200, url)
+            self.assertEqual(first.headers['Cache-Control'], 'private, no-cache')
+            again = self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual(again.data, b'')
+            self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+
+    def test_write_changes_etag(self):
+        """Any change to the user makes the old ETag stale"""
+        for url in URLS:
+            etag = self.client.get(url).headers['ETag']
+            self.deposit()
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_other_users_keep_etag(self):
+        """Changing one user leaves the others' ETags alone"""
+        etag = self.client.get('/api/data/1').headers['ETag']
+        self.deposit(0)
+        self.assertEqual(self.client.get('/api/data/1', headers={'If-None-Match': etag}).status_code, 304)
+
+    def test_versions_count_transactions(self):
+        """Each transaction bumps the user's version once and records when"""
+        self.assertEqual(self.store.get_version(0).number, 0)
+        self.deposit()
+        self.deposit()
+        version = self.store.get_version(0)
+        self.assertEqual(version.number, 2)
+        self.assertIsNotNone(version.modified)
+        self.assertEqual(self.store.get_version_by_email('a@example.com'), version)
+        self.assertEqual(self.store.get_user(0)['version'], 2)
+
+    def test_new_users_start_at_one(self):
+        """Users created through the API start at version 1"""
+        self.client.post('/api/data', content_type='application/json', data=json.dumps({'email': 'c@example.com'}))
+        self.assertEqual(self.store.get_version_by_email('c@example.com').number, 1)
+
+    def test_if_modified_since(self):
+        """If-Modified-Since is honoured when there is no If-None-Match"""
+        self.deposit()
+        modified = self.client.get('/api/data/0').headers['Last-Modified']
+        response = self.client.get('/api/data/0', headers={'If-Modified-Since': modified})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/data/0', headers={'If-Modified-Since': modified,
+                                                           'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_user(self):
+        """Unknown users are still a 404"""
+        self.assertEqual(self.client.get('/api/data/9', headers={'If-None-Match': '*'}).status_code, 404)
+        self.assertEqual(self.client.get('/users/email/nobody%40example.com').status_code, 404)
+
+class SqliteConditionalGetTestCase(store_cases.SqliteStoreMixin, ConditionalGetTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
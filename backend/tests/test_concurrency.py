@@ -0,0 +1,85 @@
+import unittest
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from backend.app import app
+from storage import set_store
+from storage.json_store import JsonStore
+from storage.locks import fcntl
+
+USERS = 4
+THREADS = 8
+DEPOSITS_PER_THREAD = 24
+
+
+def deposit_worker(path, user_ids, count):
+    """Record deposits straight through a store of its own, as a separate worker process would"""
+    store = JsonStore(path, compact_bytes=4096)
+    for _ in range(count):
+        for user_id in user_ids:
+            with store.transaction(user_id) as tx:
+                user = store.get_user(user_id)
+                tx.update_user(user_id, {'currentBalance': user['currentBalance'] + 1})
+                tx.add(user_id, 'deposits', {'depositId': len(user['deposits']), 'depositAmount': 1})
+
+
+class ConcurrentDepositTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Point the routes at a fresh data file"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(self.path, 'w') as f:
+            json.dump([{'user_id': i, 'email': f'user{i}@example.com', 'currentBalance': 0, 'deposits': []}
+                       for i in range(USERS)], f)
+        previous = set_store(JsonStore(self.path))
+        self.addCleanup(set_store, previous)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_balances(self, store, expected):
+        for user_id in range(USERS):
+            user = store.get_user(user_id)
+            self.assertEqual(user['currentBalance'], expected)
+            self.assertEqual(sorted(d['depositId'] for d in user['deposits']), list(range(expected)))
+
+    def test_concurrent_deposits_are_not_lost(self):
+        """Concurrent PATCH /api/data/deposit/<id> calls all land in the final balances"""
+        errors = []
+
+        def run():
+            client = app.test_client()
+            for i in range(DEPOSITS_PER_THREAD):
+                response = client.patch(f'/api/data/deposit/{i % USERS}',
+                                        data=json.dumps({'depositAmount': 1}),
+                                        content_type='application/json')
+                if response.status_code != 201:
+                    errors.append(response.status_code)
+
+        threads = [threading.Thread(target=run) for _ in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        expected = THREADS * DEPOSITS_PER_THREAD // USERS
+        self.assert_balances(JsonStore(self.path), expected)
+
+    @unittest.skipIf(fcntl is None, 'cross-process locking needs fcntl')
+    def test_concurrent_processes_share_the_data_file(self):
+        """Worker processes writing the same users through their own stores do not lose updates"""
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=deposit_worker, args=(self.path, list(range(USERS)), 20)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+            self.assertEqual(w.exitcode, 0)
+        self.assert_balances(JsonStore(self.path), 80)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from unittest import mock
+import csv
+import io
+import json
+import os
+import sys
+from backend.app import create_app
+import exports
+import store_cases
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+USERS = [
+    {'user_id': 0, 'email': 'a@example.com', 'preferredCurrency': 'USD',
+     'purchases': [
+         {'purchaseId': 0, 'name': 'Rent', 'purchaseCategory': 'Bills', 'purchaseDate': '2025-05-01T09:00:00Z',
+          'purchaseCost': -1200},
+         {'purchaseId': 1, 'name': 'Café, "Le Nord"', 'purchaseDate': '2025-05-20T09:00:00Z',
+          'purchaseCost': -4.5, 'currency': 'EUR', 'exchangeRate': 1.25},
+     ],
+     'deposits': [
+         {'depositId': 0, 'name': 'Salary', 'depositCategory': 'Income', 'depositDate': '2025-05-10T09:00:00Z',
+          'depositAmount': 3000.1},
+     ]},
+    {'user_id': 1, 'email': 'b@example.com', 'preferredCurrency': 'JPY',
+     'purchases': [{'purchaseId': 0, 'name': 'Lunch', 'purchaseCategory': 'Food',
+                    'purchaseDate': '2025-06-01T12:00:00Z', 'purchaseCost': -900}],
+     'deposits': []},
+]
+
+HEADERS = {'X-Admin-Token': 'secret'}
+
+class ExportTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def make_client(self):
+        self.export_dir = os.path.join(self.tmpdir.name, 'exports')
+        app = create_app({'EXPORT_DIR': self.export_dir, 'ADMIN_TOKEN': 'secret', 'LOG_LEVEL': 'WARNING'},
+                         store=self.store)
+        self.jobs = app.extensions[exports.EXTENSION]
+        self.addCleanup(self.jobs.shutdown)
+        return app.test_client()
+
+    def submit(self, body, headers=None):
+        return self.client.post('/api/exports', content_type='application/json', data=json.dumps(body),
+                                headers=headers)
+
+    def run_job(self, body, headers=None):
+        response = self.submit(body, headers)
+        self.assertEqual(response.status_code, 202, response.json)
+        self.assertEqual(response.headers['Location'], f"/api/exports/{response.json['jobId']}")
+        self.jobs.wait(response.json['jobId'], timeout=10)
+        return self.client.get(response.headers['Location'], headers=headers).json
+
+    def test_user_statement(self):
+        """A user's statement streams every purchase and deposit, oldest first"""
+        response = self.client.get('/api/data/0/export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('statement-0.csv', response.headers['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([(row['type'], row['id']) for row in rows],
+                         [('purchase', '0'), ('deposit', '0'), ('purchase', '1')])
+        self.assertEqual(rows[1]['amount'], '3000.1')
+        self.assertEqual(dict(rows[2], userId=None), {
+            'userId': None, 'type': 'purchase', 'id': '1', 'date': '2025-05-20T09:00:00Z',
+            'name': 'Café, "Le Nord"', 'category': 'Other', 'amount': '-4.5', 'currency': 'EUR',
+            'exchangeRate': '1.25'})
+
+    def test_date_range(self):
+        """from and to limit the statement, to including the whole day"""
+        response = self.client.get('/api/data/0/export?from=2025-05-02&to=2025-05-20')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([row['name'] for row in rows], ['Salary', 'Café, "Le Nord"'])
+
+    def test_statement_errors(self):
+        self.assertEqual(self.client.get('/api/data/7/export').status_code, 404)
+        self.assertEqual(self.client.get('/api/data/0/export?format=parquet').status_code, 400)
+        self.assertEqual(self.submit({'userId': 7}).status_code, 404)
+        self.assertEqual(self.submit({'userId': '0'}).status_code, 400)
+        self.assertEqual(self.submit({'userId': 0, 'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/' + 'f' * 32).status_code, 404)
+        self.assertEqual(self.client.get('/api/exports/../data').status_code, 404)
+
+    def test_job(self):
+        """A queued job writes the statement to a file that can then be downloaded"""
+        job = self.run_job({'userId': 0, 'from': '2025-05-05'})
+        self.assertEqual((job['status'], job['rows'], job['userId']), ('done', 2, 0))
+        self.assertEqual(job['from'], '2025-05-05')
+        response = self.client.get(job['downloadUrl'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('statement-0.csv', response.headers['Content-Disposition'])
+        self.assertEqual(len(response.data), job['bytes'])
+        self.assertEqual(response.get_data(as_text=True).splitlines()[0], ','.join(exports.COLUMNS))
+        response.close()
+
+    def test_all_users_need_admin_token(self):
+        """Exports of every user and their status are for admins only"""
+        self.assertEqual(self.submit({}).status_code, 401)
+        job = self.run_job({}, HEADERS)
+        self.assertEqual((job['status'], job['rows']), ('done', 4))
+        self.assertEqual(self.client.get(job['statusUrl']).status_code, 401)
+        self.assertEqual(self.client.get(job['downloadUrl']).status_code, 401)
+        response = self.client.get(job['downloadUrl'], headers=HEADERS)
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([(row['userId'], row['currency']) for row in rows][-1], ('1', 'JPY'))
+        response.close()
+
+    def test_failed_and_pending_jobs(self):
+        """A failed job reports its error, and a job still running cannot be downloaded"""
+        with mock.patch.dict(exports.WRITERS, {exports.CSV: mock.Mock(side_effect=OSError('disk full'))}):
+            job = self.run_job({'userId': 1})
+        self.assertEqual((job['status'], job['error']), ('failed', 'disk full'))
+        self.assertNotIn('downloadUrl', job)
+        self.assertEqual(self.client.get(job['statusUrl'] + '/download').status_code, 409)
+        self.assertEqual(os.listdir(self.export_dir), [job['jobId'] + '.json'])
+
+    def test_finished_jobs_expire(self):
+        """Queuing a job deletes the files of jobs finished longer than EXPORT_KEEP ago"""
+        old = self.run_job({'userId': 0})
+        status_path = os.path.join(self.export_dir, old['jobId'] + '.json')
+        os.utime(status_path, (0, 0))
+        self.run_job({'userId': 1})
+        self.assertEqual(self.client.get(old['statusUrl']).status_code, 404)
+        self.assertEqual(len(os.listdir(self.export_dir)), 2)
+
+    def test_parquet_needs_pyarrow(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            response = self.submit({'userId': 0, 'format': 'parquet'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pyarrow', response.json['error'])
+
+    @unittest.skipIf(pq is None, 'Parquet exports need pyarrow')
+    def test_parquet(self):
+        """Parquet statements are written in row groups"""
+        path = os.path.join(self.tmpdir.name, 'all.parquet')
+        self.assertEqual(exports.write_parquet(exports.rows(self.store), path, row_group_rows=3), 4)
+        self.assertEqual(pq.ParquetFile(path).num_row_groups, 2)
+        table = pq.read_table(path)
+        self.assertEqual(table.column_names, list(exports.COLUMNS))
+        self.assertEqual(table.column('amount').to_pylist(), [-1200.0, 3000.1, -4.5, -900.0])
+
+    def test_stored_amounts_are_numbers(self):
+        """Amounts stored as strings are written as numbers, and ones that are not amounts are left empty"""
+        with self.store.transaction(1) as tx:
+            tx.add(1, 'purchases', {'purchaseId': 1, 'purchaseDate': '2025-06-02', 'purchaseCost': '-12.50'})
+            tx.add(1, 'purchases', {'purchaseId': 2, 'purchaseDate': '2025-06-03', 'purchaseCost': 'lots'})
+        rows = list(exports.rows(self.store, 1))
+        self.assertEqual([row[6] for row in rows], [-900, -13, None])
+        if pq is not None:
+            path = os.path.join(self.tmpdir.name, 'one.parquet')
+            self.assertEqual(exports.write_parquet(rows, path), 3)
+            self.assertEqual(pq.read_table(path).column('amount').to_pylist(), [-900.0, -13.0, None])
+
+    def test_cli(self):
+        path = os.path.join(self.tmpdir.name, 'one.csv')
+        with mock.patch('exports.create_store', return_value=self.store), mock.patch('builtins.print') as printed:
+            self.assertEqual(exports.main([path, '--user', '1']), 0)
+        printed.assert_called_once_with(f'Wrote 1 rows to {path}')
+        with open(path, newline='') as f:
+            self.assertEqual(list(csv.reader(f))[1][:3], ['1', 'purchase', '0'])
+
+class SqliteExportTestCase(store_cases.SqliteStoreMixin, ExportTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import json
+from routes.goals import allocate
+import store_cases
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+    'purchases': [], 'deposits': [],
+    'financialGoals': [{'goalId': 0, 'currentAmount': 0, 'targetAmount': 100},
+                       {'goalId': 1, 'currentAmount': 45, 'targetAmount': 50},
+                       {'goalId': 2, 'currentAmount': 10, 'targetAmount': 10}],
+}]
+
+class GoalsTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def send(self, method, url, body):
+        return self.client.open(url, method=method, content_type='application/json', data=json.dumps(body))
+
+    def goals(self):
+        return {goal['goalId']: goal for goal in self.store.get_user(0)['financialGoals']}
+
+    def test_batch_contributions(self):
+        """A batch is applied in one write and contributions to one goal add up"""
+        version = self.store.get_version(0).number
+        response = self.send('POST', '/users/0/goals/contributions', {'contributions': [
+            {'goalId': 0, 'amountToAdd': 20}, {'goalId': 1, 'amountToAdd': 5}, {'goalId': 0, 'amountToAdd': 5.5}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(g['goalId'], g['currentAmount'], g['percentageCompleted']) for g in response.json['goals']],
+                         [(0, 25.5, 25), (1, 50.0, 100)])
+        self.assertEqual(self.goals()[0]['currentAmount'], 25.5)
+        self.assertEqual(self.store.get_version(0).number, version + 1)
+
+    def test_batch_is_all_or_nothing(self):
+        """An unknown goal rejects the whole batch"""
+        response = self.send('POST', '/users/0/goals/contributions',
+                             [{'goalId': 0, 'amountToAdd': 20}, {'goalId': 9, 'amountToAdd': 5}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.goals()[0]['currentAmount'], 0)
+
+    def test_bad_batches(self):
+        """Batches must list goal ids with numeric amounts, for an existing user"""
+        for body in ([], {'contributions': [{'goalId': '0', 'amountToAdd': 1}]}, [{'goalId': 0}], 'x'):
+            self.assertEqual(self.send('POST', '/users/0/goals/contributions', body).status_code, 400)
+        self.assertEqual(self.send('POST', '/users/9/goals/contributions',
+                                   [{'goalId': 0, 'amountToAdd': 1}]).status_code, 404)
+
+    def test_deposit_allocation(self):
+        """A deposit can fund the unfinished goals in the same write"""
+        response = self.send('PATCH', '/api/data/deposit/0', {'depositAmount': 100, 'allocateToGoals': 0.5})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['allocations'], [{'goalId': 0, 'amount': 45.0}, {'goalId': 1, 'amount': 5.0}])
+        goals = self.goals()
+        self.assertEqual((goals[0]['currentAmount'], goals[0]['percentageCompleted']), (45.0, 45))
+        self.assertEqual(goals[1]['currentAmount'], 50.0)
+        self.assertEqual(goals[2]['currentAmount'], 10)
+        deposit = self.store.get_user(0)['deposits'][0]
+        self.assertNotIn('allocateToGoals', deposit)
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 200.0)
+
+    def test_user_allocation_default(self):
+        """A user's goalAllocation applies to deposits that do not set their own"""
+        self.send('PATCH', '/users/email/a%40example.com', {'goalAllocation': 0.1})
+        response = self.send('PATCH', '/api/data/deposit/0', {'depositAmount': 40})
+        self.assertEqual(response.json['allocations'], [{'goalId': 0, 'amount': 2.0}, {'goalId': 1, 'amount': 2.0}])
+        response = self.send('PATCH', '/api/data/deposit/0', {'depositAmount': 40, 'allocateToGoals': 0})
+        self.assertEqual(response.json['allocations'], [])
+        self.assertEqual(self.send('PATCH', '/api/data/deposit/0',
+                                   {'depositAmount': 40, 'allocateToGoals': 2}).status_code, 400)
+
+    def test_allocate(self):
+        """Shares are equal, capped at what each goal still needs"""
+        goals = [{'goalId': 0, 'currentAmount': 0, 'targetAmount': 10},
+                 {'goalId': 1, 'currentAmount': 0, 'targetAmount': 100},
+                 {'goalId': 2, 'currentAmount': 0}]
+        self.assertEqual(allocate(goals, 30), [(0, 10.0), (1, 20.0)])
+        self.assertEqual(allocate(goals, 500), [(0, 10.0), (1, 100.0)])
+        self.assertEqual(allocate(goals[2:], 5), [])
+
+    def test_allocate_uneven(self):
+        """Shares add up to exactly the amount, the odd minor units going to the first goals"""
+        goals = [{'goalId': goal_id, 'currentAmount': 0, 'targetAmount': 100} for goal_id in range(3)]
+        self.assertEqual(allocate(goals, 0.05), [(0, 0.02), (1, 0.02), (2, 0.01)])
+        self.assertEqual(allocate(goals, 0.02), [(0, 0.01), (1, 0.01)])
+        self.assertEqual(allocate(goals, 10), [(0, 3.34), (1, 3.33), (2, 3.33)])
+        self.assertEqual(allocate(goals, 0.004), [])
+        self.assertEqual(allocate(goals, 1, 'JPY'), [(0, 1)])
+        self.assertEqual(allocate(goals, 301, 'JPY'), [(0, 100), (1, 100), (2, 100)])
+        capped = [{'goalId': 0, 'currentAmount': 99.99, 'targetAmount': 100}] + goals[1:]
+        self.assertEqual(allocate(capped, 0.1), [(0, 0.01), (1, 0.05), (2, 0.04)])
+
+class SqliteGoalsTestCase(store_cases.SqliteStoreMixin, GoalsTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
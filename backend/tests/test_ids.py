@@ -0,0 +1,59 @@
+import unittest
+import json
+from storage import get_store
+import store_cases
+
+USERS = [
+    {'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+     'purchases': [{'purchaseId': i, 'purchaseDate': f'2025-05-0{i + 1}', 'purchaseCost': -1} for i in range(3)],
+     'deposits': [], 'financialGoals': [{'goalId': 0, 'currentAmount': 0, 'targetAmount': 10}]},
+    {'user_id': 4, 'email': 'b@example.com', 'currentBalance': 0.0},
+]
+
+class IdTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def send(self, method, url, body):
+        return self.client.open(url, method=method, data=json.dumps(body), content_type='application/json')
+
+    def purchase_ids(self):
+        return [p['purchaseId'] for p in get_store().get_user(0)['purchases']]
+
+    def test_delete_keeps_ids(self):
+        """Deleting a purchase does not renumber the others"""
+        response = self.send('DELETE', '/api/data/purchase/0', {'purchaseId': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.purchase_ids(), [0, 2])
+        self.assertEqual(self.send('DELETE', '/api/data/purchase/0', {'purchaseId': 1}).status_code, 404)
+        self.assertEqual(get_store().get_user(0)['currentBalance'], 101)
+
+    def test_ids_not_reused_after_delete(self):
+        """New purchases get fresh ids even after the newest one was deleted"""
+        self.send('DELETE', '/api/data/purchase/0', {'purchaseId': 2})
+        self.send('POST', '/api/data/purchase/users/0/transactions', {'purchaseDate': '2025-05-09', 'purchaseCost': -1})
+        self.assertEqual(self.purchase_ids(), [0, 1, 3])
+
+    def test_deposit_and_goal_ids(self):
+        """Deposits and goals are numbered from their own counters"""
+        for amount in (5, 6):
+            self.send('PATCH', '/api/data/deposit/0', {'depositAmount': amount, 'depositDate': '2025-05-01'})
+        self.send('DELETE', '/api/data/deposit/0', {'depositId': 0})
+        self.send('PATCH', '/api/data/deposit/0', {'depositAmount': 7, 'depositDate': '2025-05-02'})
+        self.assertEqual([d['depositId'] for d in get_store().get_user(0)['deposits']], [1, 2])
+        goal = self.send('POST', '/users/0/goals', {'currentAmount': 0, 'targetAmount': 5}).json['goal']
+        self.assertEqual(goal['goalId'], 1)
+        response = self.send('PATCH', '/users/0/goals/1', {'amountToAdd': 5})
+        self.assertEqual(response.json['goal']['percentageCompleted'], 100)
+
+    def test_new_user_id(self):
+        """New users get one past the highest id, not the number of users"""
+        self.send('POST', '/api/data', {'email': 'c@example.com'})
+        self.assertEqual(get_store().get_user_by_email('c@example.com')['userId'], 5)
+        self.assertEqual(get_store().next_user_id(), 6)
+
+class SqliteIdTestCase(store_cases.SqliteStoreMixin, IdTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from backend.app import app
+from routes import ingest
+from storage import set_store
+from storage.json_store import JsonStore
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+    'purchases': [{'purchaseId': 0, 'purchaseCategory': 'Food', 'purchaseDate': '2025-05-01T10:00:00Z', 'purchaseCost': -10}],
+    'deposits': [],
+}]
+
+class ImportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(self.path, 'w') as f:
+            json.dump(USERS, f)
+        self.store = JsonStore(self.path)
+        previous = set_store(self.store)
+        self.addCleanup(set_store, previous)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def post(self, data, content_type='application/json', query=''):
+        if content_type == 'application/json':
+            data = json.dumps(data)
+        return self.client.post(f'/api/data/0/import{query}', data=data, content_type=content_type)
+
+    def test_import_json(self):
+        """Purchases and deposits are stored with fresh ids and one balance update"""
+        response = self.post({
+            'purchases': [{'purchaseCategory': 'Bills', 'purchaseDate': '2025-05-02', 'purchaseCost': -40},
+                          {'purchaseCategory': 'Food', 'purchaseDate': '2025-05-03', 'purchaseCost': '-5.5'}],
+            'deposits': [{'depositDate': '2025-05-04T09:00:00', 'depositAmount': 200}],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json['imported'], response.json['failed']), (3, 0))
+        self.assertEqual([r['id'] for r in response.json['results']], [1, 2, 0])
+        self.assertEqual(response.json['currentBalance'], 254.5)
+        user = self.store.get_user(0)
+        self.assertEqual(user['currentBalance'], 254.5)
+        self.assertEqual([p['purchaseId'] for p in user['purchases']], [0, 1, 2])
+        self.assertEqual(user['purchases'][2]['purchaseCost'], -5.5)
+
+    def test_single_write(self):
+        """The whole import is one journal entry"""
+        rows = [{'type': 'purchase', 'purchaseDate': '2025-05-02', 'purchaseCost': -1}] * 50
+        with mock.patch.object(self.store.journal, 'append', wraps=self.store.journal.append) as append:
+            self.post(rows)
+        self.assertEqual(append.call_count, 1)
+        self.assertEqual(len(self.store.get_user(0)['purchases']), 51)
+
+    def test_invalid_rows_are_reported(self):
+        """Invalid rows are skipped with a reason and the rest are stored"""
+        response = self.post([
+            {'type': 'purchase', 'purchaseDate': '2025-05-02', 'purchaseCost': -1},
+            {'type': 'purchase', 'purchaseDate': 'yesterday', 'purchaseCost': -1},
+            {'type': 'deposit', 'depositDate': '2025-05-02', 'depositAmount': -3},
+            {'type': 'refund', 'amount': 3},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json['results']
+        self.assertEqual([r['status'] for r in results], ['ok', 'error', 'error', 'error'])
+        self.assertEqual(results[1]['error'], 'Invalid or missing purchaseDate value.')
+        self.assertEqual(results[2]['error'], 'Cannot deposit a negative amount.')
+        self.assertEqual(response.json['currentBalance'], 99)
+
+    def test_atomic(self):
+        """With atomic=true one bad row rejects the whole import"""
+        response = self.post([
+            {'type': 'purchase', 'purchaseDate': '2025-05-02', 'purchaseCost': -1},
+            {'type': 'purchase', 'purchaseDate': '2025-05-02'},
+        ], query='?atomic=true')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['imported'], 0)
+        self.assertEqual(len(self.store.get_user(0)['purchases']), 1)
+
+    def test_import_ndjson(self):
+        """NDJSON bodies are read line by line"""
+        body = '\n'.join([
+            json.dumps({'type': 'purchase', 'purchaseDate': '2025-05-02', 'purchaseCost': -2}),
+            '',
+            'not json',
+            json.dumps({'type': 'deposit', 'depositDate': '2025-05-02', 'depositAmount': 10}),
+        ])
+        response = self.post(body, 'application/x-ndjson')
+        self.assertEqual((response.json['imported'], response.json['failed']), (2, 1))
+        self.assertEqual(response.json['currentBalance'], 108)
+
+    def test_import_csv(self):
+        """CSV bodies use a type column and leave blank cells out"""
+        body = ('type,name,purchaseCategory,purchaseDate,purchaseCost,depositDate,depositAmount\n'
+                'purchase,Grocer,Food,2025-05-02,-12.25,,\n'
+                'deposit,Pay,,,,2025-05-03,50\n')
+        response = self.post(body, 'text/csv')
+        self.assertEqual(response.json['imported'], 2)
+        user = self.store.get_user(0)
+        self.assertEqual(user['purchases'][1], {'name': 'Grocer', 'purchaseCategory': 'Food',
+                                                'purchaseDate': '2025-05-02', 'purchaseCost': -12.25,
+                                                'purchaseId': 1})
+        self.assertEqual(user['deposits'][0]['depositAmount'], 50)
+
+    def test_errors(self):
+        """Unknown users, unreadable bodies and oversized imports are rejected"""
+        response = self.client.post('/api/data/9/import', data=json.dumps({'purchases': []}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.post('oops', 'text/plain').status_code, 400)
+        with mock.patch.object(ingest, 'MAX_ROWS', 2):
+            rows = [{'type': 'purchase', 'purchaseDate': '2025-05-02', 'purchaseCost': -1}] * 3
+            self.assertEqual(self.post(rows).status_code, 413)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+import logs
+import metrics
+from backend.app import app
+from storage import set_store
+from storage.json_store import JsonStore
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(self.path, 'w') as f:
+            json.dump([{'user_id': 0, 'email': 'a@example.com', 'currentBalance': 1.0, 'deposits': []}], f)
+        self.store = JsonStore(self.path)
+        previous = set_store(self.store)
+        self.addCleanup(set_store, previous)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_request_metrics(self):
+        """Requests are counted and timed per route rule"""
+        route = '/api/data/<int:user_id>'
+        before = metrics.REQUESTS.value(route, 'GET', '404')
+        self.client.get('/api/data/9')
+        self.assertEqual(metrics.REQUESTS.value(route, 'GET', '404'), before + 1)
+        self.assertGreaterEqual(metrics.LATENCY.count(route, 'GET'), 1)
+
+    def test_exposition_format(self):
+        """GET /metrics returns the Prometheus text format"""
+        self.client.get('/api/data/0')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{route="/api/data/<int:user_id>",method="GET",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="/api/data/<int:user_id>",method="GET",le="+Inf"}', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each bucket counts every observation up to its bound"""
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, '/x')
+        lines = [f'{name}{labels} {value}' for name, labels, value in histogram.samples()]
+        self.assertEqual(lines, [
+            'test_seconds_bucket{route="/x",le="0.1"} 1',
+            'test_seconds_bucket{route="/x",le="1.0"} 2',
+            'test_seconds_bucket{route="/x",le="+Inf"} 3',
+            'test_seconds_sum{route="/x"} 5.55',
+            'test_seconds_count{route="/x"} 3',
+        ])
+
+    def test_storage_io(self):
+        """Reads of the data file and journal writes are counted with their bytes"""
+        reads = metrics.IO_OPS.value('read', 'snapshot')
+        written = metrics.IO_BYTES.value('write', 'journal')
+        self.client.patch('/api/data/deposit/0', data=json.dumps({'depositAmount': 5}),
+                          content_type='application/json')
+        self.assertEqual(metrics.IO_OPS.value('read', 'snapshot'), reads + 1)
+        header = len(json.dumps({'snapshot': os.stat(self.path).st_ino})) + 1
+        entry = os.path.getsize(self.path + '.journal') - header
+        self.assertEqual(metrics.IO_BYTES.value('write', 'journal'), written + entry)
+
+    def test_streamed_response_size(self):
+        """The size of a streamed response is recorded once it has been sent"""
+        before = metrics.RESPONSE_SIZE.count('/users')
+        response = self.client.get('/users')
+        response.close()
+        self.assertEqual(metrics.RESPONSE_SIZE.count('/users'), before + 1)
+
+class LogsTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        logs.configure()
+
+    def test_sampling(self):
+        """Sampling drops DEBUG and INFO records but never warnings"""
+        sample = logs.SampleFilter(0)
+        record = logging.LogRecord('budget.x', logging.INFO, __file__, 1, 'msg', None, None)
+        self.assertFalse(sample.filter(record))
+        record.levelno = logging.WARNING
+        self.assertTrue(sample.filter(record))
+
+    def test_off(self):
+        """LOG_LEVEL=OFF silences the backend logger"""
+        logs.configure('OFF')
+        self.assertFalse(logs.get_logger('app').isEnabledFor(logging.ERROR))
+        logs.configure('DEBUG')
+        self.assertTrue(logs.get_logger('app').isEnabledFor(logging.DEBUG))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from unittest import mock
+import json
+import os
+from decimal import Decimal
+import money
+import store_cases
+
+RATES = {'base': 'USD', 'date': '2025-06-01', 'rates': {'EUR': 0.8, 'JPY': 150}}
+
+USERS = [
+    {'user_id': 0, 'email': 'a@example.com', 'preferredCurrency': 'USD', 'currentBalance': 100.0,
+     'purchases': [{'purchaseId': 0, 'purchaseCategory': 'Food', 'purchaseDate': '2025-05-01T10:00:00Z',
+                    'purchaseCost': -10}],
+     'deposits': [], 'financialGoals': []},
+    {'user_id': 1, 'email': 'b@example.com', 'preferredCurrency': 'JPY', 'currentBalance': 1000,
+     'purchases': [], 'deposits': [], 'financialGoals': []},
+]
+
+class MoneyTestCase(unittest.TestCase):
+
+    def test_exact_arithmetic(self):
+        """Amounts are read as the decimals they print as and rounded per currency"""
+        self.assertEqual(money.decimal(0.1) + money.decimal(0.2), Decimal('0.3'))
+        self.assertEqual(money.number(Decimal('2.675')), 2.68)
+        self.assertEqual(money.number(Decimal('1234.5'), 'JPY'), 1235)
+        self.assertEqual(money.to_minor('19.99'), 1999)
+        self.assertEqual(money.from_minor(1999, 'KWD'), 1.999)
+        for value in (None, True, 'abc', float('nan'), [1]):
+            with self.assertRaises(ValueError):
+                money.decimal(value)
+
+    def test_rate_table(self):
+        """Cross rates go through the base currency and are computed once"""
+        table = money.RateTable('usd', {'EUR': Decimal('0.8'), 'JPY': 150})
+        self.assertEqual(table.rate('EUR', 'JPY'), Decimal('187.5'))
+        self.assertIs(table.rate('EUR', 'JPY'), table.rate('EUR', 'JPY'))
+        self.assertEqual(table.convert('10', 'USD', 'EUR'), Decimal('8.0'))
+        with self.assertRaises(money.CurrencyError):
+            table.rate('USD', 'GBP')
+        with self.assertRaises(money.CurrencyError):
+            money.code('dollars')
+
+class CurrencyTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def setUp(self):
+        super().setUp()
+        rates_path = os.path.join(self.tmpdir.name, 'rates.json')
+        with open(rates_path, 'w') as f:
+            json.dump(RATES, f)
+        patcher = mock.patch('config.RATES_FILE', rates_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def purchase(self, user_id, **fields):
+        item = dict({'purchaseCategory': 'Food', 'purchaseDate': '2025-05-02T10:00:00Z'}, **fields)
+        return self.client.post(f'/api/data/purchase/users/{user_id}/transactions',
+                                content_type='application/json', data=json.dumps(item))
+
+    def test_no_drift(self):
+        """Many small amounts add up exactly"""
+        for _ in range(30):
+            self.client.patch('/api/data/deposit/0', content_type='application/json',
+                              data=json.dumps({'depositAmount': 0.1, 'depositDate': '2025-05-03T10:00:00Z'}))
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 103.0)
+        self.assertEqual(self.client.get('/api/data/0/summary').json['deposits'], {'total': 3.0, 'count': 30})
+
+    def test_foreign_purchase(self):
+        """A purchase in another currency moves the balance by its converted amount, both ways"""
+        response = self.purchase(0, purchaseCost=-8, currency='eur')
+        self.assertEqual(response.status_code, 200)
+        item = self.store.get_item(0, 'purchases', 1)
+        self.assertEqual((item['currency'], item['exchangeRate']), ('EUR', 1.25))
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 90.0)
+
+        # A new rate table does not change what deleting the purchase refunds
+        with open(os.path.join(self.tmpdir.name, 'rates.json'), 'w') as f:
+            json.dump(dict(RATES, rates={'EUR': 0.5, 'JPY': 150}), f)
+        self.client.delete('/api/data/purchase/0', content_type='application/json',
+                           data=json.dumps({'purchaseId': 1}))
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 100.0)
+
+    def test_summary_in_other_currency(self):
+        """Summaries convert the per-currency totals with the rate table"""
+        self.purchase(0, purchaseCost=-8, currency='EUR')
+        summary = self.client.get('/api/data/0/summary').json
+        self.assertEqual(summary['currency'], 'USD')
+        self.assertEqual(summary['purchases']['spent'], 20.0)
+        summary = self.client.get('/api/data/0/summary?currency=jpy').json
+        self.assertEqual(summary['currency'], 'JPY')
+        self.assertEqual(summary['purchases']['byCategory']['Food'], {'spent': 3000, 'income': 0, 'count': 2})
+
+    def test_user_currency(self):
+        """Amounts of a JPY user are whole yen"""
+        self.purchase(1, purchaseCost=-99.6)
+        self.assertEqual(self.store.get_user(1)['currentBalance'], 900)
+        self.purchase(1, purchaseCost=-1, currency='USD')
+        self.assertEqual(self.store.get_user(1)['currentBalance'], 750)
+        self.assertEqual(self.client.get('/api/data/1/summary').json['purchases']['spent'], 250)
+
+    def test_invalid_currency(self):
+        """Unknown currencies are rejected"""
+        self.assertEqual(self.purchase(0, purchaseCost=-1, currency='GBP').status_code, 400)
+        self.assertEqual(self.purchase(0, purchaseCost=-1, currency='pounds').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/0/summary?currency=GBP').status_code, 400)
+        response = self.client.post('/api/data/0/import', content_type='application/json',
+                                    data=json.dumps({'purchases': [
+                                        {'purchaseCost': -1, 'purchaseDate': '2025-05-01', 'currency': 'GBP'},
+                                        {'purchaseCost': -2, 'purchaseDate': '2025-05-01', 'currency': 'EUR'}]}))
+        self.assertEqual((response.json['imported'], response.json['failed']), (1, 1))
+        self.assertEqual(response.json['currentBalance'], 97.5)
+        self.assertEqual(len(self.store.get_user(0)['purchases']), 2)
+
+class SqliteCurrencyTestCase(store_cases.SqliteStoreMixin, CurrencyTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
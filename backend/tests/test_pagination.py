@@ -0,0 +1,104 @@
+import unittest
+import json
+import store_cases
+from routes.pagination import encode_cursor
+
+def make_users():
+    purchases = [{'purchaseId': i, 'name': f'Shop {i}', 'purchaseCost': 1,
+                  'purchaseDate': f'2025-0{1 + i % 3}-{10 + i:02d}T12:00:00Z'} for i in range(12)]
+    return [{'user_id': i, 'email': f'user{i}@example.com', 'currentBalance': 0,
+             'purchases': purchases if i == 0 else [], 'deposits': []} for i in range(5)]
+
+class PaginationTestCase(store_cases.StoreTestCase):
+
+    def setUp(self):
+        self.users = self.USERS = make_users()
+        super().setUp()
+
+    def walk(self, url):
+        """Follow next cursors until the last page, returning every page"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json['items'])
+            cursor = response.json['next']
+            base = url.split('&after=')[0]
+            url = f'{base}&after={cursor}' if cursor else None
+        return pages
+
+    def test_unpaginated_request_returns_full_list(self):
+        """Without parameters the endpoint still returns the plain array"""
+        response = self.client.get('/api/data/purchase/0')
+        self.assertEqual(len(response.json), 12)
+
+    def test_pages_cover_history_in_date_order(self):
+        """Walking the cursors returns every purchase once, sorted by date"""
+        pages = self.walk('/api/data/purchase/0?limit=5')
+        self.assertEqual([len(p) for p in pages], [5, 5, 2])
+        dates = [p['purchaseDate'] for page in pages for p in page]
+        self.assertEqual(dates, sorted(p['purchaseDate'] for p in self.users[0]['purchases']))
+
+    def test_descending_order(self):
+        """order=desc starts from the newest purchase"""
+        pages = self.walk('/api/data/purchase/0?limit=4&order=desc')
+        dates = [p['purchaseDate'] for page in pages for p in page]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(len(dates), 12)
+
+    def test_date_range(self):
+        """from/to restrict the page to an inclusive date range"""
+        response = self.client.get('/api/data/purchase/0?from=2025-02-01&to=2025-02-21')
+        dates = [p['purchaseDate'] for p in response.json['items']]
+        self.assertEqual(dates, ['2025-02-11T12:00:00Z', '2025-02-14T12:00:00Z',
+                                 '2025-02-17T12:00:00Z', '2025-02-20T12:00:00Z'])
+        self.assertIsNone(response.json['next'])
+
+    def test_new_purchase_appears_in_pages(self):
+        """Purchases added after the index was built are paged too"""
+        self.client.get('/api/data/purchase/0?limit=1')
+        self.client.post('/api/data/purchase/users/0/transactions',
+                         data=json.dumps({'purchaseCost': 1, 'purchaseDate': '2025-01-01T00:00:00Z'}),
+                         content_type='application/json')
+        response = self.client.get('/api/data/purchase/0?limit=1')
+        self.assertEqual(response.json['items'][0]['purchaseDate'], '2025-01-01T00:00:00Z')
+
+    def test_deposits_paginated(self):
+        """Deposits accept the same parameters"""
+        response = self.client.get('/api/data/deposit/1?limit=10')
+        self.assertEqual(response.json, {'items': [], 'next': None})
+
+    def test_users_pages(self):
+        """The all-users endpoints page through users"""
+        for url in ('/users?limit=2', '/api/data?limit=2', '/api/transactions/?limit=2'):
+            pages = self.walk(url)
+            self.assertEqual([u['email'] for page in pages for u in page],
+                             [u['email'] for u in self.users])
+
+    def test_invalid_parameters(self):
+        """Bad cursors and limits are rejected"""
+        self.assertEqual(self.client.get('/api/data/purchase/0?after=%%%').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/0?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/0?limit=x').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/0?order=up').status_code, 400)
+
+    def test_mismatched_cursors(self):
+        """Cursors of another endpoint or of the wrong shape are rejected"""
+        users_next = self.client.get('/api/data?limit=1').json['next']
+        purchases_next = self.client.get('/api/data/purchase/0?limit=1').json['next']
+        for cursor in (users_next, encode_cursor([1, 'a']), encode_cursor(['a', 1, 2]), 'MQ',
+                       encode_cursor(['a', True]), encode_cursor(['a', -1])):
+            self.assertEqual(self.client.get(f'/api/data/purchase/0?after={cursor}').status_code, 400, cursor)
+        for cursor in (purchases_next, encode_cursor([0, 'a']), encode_cursor('a'), encode_cursor(None)):
+            self.assertEqual(self.client.get(f'/api/data?after={cursor}').status_code, 400, cursor)
+        self.assertEqual(self.client.get(f'/api/data?after={users_next}').status_code, 200)
+
+    def test_unknown_user(self):
+        """Paginating an unknown user's history is a 404"""
+        self.assertEqual(self.client.get('/api/data/purchase/99?limit=5').status_code, 404)
+
+class SqlitePaginationTestCase(store_cases.SqliteStoreMixin, PaginationTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+from unittest import mock
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from backend.app import app, create_app
+import scheduler
+from storage.json_store import JsonStore
+import store_cases
+
+USERS = [
+    {'user_id': 0, 'email': 'a@example.com', 'currentBalance': 1000.0, 'purchases': [], 'deposits': []},
+    {'user_id': 1, 'email': 'b@example.com', 'currentBalance': 0.0, 'purchases': [], 'deposits': []},
+    {'user_id': 2, 'email': 'c@example.com', 'currentBalance': 0.0, 'purchases': [], 'deposits': []},
+]
+
+RENT = {'type': 'purchase', 'item': {'name': 'Rent', 'purchaseCost': -500, 'purchaseCategory': 'Bills'},
+        'frequency': 'monthly', 'day': 31, 'start': '2025-01-15'}
+SALARY = {'type': 'deposit', 'item': {'name': 'Salary', 'depositAmount': 100},
+          'frequency': 'weekly', 'day': 4, 'start': '2025-03-01', 'end': '2025-03-20'}
+
+class RecurringTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def add_rule(self, user_id, rule):
+        response = self.client.post(f'/api/data/{user_id}/recurring', content_type='application/json',
+                                    data=json.dumps(rule))
+        self.assertEqual(response.status_code, 201, response.json)
+        return response.json['rule']
+
+    def test_rules(self):
+        """Rules get ids and their first occurrence, and can be listed and deleted"""
+        rent = self.add_rule(0, RENT)
+        salary = self.add_rule(0, SALARY)
+        self.assertEqual((rent['ruleId'], rent['nextDate']), (0, '2025-01-31'))
+        self.assertEqual((salary['ruleId'], salary['nextDate']), (1, '2025-03-07'))
+        self.assertEqual(len(self.client.get('/api/data/0/recurring').json['rules']), 2)
+        self.assertEqual(self.client.delete('/api/data/0/recurring/0').status_code, 200)
+        self.assertEqual(self.client.delete('/api/data/0/recurring/0').status_code, 404)
+        self.assertEqual(self.add_rule(0, RENT)['ruleId'], 2)
+
+    def test_bad_rules(self):
+        """Rules are validated before they are stored"""
+        for changes in ({'type': 'transfer'}, {'item': {'name': 'Rent'}}, {'frequency': 'daily'},
+                        {'day': 0}, {'frequency': 'weekly', 'day': 7}, {'start': '2025-13-01'},
+                        {'end': '2024-01-01'}):
+            response = self.client.post('/api/data/0/recurring', content_type='application/json',
+                                        data=json.dumps(dict(RENT, **changes)))
+            self.assertEqual(response.status_code, 400, changes)
+        self.assertEqual(self.client.post('/api/data/9/recurring', content_type='application/json',
+                                          data=json.dumps(RENT)).status_code, 404)
+
+    def test_run_catches_up(self):
+        """A run creates every missed occurrence and moves the rules on"""
+        self.add_rule(0, RENT)
+        self.add_rule(0, SALARY)
+        stats = scheduler.run(self.store, date(2025, 3, 31))
+        self.assertEqual(stats, {'users': 1, 'occurrences': 5, 'commits': 1})
+
+        user = self.store.get_user(0)
+        self.assertEqual([p['purchaseDate'][:10] for p in user['purchases']],
+                         ['2025-01-31', '2025-02-28', '2025-03-31'])
+        self.assertEqual([d['depositDate'][:10] for d in user['deposits']],
+                         ['2025-03-07', '2025-03-14'])
+        self.assertEqual(user['deposits'][0]['recurringRuleId'], 1)
+        self.assertEqual(user['currentBalance'], 1000 - 1500 + 200)
+        self.assertEqual([r['nextDate'] for r in user['recurringRules']], ['2025-04-30', None])
+
+        # Nothing is due twice
+        self.assertEqual(scheduler.run(self.store, date(2025, 3, 31))['occurrences'], 0)
+
+    @mock.patch('config.RATES_FILE', 'missing-rates.json')
+    def test_currency_without_rate(self):
+        """Rules in a currency without a rate are refused, and occurrences that lost theirs stay due"""
+        rule = dict(RENT, item=dict(RENT['item'], currency='EUR'))
+        response = self.client.post('/api/data/0/recurring', content_type='application/json',
+                                    data=json.dumps(rule))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('EUR', response.json['error'])
+
+        stored = dict(self.add_rule(0, RENT), item=rule['item'])
+        with self.store.transaction(0) as tx:
+            tx.update_user(0, {'recurringRules': [stored]})
+        with self.assertLogs('budget.scheduler', 'WARNING'):
+            stats = scheduler.run(self.store, date(2025, 2, 28))
+        self.assertEqual(stats['occurrences'], 0)
+        user = self.store.get_user(0)
+        self.assertEqual((user['purchases'], user['currentBalance']), ([], 1000.0))
+        self.assertEqual(user['recurringRules'][0]['nextDate'], '2025-01-31')
+
+        # Once the occurrences can be created again none of them is lost
+        with self.store.transaction(0) as tx:
+            tx.update_user(0, {'recurringRules': [dict(stored, item=RENT['item'])]})
+        self.assertEqual(scheduler.run(self.store, date(2025, 2, 28))['occurrences'], 2)
+
+    def test_balance(self):
+        """A missing balance counts as zero, and an invalid one holds the rule back"""
+        self.add_rule(1, RENT)
+        self.add_rule(2, RENT)
+        with self.store.batch([1, 2]) as tx:
+            tx.update_user(1, {'currentBalance': None})
+            tx.update_user(2, {'currentBalance': 'unknown'})
+        with self.assertLogs('budget.scheduler', 'WARNING'):
+            stats = scheduler.run(self.store, date(2025, 2, 28))
+        self.assertEqual(stats['occurrences'], 2)
+        self.assertEqual(self.store.get_user(1)['currentBalance'], -1000)
+        user = self.store.get_user(2)
+        self.assertEqual((user['purchases'], user['recurringRules'][0]['nextDate']), ([], '2025-01-31'))
+
+    def test_skip_missed(self):
+        """Without catch-up only the latest due occurrence is created"""
+        self.add_rule(0, RENT)
+        scheduler.run(self.store, date(2025, 3, 31), catch_up=False)
+        user = self.store.get_user(0)
+        self.assertEqual([p['purchaseDate'][:10] for p in user['purchases']], ['2025-03-31'])
+        self.assertEqual(user['recurringRules'][0]['nextDate'], '2025-04-30')
+
+    def test_batches(self):
+        """Due users are written a batch at a time, one commit each"""
+        for user_id in range(3):
+            self.add_rule(user_id, RENT)
+        before = [self.store.get_version(user_id).number for user_id in range(3)]
+        stats = scheduler.run(self.store, date(2025, 1, 31), batch_users=2)
+        self.assertEqual(stats, {'users': 3, 'occurrences': 3, 'commits': 2})
+        self.assertEqual([self.store.get_version(user_id).number for user_id in range(3)],
+                         [number + 1 for number in before])
+
+    def test_cli(self):
+        """The command line runs the scheduler against the configured store"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.json')
+            with open(path, 'w') as f:
+                json.dump([dict(USERS[0], recurringRules=[dict(RENT, ruleId=0, nextDate='2025-01-31')])], f)
+            with mock.patch('config.DATA_FILE', path), \
+                    mock.patch('builtins.print') as printed:
+                self.assertEqual(scheduler.main(['--date', '2025-02-28', '--backend', 'json']), 0)
+            printed.assert_called_once_with('Created 2 occurrences for 1 users in 1 commits')
+            self.assertEqual(len(JsonStore(path).get_user(0)['purchases']), 2)
+
+    def test_background_scheduler(self):
+        """With RECURRING_INTERVAL set the app runs the scheduler itself"""
+        today = scheduler.today()
+        self.add_rule(0, dict(RENT, frequency='weekly', day=today.weekday(), start=today.isoformat()))
+        other = create_app({'RECURRING_INTERVAL': 0.01, 'LOG_LEVEL': 'WARNING'}, store=self.store)
+        self.addCleanup(other.extensions['budget.scheduler'].stop)
+        deadline = time.monotonic() + 5
+        while not self.store.get_user(0)['purchases'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.store.get_user(0)['purchases']), 1)
+        self.assertNotIn('budget.scheduler', app.extensions)
+
+class SqliteRecurringTestCase(store_cases.SqliteStoreMixin, RecurringTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from backend.app import app
+from bench.datagen import generate_users
+from bench.reports import naive_budget, naive_spending
+from reporting import Frames, Reports, budget_vs_actual, cohorts, spending
+from storage import set_store
+from storage.json_store import JsonStore
+
+USERS = [
+    {'user_id': 0, 'timestamp': '2024-01-05T00:00:00Z', 'totalMonthlyBudget': 100.0, 'currentBalance': 50.0,
+     'purchases': [
+         {'purchaseId': 0, 'purchaseCategory': 'Food', 'purchaseDate': '2025-05-01T00:00:00Z', 'purchaseCost': -80},
+         {'purchaseId': 1, 'purchaseCategory': 'Shopping', 'purchaseDate': '2025-05-02T00:00:00Z', 'purchaseCost': -40},
+         {'purchaseId': 2, 'purchaseCategory': 'Food', 'purchaseDate': '2025-04-02T00:00:00Z', 'purchaseCost': -20},
+     ],
+     'deposits': [{'depositId': 0, 'depositDate': '2025-05-01T00:00:00Z', 'depositAmount': 300}]},
+    {'user_id': 1, 'timestamp': '2024-01-20T00:00:00Z', 'totalMonthlyBudget': 500.0, 'currentBalance': 150.0,
+     'purchases': [
+         {'purchaseId': 0, 'purchaseCategory': 'Food', 'purchaseDate': '2025-05-03T00:00:00Z', 'purchaseCost': -10},
+         {'purchaseId': 1, 'purchaseCategory': 'Other', 'purchaseDate': '2025-05-04T00:00:00Z', 'purchaseCost': 25},
+     ],
+     'deposits': []},
+    {'user_id': 2, 'timestamp': '2024-02-01T00:00:00Z', 'totalMonthlyBudget': 0, 'currentBalance': 10.0,
+     'purchases': [], 'deposits': []},
+]
+
+class ReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = Frames.from_users(USERS)
+
+    def test_spending(self):
+        """Spending is grouped by month and category"""
+        rows = spending(self.frames, month='2025-05').set_index('category')
+        self.assertEqual(rows.loc['Food', 'spent'], 90)
+        self.assertEqual(rows.loc['Food', 'users'], 2)
+        self.assertEqual(rows.loc['Other', 'income'], 25)
+        self.assertEqual(sorted(rows.index), ['Food', 'Other', 'Shopping'])
+
+    def test_budget_vs_actual(self):
+        """Users are compared with their own monthly budget"""
+        rows = budget_vs_actual(self.frames).set_index('userId')
+        self.assertEqual(rows.loc[0, 'month'], '2025-05')
+        self.assertEqual(rows.loc[0, 'spent'], 120)
+        self.assertTrue(rows.loc[0, 'overBudget'])
+        self.assertFalse(rows.loc[1, 'overBudget'])
+        self.assertEqual(rows.loc[1, 'usedPct'], 2)
+        over = budget_vs_actual(self.frames, '2025-05', over_only=True)
+        self.assertEqual(list(over['userId']), [0])
+
+    def test_cohorts(self):
+        """Cohorts are the signup month"""
+        rows = cohorts(self.frames).set_index('cohort')
+        self.assertEqual(rows.loc['2024-01', 'users'], 2)
+        self.assertEqual(rows.loc['2024-01', 'avgBalance'], 100)
+        # user 0 spent 140 over two months, user 1 spent 10 in one
+        self.assertEqual(rows.loc['2024-01', 'avgMonthlySpend'], 40)
+        self.assertEqual(rows.loc['2024-01', 'avgDeposited'], 150)
+        self.assertEqual(rows.loc['2024-02', 'avgMonthlySpend'], 0)
+
+    def test_matches_naive_loop(self):
+        """The vectorized reports agree with the benchmark's per-user loop"""
+        users = generate_users(300, seed=7)
+        frames = Frames.from_users(users)
+        naive = naive_spending(users)
+        report = spending(frames)
+        self.assertEqual(len(report), len(naive))
+        for row in report.itertuples():
+            spent, income, count, user_count = naive[(row.month, row.category)]
+            self.assertAlmostEqual(row.spent, spent, places=6)
+            self.assertAlmostEqual(row.income, income, places=6)
+            self.assertEqual((row.count, row.users), (count, user_count))
+        month = frames.latest_month()
+        budget = budget_vs_actual(frames, month)
+        for row, (uid, _, spent, _, over) in zip(budget.itertuples(), naive_budget(users, month)):
+            self.assertEqual(row.userId, uid)
+            self.assertAlmostEqual(row.spent, spent, places=6)
+            self.assertEqual(row.overBudget, over)
+
+class AdminReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(path, 'w') as f:
+            json.dump(USERS, f)
+        self.store = JsonStore(path)
+        previous = set_store(self.store)
+        self.addCleanup(set_store, previous)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get(self, url, token='secret'):
+        return self.client.get(url, headers={'X-Admin-Token': token})
+
+    @mock.patch.dict(app.config, {'ADMIN_TOKEN': 'secret'})
+    def test_report(self):
+        """A valid token returns the report rows as JSON"""
+        response = self.get('/api/admin/reports/budget?month=2025-05&over=true')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json['rows']
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['userId'], 0)
+        self.assertEqual(rows[0]['spent'], 120)
+
+    @mock.patch.dict(app.config, {'ADMIN_TOKEN': 'secret'})
+    def test_cache_follows_writes(self):
+        """The frames are rebuilt after a change and reused otherwise"""
+        self.get('/api/admin/reports/spending')
+        frames = self.store.reports.frames()
+        self.assertIs(self.store.reports.frames(), frames)
+        self.client.post('/api/data/purchase/users/1/transactions', content_type='application/json',
+                         data=json.dumps({'purchaseCategory': 'Food', 'purchaseDate': '2025-05-09T00:00:00Z',
+                                          'purchaseCost': -5}))
+        rows = self.get('/api/admin/reports/spending?month=2025-05&category=Food').json['rows']
+        self.assertEqual(rows[0]['spent'], 95)
+        self.assertIsNot(self.store.reports.frames(), frames)
+
+    @mock.patch.dict(app.config, {'ADMIN_TOKEN': 'secret'})
+    def test_bad_requests(self):
+        """Wrong tokens, unknown reports and bad months are rejected"""
+        self.assertEqual(self.get('/api/admin/reports/cohorts', token='nope').status_code, 401)
+        self.assertEqual(self.get('/api/admin/reports/nope').status_code, 404)
+        self.assertEqual(self.get('/api/admin/reports/budget?month=May').status_code, 400)
+
+    @mock.patch.dict(app.config, {'ADMIN_TOKEN': None})
+    def test_disabled_without_token(self):
+        """Admin routes are off until ADMIN_TOKEN is configured"""
+        self.assertEqual(self.get('/api/admin/reports/cohorts').status_code, 403)
+
+class ReportsCacheTestCase(unittest.TestCase):
+
+    def test_change_during_build_is_not_lost(self):
+        """A change that arrives while frames are built leaves them stale"""
+        store = mock.Mock()
+        reports = Reports(store)
+        def all_users():
+            reports.on_change(None)
+            return USERS
+        store.all_users.side_effect = all_users
+        first = reports.frames()
+        self.assertIsNot(reports.frames(), first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import json
+import store_cases
+
+PURCHASES = [
+    {'purchaseId': 0, 'name': 'Starbucks Coffee', 'purchaseCategory': 'Food & Drink',
+     'purchaseDate': '2025-04-02T08:00:00Z', 'purchaseCost': -5},
+    {'purchaseId': 1, 'name': 'Coffee beans', 'purchaseCategory': 'Groceries',
+     'purchaseDate': '2025-05-03T08:00:00Z', 'purchaseCost': -12},
+    {'purchaseId': 2, 'name': 'Star Cinema', 'purchaseCategory': 'Entertainment',
+     'purchaseDate': '2025-05-04T20:00:00Z', 'purchaseCost': -15},
+    {'purchaseId': 3, 'name': 'Bus pass', 'purchaseDate': '2025-05-05T07:00:00Z', 'purchaseCost': -30},
+]
+
+USERS = [{'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0, 'purchases': PURCHASES}]
+
+class SearchTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def search(self, query=''):
+        response = self.client.get('/api/data/purchase/0/search' + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def ids(self, query=''):
+        return [item['purchaseId'] for item in self.search(query)['items']]
+
+    def test_prefix_words(self):
+        """Every query word must start a word of the name or category, newest first"""
+        self.assertEqual(self.ids('?q=coffee'), [1, 0])
+        self.assertEqual(self.ids('?q=STAR'), [2, 0])
+        self.assertEqual(self.ids('?q=cof%20sta'), [0])
+        self.assertEqual(self.ids('?q=drink'), [0])
+        self.assertEqual(self.ids('?q=other'), [3])
+        self.assertEqual(self.ids('?q=tea'), [])
+        self.assertEqual(self.ids('?q=coffee&limit=1'), [1])
+        self.assertEqual(self.search('?q=coffee&limit=1')['total'], 2)
+
+    def test_facets(self):
+        """Facet counts cover the query and the other filter"""
+        body = self.search('?q=c&month=2025-05')
+        self.assertEqual([item['purchaseId'] for item in body['items']], [2, 1])
+        self.assertEqual(body['facets'], {
+            'category': {'Entertainment': 1, 'Groceries': 1},
+            'month': {'2025-04': 1, '2025-05': 2},
+        })
+        body = self.search('?category=Groceries')
+        self.assertEqual(body['total'], 1)
+        self.assertEqual(body['facets']['category'],
+                         {'Entertainment': 1, 'Food & Drink': 1, 'Groceries': 1, 'Other': 1})
+        self.assertEqual(body['facets']['month'], {'2025-05': 1})
+        self.assertEqual(self.search('?category=Other&month=2025-04')['total'], 0)
+
+    def test_index_follows_writes(self):
+        """Added, deleted and replaced purchases are searchable at once"""
+        self.assertEqual(self.ids('?q=coffee'), [1, 0])
+        self.client.post('/api/data/purchase/users/0/transactions', content_type='application/json',
+                         data=json.dumps({'name': 'Coffee shop', 'purchaseDate': '2025-06-01T08:00:00Z',
+                                          'purchaseCost': -3}))
+        self.client.delete('/api/data/purchase/0', content_type='application/json',
+                           data=json.dumps({'purchaseId': 0}))
+        self.assertEqual(self.ids('?q=coffee'), [4, 1])
+        with self.store.transaction(0) as tx:
+            tx.update(0, 'purchases', 1, {'name': 'Tea'})
+        self.assertEqual(self.ids('?q=coffee'), [4])
+        self.assertEqual(self.ids('?q=tea'), [1])
+
+    def test_conditional_get(self):
+        """Searches answer 304 while the user is unchanged"""
+        response = self.client.get('/api/data/purchase/0/search?q=coffee')
+        again = self.client.get('/api/data/purchase/0/search?q=coffee',
+                                headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_bad_requests(self):
+        """The month and limit are checked and the user must exist"""
+        self.assertEqual(self.client.get('/api/data/purchase/0/search?month=May').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/0/search?limit=x').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/0/search?limit=501').status_code, 400)
+        self.assertEqual(self.client.get('/api/data/purchase/9/search?q=a').status_code, 404)
+
+class SqliteSearchTestCase(store_cases.SqliteStoreMixin, SearchTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
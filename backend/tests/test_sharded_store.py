@@ -0,0 +1,165 @@
+import unittest
+from unittest import mock
+import json
+import os
+import tempfile
+from storage import sharded_store
+from storage.json_store import JsonStore
+from storage.migrate import main as migrate_main
+from storage.sharded_store import ShardedStore
+import store_cases
+import test_pagination
+import test_summary
+import test_sync
+
+USERS = [{'user_id': i, 'email': f'user{i}@example.com', 'currentBalance': 0, 'purchases': []}
+         for i in range(6)]
+
+class ShardedStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Split a small dataset over three shards"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'data.shards')
+        sharded_store.create(self.path, USERS, shards=3)
+        self.store = ShardedStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def shard_file(self, number):
+        return sharded_store.shard_path(self.path, number)
+
+    def test_users_are_placed_by_id(self):
+        """Each shard file holds the users whose id falls in it"""
+        for number in range(3):
+            with open(self.shard_file(number)) as f:
+                self.assertEqual([user['user_id'] for user in json.load(f)], [number, number + 3])
+        self.assertEqual(self.store.get_user(4)['email'], 'user4@example.com')
+        self.assertIsNone(self.store.get_user(6))
+
+    def test_reads_load_one_shard(self):
+        """Looking up a user by id or email loads only their shard"""
+        self.assertEqual(self.store.get_user_by_email('user5@example.com')['user_id'], 5)
+        self.assertEqual(self.store.next_user_id(), 6)
+        self.assertEqual(self.store._opened, {2})
+        self.assertIsNone(self.store.get_user_by_email('missing@example.com'))
+
+    def test_write_touches_one_shard(self):
+        """A commit journals only the owning shard"""
+        with self.store.transaction(4) as tx:
+            tx.add(4, 'purchases', {'purchaseId': 0, 'purchaseCost': -5})
+        self.assertTrue(os.path.exists(self.shard_file(1) + '.journal'))
+        self.assertFalse(os.path.exists(self.shard_file(0) + '.journal'))
+        self.assertFalse(os.path.exists(self.shard_file(2) + '.journal'))
+        store = ShardedStore(self.path)
+        self.assertEqual(store.get_user(4)['purchases'], [{'purchaseId': 0, 'purchaseCost': -5}])
+        self.assertEqual(store.get_version(4).number, 1)
+
+    def test_new_users_and_email_changes(self):
+        """The directory follows new users and changed emails, across processes"""
+        other = ShardedStore(self.path)
+        self.assertIsNone(other.get_user_by_email('new@example.com'))
+        with self.store.transaction() as tx:
+            tx.insert({'userId': self.store.next_user_id(), 'email': 'new@example.com'})
+        with self.store.transaction(1) as tx:
+            tx.update_user(1, {'email': 'changed@example.com'})
+        self.assertEqual(other.get_user_by_email('new@example.com')['userId'], 6)
+        self.assertEqual(other.get_user_by_email('changed@example.com')['user_id'], 1)
+        self.assertIsNone(other.get_user_by_email('user1@example.com'))
+        self.assertEqual(other.next_user_id(), 7)
+
+    def test_shared_email(self):
+        """The first user with an email is found, as with JsonStore, then the next once it changes"""
+        with self.store.transaction(5) as tx:
+            tx.update_user(5, {'email': 'user1@example.com'})
+        self.assertEqual(self.store.get_user_by_email('user1@example.com')['user_id'], 1)
+        with self.store.transaction(1) as tx:
+            tx.update_user(1, {'email': 'other@example.com'})
+        self.assertEqual(ShardedStore(self.path).get_user_by_email('user1@example.com')['user_id'], 5)
+
+    def test_loading_a_shard_keeps_other_views(self):
+        """Views of users in other shards survive a shard being loaded or reloaded"""
+        self.assertEqual(self.store.rollups.summary(0)['purchases']['count'], 0)
+        self.store.get_user(1)
+        self.assertIn(0, self.store.rollups._users)
+        self.store.rollups.summary(1)
+        self.store.shards[1]._load(self.store.shards[1]._stamp)
+        self.assertEqual(set(self.store.rollups._users), {0})
+
+    def test_failed_commit_leaves_no_user(self):
+        """A directory entry whose commit failed does not find anyone"""
+        with self.assertRaises(KeyError):
+            with self.store.transaction(9) as tx:
+                tx.update_user(9, {'email': 'x@example.com'})
+        with mock.patch.object(JsonStore, 'commit', side_effect=OSError):
+            with self.assertRaises(OSError):
+                with self.store.transaction(2) as tx:
+                    tx.update_user(2, {'email': 'lost@example.com'})
+        self.assertIsNone(self.store.get_user_by_email('lost@example.com'))
+        with self.assertRaises(ValueError):
+            with self.store.transaction(2) as tx:
+                tx.update_user(2, {'user_id': 7})
+
+    def test_batch_spans_shards(self):
+        """A batch commits each user's changes to their own shard"""
+        with self.store.batch([0, 1, 2]) as tx:
+            for user_id in (0, 1, 2):
+                tx.update_user(user_id, {'currentBalance': user_id + 10})
+        self.assertEqual([self.store.get_user(i)['currentBalance'] for i in range(3)], [10, 11, 12])
+        self.assertEqual([self.store.get_version(i).number for i in range(3)], [1, 1, 1])
+
+    def test_list_users_across_shards(self):
+        """Pages continue from one shard into the next"""
+        pages, after = [], None
+        while True:
+            users, after = self.store.list_users(after, 4)
+            pages.append([user['user_id'] for user in users])
+            if after is None:
+                break
+        self.assertEqual(pages, [[0, 3, 1, 4], [2, 5]])
+        self.assertEqual(self.store.list_users(None, 6), (self.store.all_users(), None))
+
+    def test_compact(self):
+        """Compaction rewrites each shard with its own journal folded in"""
+        with self.store.transaction(3) as tx:
+            tx.update_user(3, {'currentBalance': 7})
+        self.store.compact()
+        with open(self.shard_file(0)) as f:
+            self.assertEqual(json.load(f)[1]['currentBalance'], 7)
+
+    def test_migrate(self):
+        """The migration splits a data file, journal included"""
+        json_path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(json_path, 'w') as f:
+            json.dump(USERS, f)
+        with JsonStore(json_path).transaction() as tx:
+            tx.insert({'userId': 6, 'email': 'late@example.com'})
+        target = os.path.join(self.tmpdir.name, 'migrated')
+        with mock.patch('builtins.print') as printed:
+            self.assertEqual(migrate_main([json_path, target, '--to', 'sharded', '--shards', '4',
+                                           '--format', 'binary']), 0)
+        printed.assert_called_once_with(f'Split 7 records from {json_path} into 4 shards in {target}')
+        store = ShardedStore(target, shards=2)
+        self.assertEqual(len(store.shards), 4)
+        self.assertEqual(store.get_user_by_email('late@example.com')['userId'], 6)
+        self.assertEqual(len(store.all_users()), 7)
+        with self.assertRaises(ValueError):
+            sharded_store.create(target, USERS)
+
+class ShardedPaginationTestCase(store_cases.ShardedStoreMixin, test_pagination.PaginationTestCase):
+
+    SHARDS = 8
+
+    def test_user_cursor_is_a_pair(self):
+        """A user list cursor of another backend is rejected"""
+        self.assertEqual(self.client.get('/api/data?after=MQ').status_code, 400)
+
+class ShardedSummaryTestCase(store_cases.ShardedStoreMixin, test_summary.SummaryTestCase):
+    pass
+
+class ShardedSyncTestCase(store_cases.ShardedStoreMixin, test_sync.SyncTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json
+import os
+from storage import snapshot
+from storage.json_store import JsonStore
+import test_storage
+
+class BinarySnapshotTestCase(test_storage.JsonStoreTestCase):
+    """Repeats the JSON store tests with the data file in the binary format"""
+
+    def write(self, users):
+        snapshot.save(users, self.path, snapshot.BINARY)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            users, fmt = snapshot.load(f)
+        return list(users), fmt
+
+    def test_compact_folds_journal_into_data_file(self):
+        """Compaction keeps the binary format"""
+        with self.store.transaction() as tx:
+            tx.update_user(0, {'currentBalance': 10})
+        self.store.compact()
+        users, fmt = self.read()
+        self.assertEqual(fmt, snapshot.BINARY)
+        self.assertEqual(users[0]['currentBalance'], 10)
+        self.assertEqual(users[1], {'userId': 1, 'email': 'b@example.com'})
+        self.assertEqual(JsonStore(self.path).get_user(0)['currentBalance'], 10)
+
+    def test_users_are_decoded_on_first_read(self):
+        """Startup reads only the index; a lookup decodes one user"""
+        self.write([{'user_id': i, 'email': f'{i}@example.com', 'purchases': []} for i in range(50)])
+        store = JsonStore(self.path)
+        self.assertEqual(store.get_user_by_email('7@example.com')['user_id'], 7)
+        self.assertEqual(store.next_user_id(), 50)
+        self.assertEqual(list(store._users._decoded), [7])
+        self.assertEqual(len(store.list_users(after=9, limit=5)[0]), 5)
+        self.assertEqual(list(store._users._decoded), [7])
+
+    def test_new_users_and_email_changes(self):
+        """Users added after loading and changed emails are written back"""
+        with self.store.transaction() as tx:
+            tx.insert({'userId': 2, 'email': 'c@example.com'})
+            tx.update_user(1, {'email': 'new@example.com'})
+        self.store.compact()
+        store = JsonStore(self.path)
+        self.assertEqual(store.get_user_by_email('c@example.com')['userId'], 2)
+        self.assertEqual(store.get_user_by_email('new@example.com')['userId'], 1)
+        self.assertIsNone(store.get_user_by_email('b@example.com'))
+
+    def test_convert(self):
+        """A data file converts to JSON and back, journal included"""
+        with self.store.transaction() as tx:
+            tx.update_user(0, {'currentBalance': 3})
+        json_path = os.path.join(self.tmpdir.name, 'out.json')
+        self.assertEqual(snapshot.convert(self.path, json_path), (2, snapshot.JSON))
+        with open(json_path) as f:
+            users = json.load(f)
+        self.assertEqual(users[0]['currentBalance'], 3)
+
+        binary_path = os.path.join(self.tmpdir.name, 'out.snap')
+        self.assertEqual(snapshot.convert(json_path, binary_path), (2, snapshot.BINARY))
+        self.assertEqual(JsonStore(binary_path).all_users(), users)
+
+    def test_format_setting_converts_on_compaction(self):
+        """A store configured for JSON writes its next data file as JSON"""
+        store = JsonStore(self.path, snapshot_format=snapshot.JSON)
+        with store.transaction() as tx:
+            tx.update_user(0, {'currentBalance': 1})
+        store.compact()
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)[0]['currentBalance'], 1)
+        with self.assertRaises(ValueError):
+            JsonStore(self.path, snapshot_format='xml')
+
+if __name__ == '__main__':
+    unittest.main()
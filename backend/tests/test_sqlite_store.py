@@ -0,0 +1,112 @@
+import unittest
+import json
+import os
+import tempfile
+from backend.app import app
+from storage import set_store
+from storage.migrate import migrate
+from storage.sqlite_store import SqliteStore
+
+USERS = [
+    {'user_id': 0, 'email': 'a@example.com', 'currentBalance': 10.0,
+     'purchases': [{'purchaseId': 0, 'name': 'Cafe', 'purchaseCategory': 'Food & Drink',
+                    'purchaseDate': '2025-05-01T10:00:00Z', 'purchaseCost': 4.5}],
+     'deposits': [], 'financialGoals': []},
+    {'userId': 1, 'email': 'b@example.com', 'currentBalance': 0.0, 'purchases': []},
+]
+
+class SqliteStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Migrate a small JSON dataset into a temporary database"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        json_path = os.path.join(self.tmpdir.name, 'data.json')
+        with open(json_path, 'w') as f:
+            json.dump(USERS, f)
+        self.db_path = os.path.join(self.tmpdir.name, 'budget.db')
+        self.assertEqual(migrate(json_path, self.db_path), 2)
+        self.store = SqliteStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_migration_round_trips_records(self):
+        """Migrated users read back exactly as they were stored in data.json"""
+        self.assertEqual(self.store.all_users(), USERS)
+
+    def test_lookup_by_id_and_email(self):
+        """Users are found by either id key and by email"""
+        self.assertEqual(self.store.get_user(1)['email'], 'b@example.com')
+        self.assertEqual(self.store.get_user_by_email('a@example.com')['user_id'], 0)
+        self.assertIsNone(self.store.get_user(7))
+
+    def test_wal_mode(self):
+        """The database runs in write-ahead logging mode"""
+        with self.store._connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_transaction_ops(self):
+        """Transactions add, update and remove items and update users"""
+        with self.store.transaction(0) as tx:
+            tx.add(0, 'purchases', {'purchaseId': 1, 'purchaseCost': 2})
+            tx.add(0, 'financialGoals', {'goalId': 0, 'currentAmount': 0})
+            tx.update(0, 'financialGoals', 0, {'currentAmount': 5})
+            tx.remove(0, 'purchases', 0)
+            tx.update_user(0, {'currentBalance': 3.0, 'email': 'new@example.com'})
+        user = self.store.get_user_by_email('new@example.com')
+        self.assertEqual(user['currentBalance'], 3.0)
+        self.assertEqual(user['purchases'], [{'purchaseId': 1, 'purchaseCost': 2}])
+        self.assertEqual(self.store.get_item(0, 'purchases', 1), {'purchaseId': 1, 'purchaseCost': 2})
+        self.assertIsNone(self.store.get_item(0, 'purchases', 0))
+        self.assertEqual(user['financialGoals'], [{'goalId': 0, 'currentAmount': 5}])
+
+    def test_failed_commit_is_rolled_back(self):
+        """A commit that touches a missing user changes nothing"""
+        with self.assertRaises(KeyError):
+            with self.store.transaction(0) as tx:
+                tx.update_user(0, {'currentBalance': 99.0})
+                tx.update_user(7, {'currentBalance': 1.0})
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 10.0)
+
+    def test_views_follow_other_processes(self):
+        """Views are rebuilt once another store on the same database commits"""
+        other = SqliteStore(self.db_path)
+        self.addCleanup(other.close)
+        self.assertEqual(self.store.rollups.summary(0)['purchases']['income'], 4.5)
+        with other.transaction(0) as tx:
+            tx.add(0, 'purchases', {'purchaseId': 1, 'purchaseDate': '2025-05-02T10:00:00Z', 'purchaseCost': 2})
+        self.assertEqual(self.store.rollups.summary(0)['purchases']['income'], 6.5)
+        self.assertIsNone(self.store.changes.since(0, 0, 1))
+
+        # Our own commits keep the views current without a rebuild
+        with self.store.transaction(0) as tx:
+            tx.add(0, 'purchases', {'purchaseId': 2, 'purchaseDate': '2025-05-03T10:00:00Z', 'purchaseCost': 1})
+        self.assertEqual(self.store.rollups.summary(0)['purchases']['income'], 7.5)
+        self.assertEqual(len(self.store.changes.since(0, 1, 2)), 1)
+
+    def test_routes_use_sqlite_backend(self):
+        """The deposit routes work unchanged on top of SQLite"""
+        previous = set_store(self.store)
+        self.addCleanup(set_store, previous)
+        client = app.test_client()
+        response = client.patch('/api/data/deposit/0', data=json.dumps({'depositAmount': 5}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = client.get('/api/data/deposit/0')
+        self.assertEqual([d['depositAmount'] for d in response.json], [5])
+        self.assertEqual(self.store.get_user(0)['currentBalance'], 15.0)
+
+    def test_purchase_response_is_committed_user(self):
+        """Adding a purchase answers with the user as stored after the purchase"""
+        previous = set_store(self.store)
+        self.addCleanup(set_store, previous)
+        response = app.test_client().post('/api/data/purchase/users/0/transactions',
+                                          data=json.dumps({'purchaseDate': '2025-05-02', 'purchaseCost': -5}),
+                                          content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user = response.json['user']
+        self.assertEqual((len(user['purchases']), user['currentBalance']), (2, 5.0))
+
+if __name__ == '__main__':
+    unittest.main()
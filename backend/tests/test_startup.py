@@ -0,0 +1,77 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from backend.app import app, create_app
+from storage import get_store
+from storage.json_store import JsonStore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import the app and build one, timing both, in a fresh interpreter
+STARTUP = """
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+built = time.perf_counter()
+print(json.dumps({'import': imported - start, 'build': built - imported,
+                  'pandas': 'pandas' in sys.modules, 'files': sorted(os.listdir('.'))}))
+"""
+
+# Generous: the import is around 0.3s, nearly all of it Flask itself
+STARTUP_BUDGET = 2.0
+
+class StartupTestCase(unittest.TestCase):
+
+    def test_startup_is_fast_and_touches_no_files(self):
+        """Importing and building the app opens no data files, from any working directory"""
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATA_FILE=os.path.join(cwd, 'data.json'),
+                       SQLITE_PATH=os.path.join(cwd, 'budget.db'), LOG_LEVEL='WARNING')
+            output = subprocess.run([sys.executable, '-c', STARTUP], cwd=cwd, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output)
+        self.assertEqual(result['files'], [])
+        self.assertFalse(result['pandas'])
+        self.assertLess(result['import'] + result['build'], STARTUP_BUDGET)
+
+    def test_wsgi_serves_the_app_module_app(self):
+        """A gunicorn worker builds one app, not a second one next to app.app"""
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=BACKEND_DIR, LOG_LEVEL='WARNING')
+            output = subprocess.run([sys.executable, '-c', 'import app, wsgi; print(wsgi.app is app.app)'],
+                                    cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), 'True')
+
+    def test_store_is_created_on_first_use(self):
+        """An app configured with its own data file creates its store lazily and shares it"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.json')
+            other = create_app({'DATA_FILE': path, 'LOG_LEVEL': 'WARNING'})
+            self.assertEqual(os.listdir(directory), [])
+            client = other.test_client()
+            client.post('/api/data', content_type='application/json', data=json.dumps({'email': 'a@example.com'}))
+            with other.app_context():
+                store = get_store()
+            self.assertEqual(store.path, path)
+            self.assertEqual(client.get('/users/email/a%40example.com').json['userId'], 0)
+            with app.app_context():
+                self.assertIsNot(get_store(), store)
+
+    def test_injected_store(self):
+        """A store passed to create_app is used by every blueprint"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.json')
+            with open(path, 'w') as f:
+                json.dump([{'user_id': 3, 'email': 'c@example.com', 'purchases': []}], f)
+            client = create_app({'LOG_LEVEL': 'WARNING'}, store=JsonStore(path)).test_client()
+            self.assertEqual(client.get('/users/email/c%40example.com').json['user_id'], 3)
+            self.assertEqual(client.get('/api/data/purchase/3').json, [])
+            self.assertEqual(client.get('/api/sync/3').json['user']['email'], 'c@example.com')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import json
+import os
+import tempfile
+from storage import get_store
+from storage.json_store import JsonStore
+
+class JsonStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        """Write a small dataset to a temporary data file"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'data.json')
+        self.write([
+            {'user_id': 0, 'email': 'a@example.com', 'purchases': []},
+            {'userId': 1, 'email': 'b@example.com'},
+        ])
+        self.store = JsonStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, users):
+        with open(self.path, 'w') as f:
+            json.dump(users, f)
+
+    def test_lookup_by_either_id_key(self):
+        """Users are indexed under both user_id and userId"""
+        self.assertEqual(self.store.get_user(0)['email'], 'a@example.com')
+        self.assertEqual(self.store.get_user(1)['email'], 'b@example.com')
+        self.assertIsNone(self.store.get_user(2))
+
+    def test_lookup_by_email(self):
+        """Users are indexed by email"""
+        self.assertEqual(self.store.get_user_by_email('b@example.com')['userId'], 1)
+        self.assertIsNone(self.store.get_user_by_email('missing@example.com'))
+
+    def test_reloads_when_file_changes(self):
+        """An external change to the file is picked up on the next read"""
+        self.assertIsNone(self.store.get_user(5))
+        self.write([{'user_id': 5, 'email': 'c@example.com'}])
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 1000))
+        self.assertEqual(self.store.get_user(5)['email'], 'c@example.com')
+
+    def test_update_reindexes_email(self):
+        """Changing a user's email moves them in the email index"""
+        user = self.store.get_user(0)
+        with self.store.transaction() as tx:
+            tx.update_user(0, {'email': 'new@example.com'})
+        self.assertIsNone(self.store.get_user_by_email('a@example.com'))
+        self.assertIs(self.store.get_user_by_email('new@example.com'), user)
+
+    def test_commit_appends_to_journal(self):
+        """A commit is journaled and leaves the data file untouched"""
+        with open(self.path) as f:
+            before = f.read()
+        with self.store.transaction() as tx:
+            tx.add(0, 'purchases', {'purchaseId': 0, 'purchaseCost': 5})
+            tx.update_user(0, {'currentBalance': 5})
+        with open(self.path) as f:
+            self.assertEqual(f.read(), before)
+        with open(self.path + '.journal') as f:
+            self.assertEqual(len(f.readlines()), 2)  # header and one commit
+
+    def test_journal_is_replayed_on_load(self):
+        """A fresh store rebuilds the state from the data file and journal"""
+        with self.store.transaction() as tx:
+            tx.add(0, 'purchases', {'purchaseId': 0, 'purchaseCost': 5})
+        with self.store.transaction() as tx:
+            tx.insert({'userId': 2, 'email': 'c@example.com'})
+        store = JsonStore(self.path)
+        self.assertEqual(store.get_user(0)['purchases'], [{'purchaseId': 0, 'purchaseCost': 5}])
+        self.assertEqual(store.get_user_by_email('c@example.com')['userId'], 2)
+
+    def test_torn_journal_line_is_dropped(self):
+        """A partially written last entry is ignored and trimmed"""
+        with self.store.transaction() as tx:
+            tx.update_user(1, {'currentBalance': 1})
+        with open(self.path + '.journal', 'a') as f:
+            f.write('[{"op":"update_user","user":1,')
+        store = JsonStore(self.path)
+        self.assertEqual(store.get_user(1)['currentBalance'], 1)
+        with store.transaction() as tx:
+            tx.update_user(1, {'currentBalance': 2})
+        self.assertEqual(JsonStore(self.path).get_user(1)['currentBalance'], 2)
+
+    def test_compact_folds_journal_into_data_file(self):
+        """Compaction writes the current state and empties the journal"""
+        with self.store.transaction() as tx:
+            tx.update_user(0, {'currentBalance': 10})
+        self.store.compact()
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)[0]['currentBalance'], 10)
+        with open(self.path + '.journal') as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(JsonStore(self.path).get_user(0)['currentBalance'], 10)
+
+    def test_journal_for_replaced_data_file_is_ignored(self):
+        """A journal left over from an older data file is not replayed"""
+        with self.store.transaction() as tx:
+            tx.update_user(0, {'currentBalance': 10})
+        tmp_path = self.path + '.new'
+        with open(tmp_path, 'w') as f:
+            json.dump([{'user_id': 0, 'email': 'a@example.com', 'currentBalance': 3}], f)
+        os.replace(tmp_path, self.path)
+        self.assertEqual(JsonStore(self.path).get_user(0)['currentBalance'], 3)
+
+    def test_automatic_compaction(self):
+        """The journal is compacted once it grows past the size limit"""
+        store = JsonStore(self.path, compact_bytes=200)
+        for i in range(10):
+            with store.transaction() as tx:
+                tx.update_user(0, {'currentBalance': i})
+        self.assertLess(os.path.getsize(self.path + '.journal'), 200)
+        self.assertEqual(JsonStore(self.path).get_user(0)['currentBalance'], 9)
+
+    def test_remove_keeps_ids(self):
+        """Removing an item leaves the ids of the remaining ones alone"""
+        with self.store.transaction() as tx:
+            for i in range(3):
+                tx.add(0, 'purchases', {'purchaseId': i})
+            tx.remove(0, 'purchases', 0)
+        self.assertEqual([p['purchaseId'] for p in self.store.get_user(0)['purchases']], [1, 2])
+        self.assertEqual(self.store.get_item(0, 'purchases', 2), {'purchaseId': 2})
+        self.assertIsNone(self.store.get_item(0, 'purchases', 0))
+
+    def test_allocated_ids_are_not_reused(self):
+        """Ids come from the stored counter, so a deleted id is never handed out again"""
+        for _ in range(2):
+            with self.store.transaction(0) as tx:
+                user = self.store.get_user(0)
+                tx.add(0, 'deposits', {'depositId': tx.allocate_id(0, user, 'deposits')})
+        with self.store.transaction(0) as tx:
+            tx.remove(0, 'deposits', 1)
+        with self.store.transaction(0) as tx:
+            user = self.store.get_user(0)
+            ids = [tx.allocate_id(0, user, 'deposits') for _ in range(2)]
+        self.assertEqual(ids, [2, 3])
+        self.assertEqual(JsonStore(self.path).get_user(0)['nextIds'], {'deposits': 4})
+
+    def test_missing_file_is_empty(self):
+        """A data file that does not exist yet reads as an empty list"""
+        store = JsonStore(os.path.join(self.tmpdir.name, 'missing.json'))
+        self.assertEqual(store.all_users(), [])
+
+    def test_get_store_is_shared(self):
+        """get_store returns the same store every time"""
+        self.assertIs(get_store(), get_store())
+
+if __name__ == '__main__':
+    unittest.main()
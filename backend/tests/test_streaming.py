@@ -0,0 +1,55 @@
+import unittest
+import json
+from unittest import mock
+from routes import streaming
+import store_cases
+
+USERS = [{'user_id': uid, 'email': f'user{uid}@example.com', 'purchases': [], 'deposits': []}
+         for uid in range(25)]
+
+class StreamingTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, buffered=False, **kwargs)
+        chunks = list(response.response)
+        return response, b''.join(c if isinstance(c, bytes) else c.encode() for c in chunks), chunks
+
+    @mock.patch.object(streaming, 'CHUNK_BYTES', 200)
+    def test_json_array(self):
+        """The full list is the same JSON array, sent in several chunks"""
+        for url in ('/users', '/api/data', '/api/transactions/'):
+            response, body, chunks = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/json')
+            self.assertEqual(json.loads(body), USERS)
+            self.assertGreater(len(chunks), 1)
+
+    def test_ndjson(self):
+        """NDJSON is chosen with ?format=ndjson or the Accept header"""
+        _, body, _ = self.get('/users?format=ndjson')
+        self.assertEqual([json.loads(line) for line in body.splitlines()], USERS)
+        response, body, _ = self.get('/api/data', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(body.splitlines()), len(USERS))
+
+    def test_empty(self):
+        """An empty store is an empty array"""
+        self.use_store([])
+        self.assertEqual(self.get('/users')[1], b'[]')
+        self.assertEqual(self.get('/users?format=ndjson')[1], b'')
+
+    def test_reads_in_batches(self):
+        """Users are read from the store a batch at a time"""
+        from storage import get_store
+        store = get_store()
+        with mock.patch.object(store, 'list_users', wraps=store.list_users) as list_users:
+            self.assertEqual(len(list(store.iter_users(batch_size=10))), 25)
+        self.assertEqual([c.args[1] for c in list_users.call_args_list], [10, 10, 10])
+
+class SqliteStreamingTestCase(store_cases.SqliteStoreMixin, StreamingTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
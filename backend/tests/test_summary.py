@@ -0,0 +1,75 @@
+import unittest
+import json
+import store_cases
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+    'purchases': [
+        {'purchaseId': 0, 'purchaseCategory': 'Food & Drink', 'purchaseDate': '2025-05-01T10:00:00Z', 'purchaseCost': -10.5},
+        {'purchaseId': 1, 'purchaseCategory': 'Shopping', 'purchaseDate': '2025-05-03T10:00:00Z', 'purchaseCost': -20},
+        {'purchaseId': 2, 'purchaseCategory': 'Salary', 'purchaseDate': '2025-05-04T10:00:00Z', 'purchaseCost': 500},
+        {'purchaseId': 3, 'purchaseCategory': 'Food & Drink', 'purchaseDate': '2025-04-20T10:00:00Z', 'purchaseCost': -4},
+    ],
+    'deposits': [{'depositId': 0, 'depositDate': '2025-05-02T10:00:00Z', 'depositAmount': 50}],
+}]
+
+class SummaryTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def summary(self, query=''):
+        response = self.client.get(f'/api/data/0/summary{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_month_summary(self):
+        """A month's summary splits spending by category"""
+        summary = self.summary('?month=2025-05')
+        self.assertEqual(summary['purchases']['spent'], 30.5)
+        self.assertEqual(summary['purchases']['income'], 500)
+        self.assertEqual(summary['purchases']['byCategory']['Food & Drink'], {'spent': 10.5, 'income': 0, 'count': 1})
+        self.assertEqual(summary['deposits'], {'total': 50, 'count': 1})
+
+    def test_all_months(self):
+        """Without a month the summary covers every month"""
+        summary = self.summary()
+        self.assertEqual(summary['purchases']['spent'], 34.5)
+        self.assertEqual(sorted(summary['byMonth']), ['2025-04', '2025-05'])
+        self.assertEqual(summary['byMonth']['2025-04']['purchases']['spent'], 4)
+
+    def test_category_filter(self):
+        """category restricts the totals to one category"""
+        summary = self.summary('?category=Food%20%26%20Drink')
+        self.assertEqual(summary['purchases']['spent'], 14.5)
+        self.assertEqual(list(summary['purchases']['byCategory']), ['Food & Drink'])
+
+    def test_rollup_follows_writes(self):
+        """Adding and deleting purchases and deposits updates the totals incrementally"""
+        self.summary()  # build the rollup before writing
+        self.client.post('/api/data/purchase/users/0/transactions', content_type='application/json',
+                         data=json.dumps({'purchaseCategory': 'Shopping', 'purchaseDate': '2025-05-09T00:00:00Z',
+                                          'purchaseCost': -5}))
+        self.client.delete('/api/data/purchase/0', content_type='application/json',
+                           data=json.dumps({'purchaseId': 0}))
+        self.client.patch('/api/data/deposit/0', content_type='application/json',
+                          data=json.dumps({'depositAmount': 25, 'depositDate': '2025-05-10T00:00:00Z'}))
+        self.client.delete('/api/data/deposit/0', content_type='application/json',
+                           data=json.dumps({'depositId': 0}))
+        summary = self.summary('?month=2025-05')
+        self.assertEqual(summary['purchases']['byCategory']['Shopping']['spent'], 25)
+        self.assertNotIn('Food & Drink', summary['purchases']['byCategory'])
+        self.assertEqual(summary['deposits'], {'total': 25, 'count': 1})
+
+    def test_invalid_month(self):
+        """month must be YYYY-MM"""
+        self.assertEqual(self.client.get('/api/data/0/summary?month=May').status_code, 400)
+
+    def test_unknown_user(self):
+        """Unknown users are a 404"""
+        self.assertEqual(self.client.get('/api/data/9/summary').status_code, 404)
+
+class SqliteSummaryTestCase(store_cases.SqliteStoreMixin, SummaryTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import json
+import store_cases
+
+USERS = [{
+    'user_id': 0, 'email': 'a@example.com', 'currentBalance': 100.0,
+    'purchases': [{'purchaseId': 0, 'purchaseDate': '2025-05-01T10:00:00Z', 'purchaseCost': -10}],
+    'deposits': [{'depositId': 0, 'depositDate': '2025-05-02T10:00:00Z', 'depositAmount': 50}],
+    'financialGoals': [{'goalId': 0, 'currentAmount': 0, 'targetAmount': 100}],
+}]
+
+class SyncTestCase(store_cases.StoreTestCase):
+
+    USERS = USERS
+
+    def sync(self, since=None):
+        url = '/api/sync/0' + ('' if since is None else f'?since={since}')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def add_purchase(self, cost):
+        self.client.post('/api/data/purchase/users/0/transactions', content_type='application/json',
+                         data=json.dumps({'purchaseDate': '2025-05-09T00:00:00Z', 'purchaseCost': cost}))
+
+    def test_snapshot_without_since(self):
+        """Without since the whole user is returned"""
+        body = self.sync()
+        self.assertTrue(body['full'])
+        self.assertEqual(body['seq'], 0)
+        self.assertEqual(body['user']['email'], 'a@example.com')
+
+    def test_changes_since(self):
+        """Only the records changed after since are returned"""
+        seq = self.sync()['seq']
+        self.add_purchase(-5)
+        self.client.delete('/api/data/deposit/0', content_type='application/json',
+                           data=json.dumps({'depositId': 0}))
+        self.client.patch('/users/0/goals/0', content_type='application/json', data=json.dumps({'amountToAdd': 10}))
+        body = self.sync(seq)
+        self.assertFalse(body['full'])
+        self.assertEqual(body['seq'], seq + 3)
+        changes = {(c['type'], c['op'], c['id']) for c in body['changes']}
+        self.assertIn(('purchases', 'insert', 1), changes)
+        self.assertIn(('deposits', 'delete', 0), changes)
+        self.assertIn(('financialGoals', 'update', 0), changes)
+        profile = [c for c in body['changes'] if c['type'] == 'profile']
+        self.assertEqual(profile[0]['record']['currentBalance'], 45.0)
+        self.assertNotIn('version', profile[0]['record'])
+
+        # Nothing new since the latest seq
+        self.assertEqual(self.sync(body['seq'])['changes'], [])
+
+    def test_changes_are_folded(self):
+        """A record added and removed within the range is left out"""
+        seq = self.sync()['seq']
+        self.add_purchase(-5)
+        self.client.delete('/api/data/purchase/0', content_type='application/json',
+                           data=json.dumps({'purchaseId': 1}))
+        body = self.sync(seq)
+        self.assertEqual([c for c in body['changes'] if c['type'] == 'purchases'], [])
+
+    def test_profile_update(self):
+        """Profile edits are sent as the changed fields"""
+        self.client.patch('/users/email/a%40example.com', content_type='application/json',
+                          data=json.dumps({'fullName': 'Ann'}))
+        body = self.sync(0)
+        self.assertEqual(body['changes'], [{'seq': 1, 'type': 'profile', 'op': 'update', 'id': None,
+                                            'record': {'fullName': 'Ann'}}])
+
+    def test_falls_back_to_snapshot(self):
+        """A range the log does not cover gets a snapshot"""
+        self.add_purchase(-5)
+        self.store.changes.reset()
+        self.add_purchase(-6)
+        self.assertTrue(self.sync(0)['full'])
+        self.assertFalse(self.sync(1)['full'])
+        # A seq from the future, e.g. after the data was restored
+        self.assertTrue(self.sync(99)['full'])
+
+    def test_log_is_bounded(self):
+        """Only the last transactions of each user are kept"""
+        self.store.changes.length = 2
+        for cost in (-1, -2, -3):
+            self.add_purchase(cost)
+        self.assertTrue(self.sync(0)['full'])
+        self.assertEqual(len(self.sync(1)['changes']), 3)  # two purchases and the balance
+
+    def test_bad_requests(self):
+        """since must be a non-negative integer and the user must exist"""
+        self.assertEqual(self.client.get('/api/sync/0?since=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/0?since=-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/9?since=0').status_code, 404)
+
+class SqliteSyncTestCase(store_cases.SqliteStoreMixin, SyncTestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,16 @@
+"""
+wsgi.py
+
+Production entry point. Serves the Flask app with gunicorn, several worker
+processes each running several threads, instead of the single-process debug
+server started by `python3 -m app`:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker and thread counts come from WEB_WORKERS and WEB_THREADS (see
+config.py and gunicorn.conf.py). Any other WSGI server can load wsgi:app too.
+It is the app app.py builds on import, so each worker runs a single export
+pool and, with RECURRING_INTERVAL set, a single scheduler thread.
+"""
+
+from app import app
@@ -96,22 +96,22 @@ const AnalyticsScreen = () => {
       const user = await api.getUserByEmail(email);
       if (!user || user.error) throw new Error('User not found. Please log in again.');
       
-      const purchases = user.purchases || [];
-      console.log('Fetched purchases for analytics:', purchases.length);
+      // Totals are kept by the server, so they are read from the summaries
+      // instead of being added up from the user's purchase history here
+      const userId = user.user_id ?? user.userId;
+      const now = new Date();
+      const monthKey = (year, idx) => `${year}-${String(idx + 1).padStart(2, '0')}`;
+      const [summary, monthSummary] = await Promise.all([
+        api.getSummary(userId),
+        api.getSummary(userId, { month: monthKey(now.getFullYear(), now.getMonth()) }),
+      ]);
 
       // --- Monthly Spending (last 4 months) ---
-      const now = new Date();
       const monthlyTotals = Array(12).fill(0);
-      purchases.forEach(tx => {
-        if (tx.purchaseDate) {
-          const date = new Date(tx.purchaseDate);
-          const monthIdx = date.getMonth();
-          // Only count expenses (negative purchaseCost) for spending charts
-          if (date.getFullYear() === now.getFullYear() && tx.purchaseCost < 0) {
-            monthlyTotals[monthIdx] += Math.abs(Number(tx.purchaseCost)) || 0;
-          }
-        }
-      });
+      for (let idx = 0; idx < 12; idx++) {
+        const month = summary.byMonth[monthKey(now.getFullYear(), idx)];
+        monthlyTotals[idx] = month ? month.purchases.spent : 0;
+      }
 
       const currentMonth = now.getMonth();
       const monthsToShow = 4;
@@ -126,30 +126,11 @@ const AnalyticsScreen = () => {
       setMonthlySpending(barData);
 
       // --- Category Spending (current month) ---
-      const currentMonthPurchases = purchases.filter(p => {
-        const d = new Date(p.purchaseDate);
-        const isCurrentMonth = d.getMonth() === now.getMonth() && 
-                             d.getFullYear() === now.getFullYear();
-        const isExpense = p.purchaseCost < 0;
-        console.log('Purchase:', {
-          date: p.purchaseDate,
-          isCurrentMonth,
-          isExpense,
-          cost: p.purchaseCost,
-          category: p.purchaseCategory
-        });
-        return isCurrentMonth && isExpense;
-      });
-
-      console.log('Current month purchases:', currentMonthPurchases);
-
       const categoryTotals = {};
       CATEGORIES.forEach(cat => { categoryTotals[cat] = 0; });
-      
-      currentMonthPurchases.forEach(tx => {
-        const cat = tx.purchaseCategory || 'Other';
-        if (!categoryTotals.hasOwnProperty(cat)) categoryTotals[cat] = 0;
-        categoryTotals[cat] += Math.abs(Number(tx.purchaseCost)) || 0;
+
+      Object.entries(monthSummary.purchases.byCategory).forEach(([cat, totals]) => {
+        categoryTotals[cat] = totals.spent;
       });
 
       console.log('Category totals:', categoryTotals);
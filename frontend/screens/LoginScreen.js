@@ -85,11 +85,13 @@ const LoginScreen = ({ navigation }) => {
 
     if (isValid) {
       try {
-        const response = await fetch('http://192.168.55.153:5001/api/data');
-        const users = await response.json();
-        const user = users.find(u => u.email === email);
+        const response = await fetch('http://192.168.55.153:5001/api/auth/login', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ email, password }),
+        });
 
-        if (user && user.password === password) {
+        if (response.ok) {
           await AsyncStorage.setItem('userEmail', email);
           navigation.navigate('MainTabs');
         } else {
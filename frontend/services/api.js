@@ -43,6 +43,41 @@ const api = {
     }
   },
 
+  /**
+   * Get a user's spending and deposit totals, computed on the server
+   * @param {number} userId - The ID of the user
+   * @param {Object} [filters] - Optional { month: 'YYYY-MM', category }
+   * @returns {Promise<Object>} Summary with purchases, deposits and byMonth totals
+   * @throws {Error} If the request fails
+   */
+  getSummary: async (userId, filters = {}) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/data/${userId}/summary`, { params: filters });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching summary:', error);
+      throw error;
+    }
+  },
+
+  /**
+   * Get the changes made to a user since the last sync
+   * @param {number} userId - The ID of the user
+   * @param {number} [since] - The seq returned by the previous sync; omit for a full snapshot
+   * @returns {Promise<Object>} { seq, full, changes } or { seq, full: true, user }
+   * @throws {Error} If the request fails
+   */
+  syncUser: async (userId, since) => {
+    try {
+      const params = since === undefined ? {} : { since };
+      const response = await axios.get(`${API_BASE_URL}/api/sync/${userId}`, { params });
+      return response.data;
+    } catch (error) {
+      console.error('Error syncing user:', error);
+      throw error;
+    }
+  },
+
   /**
    * Get all users in the system
    * @returns {Promise<Array>} Array of user objects
@@ -144,6 +179,64 @@ const api = {
       console.error('Error updating goal amount:', error);
       throw error;
     }
+  },
+
+  /**
+   * Add several contributions across a user's goals in one request
+   * @param {number} userId - The ID of the user
+   * @param {Array<{goalId: number, amountToAdd: number}>} contributions - The contributions to apply
+   * @returns {Promise<Object>} The updated goals, as {goals: [...]}
+   * @throws {Error} If the request fails or a goal does not exist
+   */
+  addGoalContributions: async (userId, contributions) => {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/users/${userId}/goals/contributions`, {
+        contributions,
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error adding goal contributions:', error);
+      throw error;
+    }
+  },
+
+  /**
+   * Search a user's purchases by words of their name or category
+   * @param {number} userId - The ID of the user
+   * @param {Object} params - Optional q, category, month (YYYY-MM) and limit
+   * @returns {Promise<Object>} {total, items, facets: {category, month}}
+   * @throws {Error} If the request fails
+   */
+  searchPurchases: async (userId, params = {}) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/data/purchase/${userId}/search`, {
+        params,
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error searching purchases:', error);
+      throw error;
+    }
+  },
+
+  /**
+   * Download a user's purchases and deposits as a CSV statement
+   * @param {number} userId - The ID of the user
+   * @param {Object} params - Optional from and to dates
+   * @returns {Promise<string>} The CSV text, oldest item first
+   * @throws {Error} If the request fails
+   */
+  getStatement: async (userId, params = {}) => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/data/${userId}/export`, {
+        params,
+        responseType: 'text',
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching statement:', error);
+      throw error;
+    }
   }
 };
 